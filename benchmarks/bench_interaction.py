@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark de la latencia de interacción de ImageView.
+
+Sin pantalla (QT_QPA_PLATFORM=offscreen) envía a una ImageView secuencias
+sintéticas de pulsar, arrastrar y soltar en cada modo de edición (mover,
+redimensionar, rotar y deformar) y mide el tiempo de proceso de cada evento
+y el tiempo de repintado tras cada movimiento, con sus percentiles
+p50/p95/p99, para varios tamaños de imagen.
+
+Ejemplo:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_interaction.py --sizes 1024 4096
+    python benchmarks/bench_interaction.py --baseline interaction_baseline.json
+"""
+
+import argparse
+import math
+import os
+import tempfile
+import time
+
+from common import (create_app, synthetic_image, percentile, environment, write_results,
+                    read_results, compare, report_comparison)
+from PyQt5.QtCore import Qt, QEvent, QPointF
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtWidgets import QApplication
+from image_view import ImageView
+
+DEFAULT_SIZES = [1024, 4096, 8192]
+
+# Modo -> (constante de ImageView, botón con el que se arrastra)
+MODES = {
+    'move': (ImageView.MODE_MOVE, Qt.LeftButton),
+    'resize': (ImageView.MODE_RESIZE, Qt.LeftButton),
+    'rotate': (ImageView.MODE_ROTATE, Qt.RightButton),
+    'deform': (ImageView.MODE_DEFORM, Qt.LeftButton),
+}
+
+VIEW_SIZE = (800, 600)
+
+
+def send_mouse(view, event_type, pos, button, buttons):
+    """Envía un evento de ratón a la vista y devuelve el tiempo de proceso en segundos."""
+    event = QMouseEvent(event_type, QPointF(pos), button, buttons, Qt.NoModifier)
+    start = time.perf_counter()
+    QApplication.sendEvent(view.viewport(), event)
+    return time.perf_counter() - start
+
+
+def repaint_time(view):
+    """Repinta la vista de forma síncrona y devuelve el tiempo en segundos."""
+    start = time.perf_counter()
+    view.viewport().repaint()
+    return time.perf_counter() - start
+
+
+def drag_path(start, steps, radius):
+    """Recorrido del arrastre: un arco alrededor del punto de inicio."""
+    return [QPointF(start.x() + radius * math.sin(2 * math.pi * i / steps),
+                    start.y() + radius * (1 - math.cos(2 * math.pi * i / steps)) / 2)
+            for i in range(1, steps + 1)]
+
+
+def start_point(view, mode):
+    """Punto de la vista donde empieza el arrastre."""
+    if mode == 'deform':
+        # Arrastrar la esquina superior derecha de la imagen
+        return QPointF(view.mapFromScene(view.control_points[1].pos()))
+    if mode == 'rotate':
+        # Lejos del centro para que el arrastre produzca un giro
+        return QPointF(VIEW_SIZE[0] * 0.75, VIEW_SIZE[1] * 0.5)
+    return QPointF(VIEW_SIZE[0] * 0.5, VIEW_SIZE[1] * 0.5)
+
+
+def measure(view, mode, steps, repeats):
+    """Mide `repeats` arrastres completos en un modo."""
+    constant, button = MODES[mode]
+    event_times = []
+    paint_times = []
+    press_times = []
+    release_times = []
+
+    for _ in range(repeats):
+        # Cada arrastre parte del estado recién cargado
+        view.reset_image()
+        view.set_mode(constant)
+        QApplication.processEvents()
+
+        start = start_point(view, mode)
+        press_times.append(send_mouse(view, QEvent.MouseButtonPress, start, button, button))
+        for pos in drag_path(start, steps, radius=40):
+            event_times.append(send_mouse(view, QEvent.MouseMove, pos, Qt.NoButton, button))
+            paint_times.append(repaint_time(view))
+        release_times.append(send_mouse(view, QEvent.MouseButtonRelease, pos, button, Qt.NoButton))
+        QApplication.processEvents()
+
+    return {
+        'events': len(event_times),
+        'event_p50_s': percentile(event_times, 50),
+        'event_p95_s': percentile(event_times, 95),
+        'event_p99_s': percentile(event_times, 99),
+        'paint_p50_s': percentile(paint_times, 50),
+        'paint_p95_s': percentile(paint_times, 95),
+        'paint_p99_s': percentile(paint_times, 99),
+        'press_p50_s': percentile(press_times, 50),
+        'release_p50_s': percentile(release_times, 50),
+    }
+
+
+def run(sizes, modes, steps, repeats):
+    """Ejecuta todos los modos para cada tamaño y devuelve los resultados."""
+    app = create_app()  # Los widgets necesitan una QApplication viva durante todo el benchmark
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='noimgpack2_bench_') as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"synthetic_{size}.png")
+            synthetic_image(size).save(path, compress_level=1)
+
+            view = ImageView()
+            view.resize(*VIEW_SIZE)
+            view.show()
+            view.set_image(path)
+            app.processEvents()
+
+            for mode in modes:
+                case = f"{mode}/{size}"
+                result = measure(view, mode, steps, repeats)
+                results[case] = result
+                print(f"{case:16s} evento p50/p95/p99 "
+                      f"{result['event_p50_s'] * 1000:7.2f} {result['event_p95_s'] * 1000:7.2f} "
+                      f"{result['event_p99_s'] * 1000:7.2f} ms   repintado p50/p95/p99 "
+                      f"{result['paint_p50_s'] * 1000:7.2f} {result['paint_p95_s'] * 1000:7.2f} "
+                      f"{result['paint_p99_s'] * 1000:7.2f} ms   soltar {result['release_p50_s'] * 1000:7.2f} ms")
+
+            view.close()
+            view.deleteLater()
+            app.processEvents()
+    return {'environment': environment(), 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Lados mayores de las imágenes sintéticas")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--steps', type=int, default=60, help="Movimientos por arrastre")
+    parser.add_argument('--repeats', type=int, default=5, help="Arrastres por modo")
+    parser.add_argument('--output', default='benchmarks/results/interaction.json')
+    parser.add_argument('--baseline', help="Resultados con los que comparar")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Empeoramiento relativo del p95 que cuenta como regresión")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.modes, args.steps, args.repeats)
+    write_results(args.output, results)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, read_results(args.baseline), 'event_p95_s', args.threshold)
+        raise SystemExit(report_comparison(regressions, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
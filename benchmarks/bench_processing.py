@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark de las operaciones de ImageProcessor e ImageDeformer.
+
+Genera imágenes sintéticas deterministas, mide cada operación y guarda el
+tiempo (mediana y mínimo), las operaciones por segundo y cuánto crece la
+memoria residente del proceso durante cada caso en un JSON. Con
+--baseline compara con unos resultados anteriores y termina con código 1
+si alguna operación es más lenta que el umbral.
+
+Ejemplo:
+    python benchmarks/bench_processing.py --sizes 512 2048 --output results.json
+    python benchmarks/bench_processing.py --baseline baseline.json --threshold 0.15
+"""
+
+import argparse
+import gc
+import time
+
+import numpy as np
+
+from common import (create_app, synthetic_image, environment, write_results,
+                    read_results, compare, report_comparison)
+from PyQt5.QtCore import QRectF
+from image_processor import ImageProcessor
+from image_deformer import ImageDeformer
+
+DEFAULT_SIZES = [512, 2048, 4096, 8192, 12288]
+DEFAULT_MODES = ['RGBA', 'RGB']
+
+
+def deform_points(width, height):
+    """Esquinas de la imagen y las mismas desplazadas un 5% hacia dentro/fuera."""
+    source = [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]]
+    dx, dy = width * 0.05, height * 0.05
+    target = [[dx, dy], [width - 1 + dx, -dy], [width - 1 - dx, height - 1 - dy], [-dx, height - 1 + dy]]
+    return source, target
+
+
+def setup_pil_to_pixmap(image):
+    return lambda: ImageProcessor.pil_to_pixmap(image)
+
+
+def setup_crop_image(image):
+    width, height = image.size
+    rect = QRectF(width / 4, height / 4, width / 2, height / 2)
+    return lambda: ImageProcessor.crop_image(image, rect, (1024, 1024))
+
+
+def setup_rotate_image(image):
+    return lambda: ImageProcessor.rotate_image(image, 15)
+
+
+def setup_resize_image(image):
+    return lambda: ImageProcessor.resize_image(image, 0.5, 0.5)
+
+
+def setup_processor_deform(image):
+    source, target = deform_points(*image.size)
+    return lambda: ImageProcessor.deform_image(image, source, target)
+
+
+def setup_deformer_deform(image):
+    # ImageDeformer trabaja siempre en RGBA, como en ImageView
+    deformer = ImageDeformer()
+    deformer.load_pil_image(image if image.mode == 'RGBA' else image.convert('RGBA'))
+    _, target = deform_points(*image.size)
+    return lambda: deformer.deform_image(target)
+
+
+# Operación -> función que prepara los datos y devuelve la llamada a medir
+OPERATIONS = {
+    'pil_to_pixmap': setup_pil_to_pixmap,
+    'crop_image': setup_crop_image,
+    'rotate_image': setup_rotate_image,
+    'resize_image': setup_resize_image,
+    'processor_deform_image': setup_processor_deform,
+    'deformer_deform_image': setup_deformer_deform,
+}
+
+
+def rss_status():
+    """Memoria residente actual y pico del proceso en bytes (Linux), o None.
+
+    Se lee de /proc porque incluye los búferes de PIL, OpenCV y Qt, que
+    tracemalloc no ve.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            fields = dict(line.split(':', 1) for line in f if line.startswith(('VmRSS', 'VmHWM')))
+    except OSError:
+        return None
+    return {name: int(value.split()[0]) * 1024 for name, value in fields.items()}
+
+
+def reset_peak_rss():
+    """Reinicia el pico de memoria residente (VmHWM) del proceso; False si no se puede."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure(call, min_runs, min_time):
+    """Ejecuta la llamada hasta alcanzar min_runs y min_time segundos.
+
+    La memoria se mide como diferencia con la residente al empezar el caso:
+    el pico (tras reiniciar VmHWM) y lo que queda al terminar. Es None donde
+    no se puede medir (fuera de Linux o sin permiso para reiniciar el pico).
+
+    Returns:
+        dict - Tiempos en segundos y crecimiento de la memoria residente en bytes
+    """
+    call()  # Calentamiento (cachés, carga perezosa de bibliotecas)
+    gc.collect()
+
+    before = rss_status()
+    peak_reset = before is not None and reset_peak_rss()
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - t0)
+    after = rss_status()
+
+    median = float(np.median(times))
+    return {
+        'runs': len(times),
+        'median_s': median,
+        'min_s': float(min(times)),
+        'ops_per_s': 1.0 / median if median > 0 else 0.0,
+        'peak_rss_delta_bytes': after['VmHWM'] - before['VmRSS'] if peak_reset else None,
+        'rss_delta_bytes': after['VmRSS'] - before['VmRSS'] if before is not None else None,
+    }
+
+
+def format_bytes(value):
+    return f"{value / 2**20:9.1f} MB" if value is not None else f"{'-':>12s}"
+
+
+def run(sizes, modes, operations, min_runs, min_time):
+    """Ejecuta todas las combinaciones y devuelve los resultados."""
+    app = create_app()  # QPixmap necesita una QApplication viva durante todo el benchmark
+    results = {}
+    for size in sizes:
+        for mode in modes:
+            image = synthetic_image(size, mode)
+            for name in operations:
+                case = f"{name}/{mode}/{size}"
+                try:
+                    result = measure(OPERATIONS[name](image), min_runs, min_time)
+                except MemoryError:
+                    print(f"{case:40s} sin memoria suficiente")
+                    continue
+                results[case] = result
+                print(f"{case:40s} {result['median_s'] * 1000:10.2f} ms "
+                      f"{result['ops_per_s']:9.2f} op/s "
+                      f"{format_bytes(result['peak_rss_delta_bytes'])}")
+            del image
+            gc.collect()
+    del app
+    return {'environment': environment(), 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Lados mayores de las imágenes sintéticas")
+    parser.add_argument('--modes', nargs='+', default=DEFAULT_MODES, choices=['RGBA', 'RGB'])
+    parser.add_argument('--operations', nargs='+', default=list(OPERATIONS), choices=list(OPERATIONS))
+    parser.add_argument('--min-runs', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=1.0,
+                        help="Tiempo mínimo de medición por caso, en segundos")
+    parser.add_argument('--output', default='benchmarks/results/processing.json')
+    parser.add_argument('--baseline', help="Resultados con los que comparar")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Empeoramiento relativo de la mediana que cuenta como regresión")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.modes, args.operations, args.min_runs, args.min_time)
+    write_results(args.output, results)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, read_results(args.baseline), 'median_s', args.threshold)
+        raise SystemExit(report_comparison(regressions, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
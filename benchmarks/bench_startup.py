@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark del arranque en frío de la aplicación.
+
+Cada medición se hace en un proceso nuevo:
+
+- Con `python -X importtime` se mide el tiempo de importar `main` y se
+  listan los módulos más costosos.
+- Se mide el tiempo hasta que la ventana principal está creada y visible
+  (QT_QPA_PLATFORM=offscreen) y se comprueba qué bibliotecas pesadas se
+  han cargado ya en ese momento; con la importación perezosa no debería
+  haber ninguna.
+
+Con --target-ms termina con código 1 si la mediana supera el objetivo.
+
+Ejemplo:
+    python benchmarks/bench_startup.py --runs 5 --target-ms 400
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, percentile, environment, write_results, read_results, compare, report_comparison
+from lazy_import import HEAVY_MODULES
+
+# Código que se ejecuta en el proceso hijo para medir la aparición de la ventana
+WINDOW_PROBE = """
+import time
+start = time.perf_counter()
+import json, os, sys
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+from image_editor import ImageEditor
+editor = ImageEditor()
+editor.show()
+app.processEvents()
+elapsed = time.perf_counter() - start
+print(json.dumps({'window_s': elapsed,
+                  'loaded': [name for name in %r if name in sys.modules]}))
+"""
+
+
+def child_env(home):
+    """Entorno del proceso hijo con un HOME vacío para no tocar la sesión ni las preferencias."""
+    env = dict(os.environ)
+    env['HOME'] = home
+    env['XDG_CONFIG_HOME'] = os.path.join(home, '.config')
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def import_times(env):
+    """Ejecuta `python -X importtime -c 'import main'` y analiza su salida.
+
+    Returns:
+        dict - Tiempo acumulado de importar main y los módulos más costosos (en segundos)
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                             cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative) / 1e6
+    return {
+        'import_main_s': modules.get('main', 0.0),
+        'top_modules': sorted(modules.items(), key=lambda item: item[1], reverse=True)[:15]
+    }
+
+
+def window_time(env):
+    """Tiempo hasta mostrar la ventana principal y bibliotecas pesadas ya cargadas."""
+    process = subprocess.run([sys.executable, '-c', WINDOW_PROBE % (HEAVY_MODULES,)],
+                             cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run(runs):
+    """Repite las mediciones en procesos nuevos y resume las medianas."""
+    import_samples = []
+    window_samples = []
+    loaded = set()
+    top_modules = []
+    with tempfile.TemporaryDirectory(prefix='noimgpack2_startup_') as home:
+        env = child_env(home)
+        for _ in range(runs):
+            imports = import_times(env)
+            import_samples.append(imports['import_main_s'])
+            top_modules = imports['top_modules']
+
+            window = window_time(env)
+            window_samples.append(window['window_s'])
+            loaded.update(window['loaded'])
+
+    result = {
+        'runs': runs,
+        'import_main_s': percentile(import_samples, 50),
+        'window_s': percentile(window_samples, 50),
+        'window_p95_s': percentile(window_samples, 95),
+        'heavy_modules_at_startup': sorted(loaded),
+    }
+    print(f"import main        {result['import_main_s'] * 1000:8.1f} ms (mediana)")
+    print(f"ventana visible    {result['window_s'] * 1000:8.1f} ms (mediana)")
+    print(f"pesadas al arrancar: {', '.join(result['heavy_modules_at_startup']) or 'ninguna'}")
+    print("Módulos más costosos (acumulado):")
+    for name, seconds in top_modules:
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+    return {'environment': environment(), 'results': {'startup': result}, 'top_modules': top_modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', default='benchmarks/results/startup.json')
+    parser.add_argument('--target-ms', type=float,
+                        help="Objetivo de tiempo hasta mostrar la ventana (mediana)")
+    parser.add_argument('--baseline', help="Resultados con los que comparar")
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    write_results(args.output, results)
+    print(f"Resultados guardados en {args.output}")
+
+    status = 0
+    window_ms = results['results']['startup']['window_s'] * 1000
+    if args.target_ms is not None and window_ms > args.target_ms:
+        print(f"Objetivo no alcanzado: {window_ms:.1f} ms > {args.target_ms:.1f} ms")
+        status = 1
+    if args.baseline:
+        regressions = compare(results, read_results(args.baseline), 'window_s', args.threshold)
+        status = max(status, report_comparison(regressions, args.threshold))
+    raise SystemExit(status)
+
+
+if __name__ == '__main__':
+    main()
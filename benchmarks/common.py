@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Utilidades compartidas por los benchmarks."""
+
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+# Los benchmarks importan los módulos de la aplicación desde la raíz del repositorio
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def create_app():
+    """Crea (o reutiliza) la QApplication; sin pantalla se usa la plataforma offscreen."""
+    if not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def synthetic_image(size, mode='RGBA'):
+    """Genera una imagen sintética determinista de lado mayor `size` (relación 4:3).
+
+    Combina degradados y un patrón XOR para que haya detalle en toda la
+    imagen; en RGBA el marco exterior es semitransparente.
+    """
+    width = size
+    height = size * 3 // 4
+    y, x = np.ogrid[:height, :width]
+
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[..., 0] = (x * 255 // max(1, width - 1)).astype(np.uint8)
+    pixels[..., 1] = (y * 255 // max(1, height - 1)).astype(np.uint8)
+    pixels[..., 2] = ((x ^ y) & 0xFF).astype(np.uint8)
+    pixels[..., 3] = 255
+
+    border = max(1, size // 16)
+    pixels[:border, :, 3] = 128
+    pixels[-border:, :, 3] = 128
+    pixels[:, :border, 3] = 128
+    pixels[:, -border:, 3] = 128
+
+    image = Image.fromarray(pixels, 'RGBA')
+    return image if mode == 'RGBA' else image.convert(mode)
+
+
+def percentile(values, q):
+    """Percentil q (0-100) de una lista de valores."""
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def environment():
+    """Describe el entorno en el que se ejecutan las mediciones."""
+    import cv2
+    import PIL
+    from PyQt5.QtCore import QT_VERSION_STR
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'opencv': cv2.__version__,
+        'qt': QT_VERSION_STR
+    }
+
+
+def write_results(path, results):
+    """Guarda los resultados en JSON."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def read_results(path):
+    """Lee unos resultados guardados con write_results."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(results, baseline, metric, threshold):
+    """Compara una métrica (mayor = más lento) con la línea base.
+
+    Returns:
+        list - Tuplas (caso, valor base, valor actual, variación relativa) de
+               los casos que empeoran más que el umbral
+    """
+    regressions = []
+    for case, current in results['results'].items():
+        base = baseline.get('results', {}).get(case)
+        if not base or not base.get(metric):
+            continue
+        change = current[metric] / base[metric] - 1
+        if change > threshold:
+            regressions.append((case, base[metric], current[metric], change))
+    return regressions
+
+
+def report_comparison(regressions, threshold):
+    """Muestra las regresiones y devuelve el código de salida del benchmark."""
+    if not regressions:
+        print(f"Sin regresiones por encima del {threshold:.0%}")
+        return 0
+    print(f"Regresiones por encima del {threshold:.0%}:")
+    for case, base, current, change in regressions:
+        print(f"  {case}: {base * 1000:.2f} ms -> {current * 1000:.2f} ms ({change:+.1%})")
+    return 1
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+from lazy_import import lazy_module
+
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+
+logger = logging.getLogger(__name__)
+
+# Lado del hash: 8x8 = 64 bits
+HASH_SIZE = 8
+
+
+def dhash(path, hash_size=HASH_SIZE):
+    """Calcula el hash perceptual por diferencias (dHash) de una imagen.
+
+    La imagen se decodifica directamente a un tamaño reducido cuando el
+    formato lo permite (draft de JPEG), por lo que no se carga completa.
+
+    Returns:
+        int - Hash de hash_size * hash_size bits, o None si no se puede leer
+    """
+    try:
+        with Image.open(path) as image:
+            image.draft('L', (hash_size * 8, hash_size * 8))
+            small = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+            pixels = np.asarray(small, dtype=np.int16)
+    except Exception as e:
+        logger.warning("Error al calcular el hash de %s: %s", path, e)
+        return None
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    """Número de bits distintos entre dos hashes."""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Árbol BK para buscar hashes por distancia de Hamming.
+
+    Cada nodo guarda sus hijos según la distancia a él; por la desigualdad
+    triangular, una búsqueda con radio r solo baja por los hijos cuya
+    distancia está en [d - r, d + r], sin comparar con todo el índice.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, elemento, {distancia: nodo}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item):
+        """Añade un hash con el elemento asociado."""
+        self._size += 1
+        if self._root is None:
+            self._root = [value, item, {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Busca los elementos a distancia menor o igual que max_distance.
+
+        Returns:
+            list - Pares (distancia, elemento) ordenados por distancia
+        """
+        if self._root is None:
+            return []
+
+        results = []
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.append((distance, node[1]))
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class DuplicateIndex:
+    """Índice de imágenes importadas para detectar duplicados y casi duplicados."""
+
+    def __init__(self, max_distance=4):
+        self.max_distance = max_distance
+        self._tree = BKTree()
+        self._paths = set()
+
+    def __contains__(self, path):
+        return path in self._paths
+
+    def find(self, value):
+        """Ruta de la imagen indexada más parecida a un hash, o None si no hay ninguna."""
+        if value is None:
+            return None
+        matches = self._tree.search(value, self.max_distance)
+        return matches[0][1] if matches else None
+
+    def add(self, path, value):
+        """Indexa una imagen; las que no se pudieron leer solo se recuerdan por ruta."""
+        self._paths.add(path)
+        if value is not None:
+            self._tree.add(value, path)
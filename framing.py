@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+from lazy_import import lazy_module
+
+np = lazy_module('numpy')
+cv2 = lazy_module('cv2')
+Image = lazy_module('PIL.Image')
+
+# Lado máximo de la copia reducida sobre la que se calcula el encuadre
+PROXY_SIZE = 512
+
+# Diferencia mínima (0-255) para considerar un píxel como contenido
+TOLERANCE = 8
+
+# Fracción del mayor marco posible que ocupa el recorte inteligente
+SMART_SCALE = 0.8
+
+
+def make_proxy(pil_image, max_size=PROXY_SIZE):
+    """Crea una copia reducida de la imagen para analizarla rápido.
+
+    Returns:
+        tuple - (array NumPy de la copia, factor de escala hasta la original)
+    """
+    factor = max(1, math.ceil(max(pil_image.size) / max_size))
+    proxy = pil_image.reduce(factor) if factor > 1 else pil_image
+    return np.asarray(proxy), pil_image.size[0] / proxy.size[0]
+
+
+def open_proxy(path, max_size=PROXY_SIZE):
+    """Decodifica una imagen para analizarla, ya reducida si el formato lo permite.
+
+    En JPEG, draft decodifica directamente a 1/2, 1/4 u 1/8 sin bajar de
+    max_size; el resto de formatos se decodifica entero y make_proxy lo
+    reduce después.
+
+    Returns:
+        tuple - (imagen PIL, factor de escala hasta la original)
+    """
+    with Image.open(path) as image:
+        width = image.width
+        image.draft(image.mode, (max_size, max_size))
+        image.load()
+        return image, width / image.width
+
+
+def content_bbox(array, tolerance=TOLERANCE):
+    """Caja del contenido de una imagen como (x0, y0, x1, y1), o None si está vacía.
+
+    Si la imagen tiene transparencia se usa el canal alfa; si no, se busca
+    el contenido que difiere del color de fondo estimado en las esquinas.
+    """
+    if array.ndim == 3 and array.shape[2] == 4 and (array[..., 3] < 255).any():
+        mask = array[..., 3] > tolerance
+    else:
+        pixels = array[..., :3] if array.ndim == 3 else array
+        corners = np.stack([pixels[0, 0], pixels[0, -1], pixels[-1, 0], pixels[-1, -1]])
+        background = np.median(corners, axis=0).astype(np.int16)
+        diff = np.abs(pixels.astype(np.int16) - background)
+        mask = (diff.max(axis=-1) if diff.ndim == 3 else diff) > tolerance
+
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def fit_aspect(x, y, width, height, aspect, mode='fit'):
+    """Ajusta una caja a una relación de aspecto manteniendo su centro.
+
+    Args:
+        mode: str - 'fit' para el menor marco que contiene toda la caja,
+              'fill' para el mayor marco contenido en la caja
+
+    Returns:
+        tuple - (x, y, ancho, alto)
+    """
+    center_x = x + width / 2
+    center_y = y + height / 2
+    wider = width / height > aspect
+
+    if (mode == 'fit') == wider:
+        height = width / aspect
+    else:
+        width = height * aspect
+
+    return center_x - width / 2, center_y - height / 2, width, height
+
+
+def auto_frame(pil_image, aspect, mode='fit', max_size=PROXY_SIZE, tolerance=TOLERANCE):
+    """Calcula el marco ajustado al contenido en coordenadas de la imagen.
+
+    Returns:
+        tuple - (x, y, ancho, alto) o None si no se detecta contenido
+    """
+    array, scale = make_proxy(pil_image, max_size)
+    bbox = content_bbox(array, tolerance)
+    if bbox is None:
+        return None
+
+    x0, y0, x1, y1 = (value * scale for value in bbox)
+    return fit_aspect(x0, y0, x1 - x0, y1 - y0, aspect, mode)
+
+
+def energy_map(array):
+    """Mapa de energía (magnitud del gradiente) de una imagen.
+
+    Las zonas transparentes no aportan energía.
+    """
+    if array.ndim == 2:
+        gray = array
+    else:
+        gray = cv2.cvtColor(np.ascontiguousarray(array[..., :3]), cv2.COLOR_RGB2GRAY)
+
+    gray = gray.astype(np.float32)
+    energy = np.abs(cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3))
+    energy += np.abs(cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3))
+
+    if array.ndim == 3 and array.shape[2] == 4:
+        energy *= array[..., 3] / np.float32(255)
+    return energy
+
+
+def best_window(energy, width, height):
+    """Posición (x, y) de la ventana de ese tamaño con más energía.
+
+    Con la imagen integral la suma de cada ventana cuesta cuatro accesos, así
+    que se evalúan todas las posiciones a la vez en O(N).
+    """
+    integral = cv2.integral(energy, sdepth=cv2.CV_64F)
+    sums = (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+    y, x = np.unravel_index(np.argmax(sums), sums.shape)
+    return int(x), int(y)
+
+
+def smart_crop(pil_image, aspect, scale=SMART_SCALE, max_size=PROXY_SIZE):
+    """Calcula el marco con la relación de aspecto dada que abarca más detalle.
+
+    Args:
+        scale: float - Tamaño del marco respecto al mayor que cabe en la imagen
+
+    Returns:
+        tuple - (x, y, ancho, alto) en coordenadas de la imagen
+    """
+    array, proxy_scale = make_proxy(pil_image, max_size)
+    proxy_height, proxy_width = array.shape[:2]
+
+    # Mayor marco con esa relación de aspecto que cabe en la copia reducida
+    _, _, width, height = fit_aspect(0, 0, proxy_width, proxy_height, aspect, 'fill')
+    width = min(proxy_width, max(1, int(round(width * scale))))
+    height = min(proxy_height, max(1, int(round(height * scale))))
+
+    x, y = best_window(energy_map(array), width, height)
+    return (x * proxy_scale, y * proxy_scale,
+            width * proxy_scale, height * proxy_scale)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import deque
+
+
+class UndoStack:
+    """Pila de deshacer/rehacer acotada, implementada como buffer circular.
+
+    Cada imagen tiene la suya (la vista que la muestra la usa), de modo que
+    deshacer en una imagen nunca recorre ni retiene estados de otras. Todas las operaciones son O(1)
+    (al apilar se liberan los estados de rehacer descartados, cada uno una
+    sola vez).
+    """
+
+    DEFAULT_CAPACITY = 50
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, on_discard=None):
+        self.capacity = max(1, int(capacity))
+        self.on_discard = on_discard  # Llamada con cada estado que se descarta
+        self._buffer = [None] * self.capacity
+        self._ids = [None] * self.capacity  # Identificador único de cada estado
+        self._next_id = 0
+        self._start = 0    # Posición física del estado más antiguo
+        self._count = 0    # Número de estados válidos en el buffer
+        self._index = -1   # Posición lógica del estado actual
+
+    def __len__(self):
+        return self._count
+
+    def _slot(self, logical_index):
+        """Convierte una posición lógica en una posición física del buffer."""
+        return (self._start + logical_index) % self.capacity
+
+    def _drop(self, logical_index):
+        """Libera el estado en la posición lógica indicada."""
+        slot = self._slot(logical_index)
+        state = self._buffer[slot]
+        self._buffer[slot] = None
+        self._ids[slot] = None
+        if state is not None and self.on_discard:
+            self.on_discard(state)
+
+    def push(self, state):
+        """Añade un estado nuevo y descarta la rama de rehacer."""
+        # Descartar los estados que estaban por delante del actual
+        while self._count > self._index + 1:
+            self._count -= 1
+            self._drop(self._count)
+
+        # Si el buffer está lleno, descartar el estado más antiguo
+        if self._count == self.capacity:
+            self._drop(0)
+            self._start = (self._start + 1) % self.capacity
+            self._count -= 1
+
+        slot = self._slot(self._count)
+        self._buffer[slot] = state
+        self._ids[slot] = self._next_id
+        self._next_id += 1
+        self._count += 1
+        self._index = self._count - 1
+
+    def current(self):
+        """Obtiene el estado actual o None si la pila está vacía."""
+        if self._index < 0:
+            return None
+        return self._buffer[self._slot(self._index)]
+
+    def can_undo(self):
+        return self._index > 0
+
+    def can_redo(self):
+        return self._index < self._count - 1
+
+    def undo(self):
+        """Retrocede un estado y lo devuelve (None si no hay más)."""
+        if not self.can_undo():
+            return None
+        self._index -= 1
+        return self.current()
+
+    def redo(self):
+        """Avanza un estado y lo devuelve (None si no hay más)."""
+        if not self.can_redo():
+            return None
+        self._index += 1
+        return self.current()
+
+    def states(self):
+        """Devuelve los estados almacenados, del más antiguo al más reciente."""
+        return [self._buffer[self._slot(i)] for i in range(self._count)]
+
+    def clear(self):
+        """Vacía la pila liberando todos los estados."""
+        for i in range(self._count):
+            self._drop(i)
+        self._start = 0
+        self._count = 0
+        self._index = -1
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def current_id(self):
+        """Identificador del estado actual (None si la pila está vacía).
+
+        Nunca se repite en la misma pila, aunque el buffer dé la vuelta o se
+        descarte la rama de rehacer, así que sirve para saber si la pila
+        sigue en el estado en que se registró una edición.
+        """
+        if self._index < 0:
+            return None
+        return self._ids[self._slot(self._index)]
+
+    @property
+    def redo_id(self):
+        """Identificador del estado al que llevaría rehacer (None si no hay)."""
+        if not self.can_redo():
+            return None
+        return self._ids[self._slot(self._index + 1)]
+
+
+class HistoryTimeline:
+    """Índice global opcional del orden en que se confirmaron las ediciones.
+
+    Solo guarda rutas de imagen (nunca estados), por lo que no retiene datos
+    de imagen y sobrevive a que las imágenes cambien de vista. Cada entrada
+    es una tupla de pares (ruta, identificador del estado que dejó la
+    edición en el UndoStack de la imagen): un solo par para una edición
+    normal o varios para una transacción. El identificador permite saltar
+    las imágenes que ya se han deshecho o rehecho por separado con su
+    propia pila.
+    """
+
+    DEFAULT_CAPACITY = 500
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._done = deque(maxlen=capacity)
+        self._undone = deque(maxlen=capacity)
+
+    def record(self, entry):
+        """Registra una edición confirmada como pares (ruta, identificador del estado)."""
+        self._done.append(tuple(entry))
+        self._undone.clear()
+
+    def peek_undo(self):
+        return self._done[-1] if self._done else None
+
+    def peek_redo(self):
+        return self._undone[-1] if self._undone else None
+
+    def pop_undo(self):
+        """Mueve la última entrada a la pila de rehacer y la devuelve."""
+        if not self._done:
+            return None
+        entry = self._done.pop()
+        self._undone.append(entry)
+        return entry
+
+    def pop_redo(self):
+        """Mueve la última entrada deshecha a la pila de hechos y la devuelve."""
+        if not self._undone:
+            return None
+        entry = self._undone.pop()
+        self._done.append(entry)
+        return entry
+
+    def discard(self, path):
+        """Elimina las entradas que hacen referencia a una imagen cuyo historial se descarta."""
+        for entries in (self._done, self._undone):
+            kept = [entry for entry in entries if all(other != path for other, _ in entry)]
+            if len(kept) != len(entries):
+                entries.clear()
+                entries.extend(kept)
+
+    def clear(self):
+        self._done.clear()
+        self._undone.clear()
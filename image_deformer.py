@@ -1,9 +1,64 @@
-import cv2
-import numpy as np
+import logging
+from lazy_import import lazy_module
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Conversión de OpenCV de cada modo de PIL a BGRA (por nombre, para no cargar cv2 al importar)
+BGRA_CONVERSIONS = {'L': 'COLOR_GRAY2BGRA', 'RGB': 'COLOR_RGB2BGRA', 'RGBA': 'COLOR_RGBA2BGRA'}
+
+def warped_shape(h, w):
+    """Forma (alto, ancho) del resultado de warp_perspective para una imagen de h x w."""
+    margin = int(max(w, h) * 0.2)  # 20% de margen
+    return h + 2*margin, w + 2*margin
+
+
+def warp_perspective(original, dst_points):
+    """Deforma un array BGRA llevando sus esquinas a dst_points.
+
+    Es una función pura (no depende de un ImageDeformer) para poder
+    ejecutarla en un proceso de trabajo sobre memoria compartida.
+    """
+    h, w = original.shape[:2]
+    src_points = np.array([[0, 0], [w-1, 0], [w-1, h-1], [0, h-1]], dtype=np.float32)
+    dst_points = np.array(dst_points, dtype=np.float32)
+
+    # Crear un lienzo más grande para evitar recortes
+    border = int(max(w, h) * 0.5)  # 50% de margen
+    canvas = np.zeros((h + 2*border, w + 2*border, 4), dtype=original.dtype)
+    canvas[border:border+h, border:border+w] = original
+
+    # Ajustar los puntos al nuevo lienzo
+    src_points_adj = src_points + np.array([border, border], dtype=np.float32)
+    dst_points_adj = dst_points + np.array([border, border], dtype=np.float32)
+
+    # Aplicar la transformación
+    matrix = cv2.getPerspectiveTransform(src_points_adj, dst_points_adj)
+    warped = cv2.warpPerspective(
+        canvas, matrix, (w + 2*border, h + 2*border),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=(0, 0, 0, 0)  # Transparente
+    )
+
+    # Recortar al tamaño original más un margen
+    margin = int(max(w, h) * 0.2)  # 20% de margen
+    return warped[border-margin:border+h+margin, border-margin:w+border+margin]
+
+
+def pil_to_bgra(pil_image):
+    """Convierte una imagen PIL (L, RGB o RGBA) al array BGRA que deforma OpenCV."""
+    if pil_image.mode not in BGRA_CONVERSIONS:
+        pil_image = pil_image.convert('RGBA')
+    return cv2.cvtColor(np.asarray(pil_image), getattr(cv2, BGRA_CONVERSIONS[pil_image.mode]))
+
 
 class ImageDeformer:
     def __init__(self):
-        self.original = None
+        self._original = None
+        self._source = None  # Imagen PIL pendiente de convertir a BGRA
         self.deformed = None
         self.points = None
         self.selected_point = -1
@@ -32,32 +87,21 @@ class ImageDeformer:
 
     def load_image_from_pil(self, pil_image):
         """Carga una imagen desde un objeto PIL.Image"""
-        if pil_image is None:
-            return False
-
-        # Convertir PIL Image a numpy array
-        self.original = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGBA2BGRA)
-
-        h, w = self.original.shape[:2]
-        self.points = np.array([
-            [0, 0],      # Top-left
-            [w-1, 0],    # Top-right
-            [w-1, h-1],  # Bottom-right
-            [0, h-1]     # Bottom-left
-        ], dtype=np.float32)
-
-        return True
+        return self.load_pil_image(pil_image)
 
     def load_pil_image(self, pil_image):
-        """Carga una imagen PIL con soporte para transparencia"""
+        """Carga una imagen PIL (L, RGB o RGBA).
+
+        La conversión a BGRA se aplaza hasta que se deforma la imagen por
+        primera vez: las imágenes que no se deforman no pagan el canal alfa.
+        """
         if pil_image is None:
             return False
 
-        # Convertir imagen PIL a formato OpenCV
-        import numpy as np
-        self.original = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGBA2BGRA)
+        self.original = None
+        self._source = pil_image
 
-        h, w = self.original.shape[:2]
+        w, h = pil_image.size
         self.points = np.array([
             [0, 0],      # Top-left
             [w-1, 0],    # Top-right
@@ -67,43 +111,68 @@ class ImageDeformer:
 
         return True
 
+    @property
+    def original(self):
+        """Array BGRA de la imagen (se crea al usarlo si se cargó desde PIL)."""
+        if self._original is None and self._source is not None:
+            self._original = pil_to_bgra(self._source)
+            self._source = None
+        return self._original
+
+    @original.setter
+    def original(self, value):
+        self._original = value
+        self._source = None
+
+    @property
+    def loaded_original(self):
+        """El array BGRA si ya existe, sin crearlo (para contabilizar memoria)."""
+        return self._original
+
+    def image_size(self):
+        """Tamaño (ancho, alto) de la imagen cargada, sin convertirla, o None."""
+        if self._source is not None:
+            return self._source.size
+        if self._original is not None:
+            return self._original.shape[1], self._original.shape[0]
+        return None
+
     def deform_image(self, custom_points=None):
         """Aplica la deformación perspectiva a la imagen"""
         if self.original is None:
             return None
 
-        h, w = self.original.shape[:2]
-        src_points = np.array([[0, 0], [w-1, 0], [w-1, h-1], [0, h-1]], dtype=np.float32)
         dst_points = self.points if custom_points is None else np.array(custom_points, dtype=np.float32)
 
         try:
-            # Crear un lienzo más grande para evitar recortes
-            border = int(max(w, h) * 0.5)  # 50% de margen
-            canvas = np.zeros((h + 2*border, w + 2*border, 4), dtype=self.original.dtype)
-            canvas[border:border+h, border:border+w] = self.original
-
-            # Ajustar los puntos al nuevo lienzo
-            src_points_adj = src_points + np.array([border, border], dtype=np.float32)
-            dst_points_adj = dst_points + np.array([border, border], dtype=np.float32)
-
-            # Aplicar la transformación
-            matrix = cv2.getPerspectiveTransform(src_points_adj, dst_points_adj)
-            warped = cv2.warpPerspective(
-                canvas, matrix, (w + 2*border, h + 2*border),
-                flags=cv2.INTER_LINEAR,
-                borderMode=cv2.BORDER_CONSTANT,
-                borderValue=(0, 0, 0, 0)  # Transparente
-            )
-
-            # Recortar al tamaño original más un margen
-            margin = int(max(w, h) * 0.2)  # 20% de margen
-            self.deformed = warped[border-margin:border+h+margin, border-margin:w+border+margin]
-
+            self.deformed = self.render(dst_points)
             return self.deformed.copy()
         except Exception as e:
-            print(f"Error en deform_image: {e}")
+            logger.error("Error en deform_image: %s", e)
             return self.original.copy()
 
+    def render(self, dst_points):
+        """Calcula la deformación para unos puntos sin modificar el estado.
+
+        Puede llamarse desde un hilo de trabajo: solo lee la imagen original.
+        """
+        return warp_perspective(self.original, dst_points)
+
+    def render_pil(self, dst_points):
+        """Como render, pero devuelve también la imagen PIL en RGBA.
+
+        Returns:
+            tuple - (array BGRA, PIL.Image RGBA)
+        """
+        deformed = self.render(dst_points)
+        return deformed, self.to_pil(deformed)
+
+    @staticmethod
+    def to_pil(deformed):
+        """Convierte un array BGRA deformado en una imagen PIL RGBA."""
+        from PIL import Image
+        return Image.fromarray(cv2.cvtColor(deformed, cv2.COLOR_BGRA2RGBA))
+
     def get_deformed_image(self):
         """Obtiene la última imagen deformada generada"""
         return self.deformed.copy() if self.deformed is not None else None
@@ -130,6 +199,15 @@ class ImageDeformer:
             ], dtype=np.float32)
             self.deform_image()
 
+    def reset_points(self):
+        """Coloca los puntos en las esquinas de la imagen sin recalcular la deformación"""
+        size = self.image_size()
+        if size is not None:
+            w, h = size
+            self.points = np.array([
+                [0, 0], [w-1, 0], [w-1, h-1], [0, h-1]
+            ], dtype=np.float32)
+
     def set_points(self, points):
         """Establece los puntos de deformación"""
         if len(points) == 4:
@@ -1,21 +1,99 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import logging
 import os
 import sys
-from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QLabel, QFileDialog, QGridLayout,
                             QScrollArea, QSpinBox, QAction, QToolBar,
                             QStatusBar, QMessageBox, QTabWidget, QLineEdit,
                             QSlider, QStyleFactory, QMenu, QFrame, QDockWidget,
-                            QShortcut, QComboBox)
-from PyQt5.QtCore import Qt, QSize, pyqtSlot, QTimer, QPropertyAnimation, QEasingCurve, QPoint, QRect
+                            QShortcut, QComboBox, QCheckBox, QTableWidget,
+                            QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt, QObject, QSize, pyqtSignal, pyqtSlot, QTimer, QPropertyAnimation, QEasingCurve, QPoint, QRect
 from PyQt5.QtGui import QIcon, QKeySequence, QTransform, QPalette, QColor, QFont
 from image_view import ImageView
-from PIL import Image
 from translations import Translator
+from history import HistoryTimeline, UndoStack
+from journal import EditJournal, replay, compact
+from snapshot_store import SnapshotStore
+from settings import Settings
+from marquee_label import MarqueeLabel
+from image_processor import ImageProcessor
+from framing import auto_frame, smart_crop, open_proxy
+from dedupe import dhash, DuplicateIndex
+from metadata import MetadataIndex, SORT_KEYS, FILTERS, probe
+from metrics import metrics
+from memory import memory_report, VIEW_CATEGORIES
+from render_service import RenderService, JobCancelled, PRIORITY_VISIBLE, PRIORITY_PREFETCH, PRIORITY_EXPORT
+from shared_buffers import SharedBufferPool
+from process_jobs import export_image, export_unedited, export_region, decode_shared, warp_shared, export_shared
+from roi_decode import crop_geometry
+from functools import partial
+from collections import OrderedDict
 import math
 
+logger = logging.getLogger(__name__)
+
+# Tramos de tiempo que se muestran en la barra de estado
+READOUT_SPANS = ('decode', 'convert', 'deform', 'render', 'encode', 'write')
+
+
+class BatchSignals(QObject):
+    """Lleva al hilo de la interfaz los resultados de los hilos de trabajo."""
+
+    finished = pyqtSignal(object, object)  # (vista, trabajo)
+
+
+class RenderSignals(QObject):
+    """Lleva al hilo de la interfaz los trabajos terminados del servicio de render."""
+
+    decoded = pyqtSignal(object)   # trabajo de decodificación
+    exported = pyqtSignal(object)  # trabajo de exportación
+    hashed = pyqtSignal(object)    # trabajo de dHash de una importación
+    probed = pyqtSignal(object)    # trabajo de lectura de una cabecera
+
+
+def is_decode_job(job):
+    """Indica si un trabajo del servicio de render es una decodificación de request_decode.
+
+    La prioridad de precarga la comparten otros trabajos de segundo plano
+    (lotes sobre imágenes sin vista) que no deben cancelarse al cambiar de página.
+    """
+    return job.key is not None and job.key[0] == 'decode'
+
+
+def render_batch_deform(deformer, points, pool=None, run=None):
+    """Calcula en un hilo de trabajo la deformación de una vista del lote.
+
+    Con un pool de memoria compartida la deformación se hace en un proceso
+    de trabajo (run) sin serializar los píxeles.
+    """
+    if pool is None:
+        deformed, pil_image = deformer.render_pil(points)
+    else:
+        deformed = warp_shared(deformer.original, points, pool, run)
+        pil_image = deformer.to_pil(deformed)
+    return deformed, pil_image, ImageProcessor.pil_to_qimage(pil_image)
+
+
+def frame_unloaded(path, compute, max_size):
+    """Calcula un marco sobre una imagen sin vista cargada (hilo de trabajo).
+
+    La imagen se decodifica reducida (open_proxy) y el marco se devuelve en
+    coordenadas de la imagen original.
+
+    Args:
+        compute: callable - compute(imagen PIL) devuelve (x, y, ancho, alto) o None
+    """
+    image, factor = open_proxy(path, max_size)
+    frame = compute(ImageProcessor.to_native_mode(image))
+    if frame is None:
+        return None
+    return tuple(value * factor for value in frame)
+
+
 class ImageEditor(QMainWindow):
     """Aplicación principal para editar imágenes."""
 
@@ -45,24 +123,94 @@ class ImageEditor(QMainWindow):
     def __init__(self):
         super().__init__()
 
+        # Preferencias persistentes
+        self.settings = Settings()
+        ImageView.configure_rendering(self.settings.get('render/adaptive_quality'),
+                                      self.settings.get('render/idle_timeout_ms'))
+
         # Inicializar el traductor (por defecto en español)
         self.translator = Translator('es')
 
         # Configuración de la ventana
-        self.setWindowTitle(self.translator.get_text('window_title'))
+        self.translator.bind(self, 'window_title', 'setWindowTitle')
         self.setMinimumSize(1200, 800)
 
-        # Variables de estado
+        # Variables de estado: imported_images guarda todas las imágenes en
+        # orden de importación y loaded_images las de la galería, ya ordenadas
+        # y filtradas
+        self.imported_images = []
         self.loaded_images = []
+        self.metadata = MetadataIndex()
         self.current_page = 0
         self.images_per_page = 8  # 4x2 grid
         self.grid_size = (4, 2)
         self.target_width = 1024
         self.target_height = 1024
 
-        # Inicializar historial para deshacer/rehacer
-        self.history = []
-        self.history_index = -1
+        # Cada imagen tiene su propio historial, guardado por ruta para que
+        # siga con ella cuando cambia de vista al ordenar o filtrar; la línea
+        # de tiempo global solo recuerda el orden de las ediciones para el
+        # deshacer global opcional
+        self.histories = {}
+        self.timeline = HistoryTimeline()
+        self.global_undo = False
+
+        # Vistas marcadas con Ctrl+clic y lote en curso de "aplicar a seleccionadas"
+        self.marked_views = []
+        self.batch = None
+        self.transaction_views = None
+        self.batch_signals = BatchSignals()
+        self.batch_signals.finished.connect(self.on_batch_item_finished)
+
+        # Servicio de render: decodificación, precarga, lotes y exportación
+        # comparten sus hilos con prioridad para lo que está en pantalla
+        # Con procesos, las imágenes viajan en memoria compartida en vez de serializarse
+        use_processes = self.settings.get('render/use_processes')
+        self.render_service = RenderService(processes=None if use_processes else 0)
+        self.shared_buffers = (SharedBufferPool(self.settings.get('render/shared_pool_mb') * 1024 * 1024)
+                               if use_processes else None)
+        if use_processes:
+            run = self.render_service.run_in_process
+            self._load_image = partial(decode_shared, pool=self.shared_buffers, run=run)
+            self._export_image = partial(export_shared, pool=self.shared_buffers, run=run)
+        else:
+            self._load_image = None
+            self._export_image = export_image
+        self.render_signals = RenderSignals()
+        self.render_signals.decoded.connect(self.on_decoded)
+        self.render_signals.exported.connect(self.on_export_finished)
+        self.render_signals.hashed.connect(self.on_hashed)
+        self.render_signals.probed.connect(self.on_probed)
+        # El mismo callback en todas las peticiones para que se deduplique
+        self._decoded_callback = self.render_signals.decoded.emit
+        self._exported_callback = self.render_signals.exported.emit
+        self._hashed_callback = self.render_signals.hashed.emit
+        self._probed_callback = self.render_signals.probed.emit
+
+        # Vistas que esperan su imagen (vista -> ruta) e imágenes precargadas (ruta -> decodificada)
+        self.pending_views = {}
+        self.decoded_cache = OrderedDict()
+        self.export_state = None
+
+        # Instantáneas de píxeles (deformaciones) compartidas por todas las vistas
+        self.snapshot_store = SnapshotStore()
+
+        # Última receta confirmada de cada imagen (ruta -> receta)
+        self.recipes = {}
+
+        # Hashes perceptuales de las imágenes importadas y duplicados detectados (ruta -> original)
+        self.duplicate_index = DuplicateIndex(self.settings.get('import/duplicate_distance'))
+        self.duplicates = {}
+        # Importación en curso mientras se calculan sus hashes (None si no hay)
+        self.import_state = None
+        # Cabeceras que se están leyendo para el índice de metadatos (None si no hay)
+        self.probe_state = None
+
+        # Páginas de la galería cuyas vistas ya tienen su imagen cargada
+        self.populated_pages = set()
+
+        # Diario de ediciones para recuperar la sesión tras un cierre inesperado
+        self.journal = EditJournal()
 
         # Configurar atajos de teclado
         self.setup_shortcuts()
@@ -80,6 +228,9 @@ class ImageEditor(QMainWindow):
         if hasattr(self, 'shortcuts_message'):
             self.statusBar.showMessage(self.shortcuts_message)
 
+        # Recuperar la sesión anterior si quedó un diario sin cerrar
+        self.restore_session()
+
     def setup_shortcuts(self):
         """Configura los atajos de teclado para las herramientas."""
         # Atajos para las herramientas de edición
@@ -111,6 +262,36 @@ class ImageEditor(QMainWindow):
         self.reset_shortcut = QShortcut(QKeySequence("T"), self)
         self.reset_shortcut.activated.connect(self.reset_current_image)
 
+        # Aplicar la edición actual a las imágenes marcadas (Ctrl+Shift+V)
+        self.apply_selected_shortcut = QShortcut(QKeySequence("Ctrl+Shift+V"), self)
+        self.apply_selected_shortcut.activated.connect(self.apply_edit_to_selected)
+
+        # Encuadre automático al contenido (F)
+        self.auto_frame_shortcut = QShortcut(QKeySequence("F"), self)
+        self.auto_frame_shortcut.activated.connect(self.auto_frame_images)
+
+        # Recorte inteligente sobre la zona con más detalle (Shift+F)
+        self.smart_crop_shortcut = QShortcut(QKeySequence("Shift+F"), self)
+        self.smart_crop_shortcut.activated.connect(self.smart_crop_images)
+
+        # Mostrar u ocultar las métricas en la barra de estado (Ctrl+Shift+I)
+        self.metrics_readout_shortcut = QShortcut(QKeySequence("Ctrl+Shift+I"), self)
+        self.metrics_readout_shortcut.activated.connect(
+            lambda: self.set_metrics_readout(not self.metrics_timer.isActive()))
+
+        # Exportar las métricas de la sesión a JSON (Ctrl+Shift+M)
+        self.dump_metrics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+M"), self)
+        self.dump_metrics_shortcut.activated.connect(self.dump_metrics)
+
+        # Mostrar u ocultar el panel de diagnóstico de memoria (Ctrl+Shift+D)
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(
+            lambda: self.diagnostics_dock.setVisible(not self.diagnostics_dock.isVisible()))
+
+        # Quitar las marcas de selección múltiple (Esc)
+        self.clear_marks_shortcut = QShortcut(QKeySequence("Escape"), self)
+        self.clear_marks_shortcut.activated.connect(self.clear_marked_views)
+
         # Los atajos se mostrarán en la barra de estado después de inicializar la UI
         self.shortcuts_message = self.translator.get_text('shortcuts')
 
@@ -130,15 +311,11 @@ class ImageEditor(QMainWindow):
         top_panel = QWidget()
         top_layout = QHBoxLayout(top_panel)
 
-        # Botones de carga y guardado con estilo
-        button_style = "QPushButton { font-size: 12pt; padding: 8px; border-radius: 8px; }"
-
-        load_btn = QPushButton(self.translator.get_text('load_images'))
-        load_btn.setStyleSheet(button_style)
+        # Botones de carga y guardado (el estilo lo aporta el tema)
+        load_btn = self.translator.bind(QPushButton(), 'load_images')
         load_btn.clicked.connect(self.load_images)
 
-        save_btn = QPushButton(self.translator.get_text('save_images'))
-        save_btn.setStyleSheet(button_style)
+        save_btn = self.translator.bind(QPushButton(), 'save_images')
         save_btn.clicked.connect(self.save_images)
 
         top_layout.addWidget(load_btn)
@@ -148,7 +325,7 @@ class ImageEditor(QMainWindow):
         resolution_widget = QWidget()
         resolution_layout = QHBoxLayout(resolution_widget)
 
-        resolution_label = QLabel(self.translator.get_text('output_resolution'))
+        resolution_label = self.translator.bind(QLabel(), 'output_resolution')
         resolution_label.setStyleSheet("font-size: 12pt;")
         resolution_layout.addWidget(resolution_label)
 
@@ -177,6 +354,12 @@ class ImageEditor(QMainWindow):
 
         top_layout.addWidget(resolution_widget)
 
+        # Exportar también la máscara de outpainting de cada imagen
+        self.mask_checkbox = self.translator.bind(QCheckBox(), 'export_mask')
+        self.mask_checkbox.setChecked(self.settings.get('export/outpaint_mask'))
+        self.mask_checkbox.toggled.connect(lambda checked: self.settings.set('export/outpaint_mask', checked))
+        top_layout.addWidget(self.mask_checkbox)
+
         # Se eliminaron los controles de estiramiento
 
         # Añadir panel superior al layout principal
@@ -184,6 +367,7 @@ class ImageEditor(QMainWindow):
 
         # Crear pestañas para la galería
         self.tab_widget = QTabWidget()
+        self.tab_widget.currentChanged.connect(self.on_page_changed)
         main_layout.addWidget(self.tab_widget)
 
         # Crear primera página de la galería
@@ -195,36 +379,51 @@ class ImageEditor(QMainWindow):
 
         # Se eliminaron los botones de zoom
 
-        # Botones de navegación con estilo
-        nav_button_style = "QPushButton { font-size: 14pt; padding: 10px; border-radius: 8px; }"
-
-        prev_page_btn = QPushButton(self.translator.get_text('prev_page'))
-        prev_page_btn.setStyleSheet(nav_button_style)
+        # Botones de navegación
+        prev_page_btn = self.translator.bind(QPushButton(), 'prev_page')
         prev_page_btn.setMinimumWidth(200)
         prev_page_btn.clicked.connect(self.prev_page)
 
         # Usar un emoji diferente para la flecha derecha
-        next_page_btn = QPushButton(self.translator.get_text('next_page'))
-        next_page_btn.setStyleSheet(nav_button_style)
+        next_page_btn = self.translator.bind(QPushButton(), 'next_page')
         next_page_btn.setMinimumWidth(200)
         next_page_btn.clicked.connect(self.next_page)
 
         # Botones de idioma
-        language_style = "QPushButton { font-size: 12pt; padding: 8px; border-radius: 8px; }"
-
-        spanish_btn = QPushButton(self.translator.get_text('spanish'))
-        spanish_btn.setStyleSheet(language_style)
+        spanish_btn = self.translator.bind(QPushButton(), 'spanish')
         spanish_btn.setMinimumWidth(100)
         spanish_btn.clicked.connect(lambda: self.change_language('es'))
 
-        english_btn = QPushButton(self.translator.get_text('english'))
-        english_btn.setStyleSheet(language_style)
+        english_btn = self.translator.bind(QPushButton(), 'english')
         english_btn.setMinimumWidth(100)
         english_btn.clicked.connect(lambda: self.change_language('en'))
 
         # Se eliminaron los botones de zoom
         bottom_layout.addWidget(spanish_btn)
         bottom_layout.addWidget(english_btn)
+
+        # Ordenación y filtrado de la galería por metadatos
+        sort_label = self.translator.bind(QLabel(), 'sort_by')
+        self.sort_combo = QComboBox()
+        for key in SORT_KEYS:
+            self.sort_combo.addItem(self.translator.get_text(f'sort_{key}'), key)
+        self.sort_combo.currentIndexChanged.connect(self.refresh_gallery_order)
+
+        self.sort_descending_btn = self.translator.bind(QPushButton(), 'descending')
+        self.sort_descending_btn.setCheckable(True)
+        self.sort_descending_btn.toggled.connect(self.refresh_gallery_order)
+
+        filter_label = self.translator.bind(QLabel(), 'filter')
+        self.filter_combo = QComboBox()
+        for key in FILTERS:
+            self.filter_combo.addItem(self.translator.get_text(f'filter_{key}'), key)
+        self.filter_combo.currentIndexChanged.connect(self.refresh_gallery_order)
+
+        bottom_layout.addWidget(sort_label)
+        bottom_layout.addWidget(self.sort_combo)
+        bottom_layout.addWidget(self.sort_descending_btn)
+        bottom_layout.addWidget(filter_label)
+        bottom_layout.addWidget(self.filter_combo)
         bottom_layout.addStretch()
         bottom_layout.addWidget(prev_page_btn)
         bottom_layout.addWidget(next_page_btn)
@@ -234,7 +433,17 @@ class ImageEditor(QMainWindow):
         # Barra de estado
         self.statusBar = QStatusBar()
         self.setStatusBar(self.statusBar)
-        self.statusBar.showMessage("Listo")
+        self.statusBar.showMessage(self.translator.get_text('ready'))
+
+        # Lectura opcional de las métricas en la barra de estado
+        self.metrics_label = QLabel()
+        self.statusBar.addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics_readout)
+        self.set_metrics_readout(self.settings.get('metrics/show_readout'))
+
+        # Panel de diagnóstico con la memoria de cada imagen
+        self.create_diagnostics_dock()
 
     def apply_theme(self, theme_index):
         """Aplica el tema seleccionado a la aplicación."""
@@ -255,71 +464,10 @@ class ImageEditor(QMainWindow):
         palette.setColor(QPalette.Highlight, theme['accent'])
         palette.setColor(QPalette.HighlightedText, QColor(255, 255, 255))
 
-        # Aplicar la paleta a la aplicación
-        self.setPalette(palette)
-
-        # Aplicar estilo a las pestañas
-        tab_style = f"""
-        QTabWidget::pane {{ /* El panel que contiene el contenido de las pestañas */
-            border: 1px solid {theme['border'].name()};
-            background-color: {theme['background'].name()};
-        }}
-
-        QTabBar::tab {{ /* Estilo de las pestañas */
-            background-color: {theme['tab_background'].name()};
-            color: {theme['tab_text'].name()};
-            border: 1px solid {theme['border'].name()};
-            border-bottom-color: {theme['border'].name()};
-            border-top-left-radius: 6px;
-            border-top-right-radius: 6px;
-            min-width: 6ex;
-            padding: 4px 8px;
-            font-size: 9pt;
-            margin-right: 2px;
-        }}
-
-        QTabBar::tab:selected, QTabBar::tab:hover {{
-            background-color: {theme['accent'].name()};
-            color: white;
-        }}
-
-        /* Estilo adicional para el contenedor de pestañas */
-        QTabWidget {{
-            background-color: {theme['background'].name()};
-        }}
-
-        /* Estilo para el widget que contiene las pestañas */
-        QTabWidget::tab-bar {{
-            background-color: {theme['background'].name()};
-            alignment: center;
-        }}
-        """
-
-        self.tab_widget.setStyleSheet(tab_style)
-
-        # Aplicar estilo a los botones de navegación
-        nav_button_style = f"""
-        QPushButton {{
-            font-size: 12pt;
-            padding: 8px;
-            border-radius: 8px;
-            background-color: {theme['button'].name()};
-            color: {theme['button_text'].name()};
-            border: 1px solid {theme['border'].name()};
-        }}
-
-        QPushButton:hover {{
-            background-color: {theme['accent'].name()};
-            color: white;
-        }}
-        """
-
-        # Actualizar estilo de los botones de navegación
-        for widget in self.findChildren(QPushButton):
-            widget.setStyleSheet(nav_button_style)
-
-        # Aplicar estilo a los elementos del menú
-        menu_style = f"""
+        # Una sola hoja de estilos para toda la aplicación: un cambio de tema
+        # la sustituye una vez en lugar de aplicar estilos widget a widget.
+        # Las reglas de pestañas y botones van al final para tener prioridad.
+        stylesheet = f"""
         QMenuBar {{
             background-color: {theme['background'].name()};
             color: {theme['foreground'].name()};
@@ -417,9 +565,70 @@ class ImageEditor(QMainWindow):
             background-color: black;
             color: white;
         }}
+
+        QTabWidget::pane {{ /* El panel que contiene el contenido de las pestañas */
+            border: 1px solid {theme['border'].name()};
+            background-color: {theme['background'].name()};
+        }}
+
+        QTabBar::tab {{ /* Estilo de las pestañas */
+            background-color: {theme['tab_background'].name()};
+            color: {theme['tab_text'].name()};
+            border: 1px solid {theme['border'].name()};
+            border-bottom-color: {theme['border'].name()};
+            border-top-left-radius: 6px;
+            border-top-right-radius: 6px;
+            min-width: 6ex;
+            padding: 4px 8px;
+            font-size: 9pt;
+            margin-right: 2px;
+        }}
+
+        QTabBar::tab:selected, QTabBar::tab:hover {{
+            background-color: {theme['accent'].name()};
+            color: white;
+        }}
+
+        /* Estilo adicional para el contenedor de pestañas */
+        QTabWidget {{
+            background-color: {theme['background'].name()};
+        }}
+
+        /* Estilo para el widget que contiene las pestañas */
+        QTabWidget::tab-bar {{
+            background-color: {theme['background'].name()};
+            alignment: center;
+        }}
+
+        QPushButton {{
+            font-size: 12pt;
+            padding: 8px;
+            border-radius: 8px;
+            background-color: {theme['button'].name()};
+            color: {theme['button_text'].name()};
+            border: 1px solid {theme['border'].name()};
+        }}
+
+        QPushButton:hover {{
+            background-color: {theme['accent'].name()};
+            color: white;
+        }}
+
+        /* Vista marcada para aplicar una edición en lote (propiedad "marked") */
+        ImageView[marked="true"] {{
+            border: 3px dashed {theme['accent'].name()};
+        }}
+
+        /* Vista de imagen seleccionada (propiedad dinámica "selected") */
+        ImageView[selected="true"] {{
+            border: 3px solid #3498db;
+        }}
         """
 
-        self.setStyleSheet(menu_style)
+        # Aplicar la paleta y la hoja de estilos a nivel de aplicación
+        app = QApplication.instance()
+        app.setPalette(palette)
+        app.setStyleSheet(stylesheet)
 
         # Configurar la barra de título (solo funciona en Windows)
         try:
@@ -449,7 +658,7 @@ class ImageEditor(QMainWindow):
                 byref(c_int(text_color)), sizeof(c_int)
             )
         except Exception as e:
-            print(f"No se pudo cambiar el color de la barra de título: {e}")
+            logger.debug("No se pudo cambiar el color de la barra de título: %s", e)
 
         # Guardar el tema actual
         self.current_theme = theme_index
@@ -464,7 +673,7 @@ class ImageEditor(QMainWindow):
 
         # Crear botones personalizados con emojis grandes y texto pequeño debajo
         # Función para crear botones con emojis
-        def create_tool_button(emoji, text, callback):
+        def create_tool_button(emoji, key, callback):
             button = QPushButton()
             button.setFixedSize(70, 70)  # Reducido en aproximadamente 30%
             layout = QVBoxLayout(button)
@@ -475,10 +684,11 @@ class ImageEditor(QMainWindow):
             emoji_label.setAlignment(Qt.AlignCenter)
             emoji_label.setStyleSheet("font-size: 24pt;")  # Reducido de 36pt a 24pt
 
-            text_label = QLabel(text)
+            # El texto se desplaza por sí solo únicamente si no cabe en el botón
+            text_label = self.translator.bind(MarqueeLabel(), key)
             text_label.setAlignment(Qt.AlignCenter)
             text_label.setStyleSheet("font-size: 8pt;")  # Reducido de 10pt a 8pt
-            text_label.setObjectName("marquee_text")  # Nombre para identificar en animación
+            text_label.setObjectName("marquee_text")
 
             layout.addWidget(emoji_label)
             layout.addWidget(text_label)
@@ -487,16 +697,16 @@ class ImageEditor(QMainWindow):
             return button
 
         # Botones de edición con atajos de teclado
-        move_btn = create_tool_button("Ⓜ️", self.translator.get_text('move'), lambda: self.set_edit_mode(ImageView.MODE_MOVE))
+        move_btn = create_tool_button("Ⓜ️", 'move', lambda: self.set_edit_mode(ImageView.MODE_MOVE))
         toolbar_layout.addWidget(move_btn)
 
-        resize_btn = create_tool_button("🔛", self.translator.get_text('resize'), lambda: self.set_edit_mode(ImageView.MODE_RESIZE))
+        resize_btn = create_tool_button("🔛", 'resize', lambda: self.set_edit_mode(ImageView.MODE_RESIZE))
         toolbar_layout.addWidget(resize_btn)
 
-        rotate_btn = create_tool_button("🔄️", self.translator.get_text('rotate'), lambda: self.set_edit_mode(ImageView.MODE_ROTATE))
+        rotate_btn = create_tool_button("🔄️", 'rotate', lambda: self.set_edit_mode(ImageView.MODE_ROTATE))
         toolbar_layout.addWidget(rotate_btn)
 
-        deform_btn = create_tool_button("🅳", self.translator.get_text('deform'), lambda: self.set_edit_mode(ImageView.MODE_DEFORM))
+        deform_btn = create_tool_button("🅳", 'deform', lambda: self.set_edit_mode(ImageView.MODE_DEFORM))
         toolbar_layout.addWidget(deform_btn)
 
         # Separador
@@ -506,10 +716,10 @@ class ImageEditor(QMainWindow):
         toolbar_layout.addWidget(separator1)
 
         # Botones de deshacer/rehacer con atajos de teclado
-        undo_btn = create_tool_button("↩️", self.translator.get_text('undo'), self.undo)
+        undo_btn = create_tool_button("↩️", 'undo', self.undo)
         toolbar_layout.addWidget(undo_btn)
 
-        redo_btn = create_tool_button("↪️", self.translator.get_text('redo'), self.redo)
+        redo_btn = create_tool_button("↪️", 'redo', self.redo)
         toolbar_layout.addWidget(redo_btn)
 
         # Separador
@@ -519,9 +729,21 @@ class ImageEditor(QMainWindow):
         toolbar_layout.addWidget(separator2)
 
         # Botón de reset con atajo de teclado
-        reset_btn = create_tool_button("®️", self.translator.get_text('reset'), self.reset_current_image)
+        reset_btn = create_tool_button("®️", 'reset', self.reset_current_image)
         toolbar_layout.addWidget(reset_btn)
 
+        # Botón para copiar la edición actual a las imágenes marcadas
+        apply_selected_btn = create_tool_button("📋", 'apply_to_selected', self.apply_edit_to_selected)
+        toolbar_layout.addWidget(apply_selected_btn)
+
+        # Botón de encuadre automático al contenido
+        auto_frame_btn = create_tool_button("🔲", 'auto_frame', self.auto_frame_images)
+        toolbar_layout.addWidget(auto_frame_btn)
+
+        # Botón de recorte inteligente
+        smart_crop_btn = create_tool_button("🎯", 'smart_crop', self.smart_crop_images)
+        toolbar_layout.addWidget(smart_crop_btn)
+
         # Separador
         separator3 = QFrame()
         separator3.setFrameShape(QFrame.HLine)
@@ -529,14 +751,14 @@ class ImageEditor(QMainWindow):
         toolbar_layout.addWidget(separator3)
 
         # Botón para cambiar el tema
-        theme_btn = create_tool_button("🌗", self.translator.get_text('theme'), self.toggle_theme)
+        theme_btn = create_tool_button("🌗", 'theme', self.toggle_theme)
         toolbar_layout.addWidget(theme_btn)
 
         # Añadir espacio al final
         toolbar_layout.addStretch()
 
         # Crear un dock widget para contener la barra de herramientas
-        dock = QDockWidget(self.translator.get_text('tools'), self)
+        dock = self.translator.bind(QDockWidget(self), 'tools', 'setWindowTitle')
         dock.setWidget(toolbar_widget)
         dock.setFeatures(QDockWidget.NoDockWidgetFeatures)  # No permitir mover/cerrar
         dock.setAllowedAreas(Qt.LeftDockWidgetArea)  # Solo permitir en el lado izquierdo
@@ -552,12 +774,12 @@ class ImageEditor(QMainWindow):
             'undo': undo_btn,
             'redo': redo_btn,
             'reset': reset_btn,
+            'apply_to_selected': apply_selected_btn,
+            'auto_frame': auto_frame_btn,
+            'smart_crop': smart_crop_btn,
             'theme': theme_btn
         }
 
-        # Iniciar la animación de desplazamiento para los textos
-        self.start_marquee_animation()
-
     def create_gallery_page(self):
         """Crea una nueva página en la galería."""
         page = QWidget()
@@ -568,6 +790,7 @@ class ImageEditor(QMainWindow):
             for col in range(self.grid_size[0]):
                 image_view = ImageView()
                 image_view.setMinimumSize(250, 250)
+                image_view.snapshot_store = self.snapshot_store
                 image_view.imageModified.connect(self.on_image_modified)
                 # Hacer que la vista sea seleccionable al hacer clic
                 image_view.mousePressEvent = lambda event, view=image_view: self.on_image_view_clicked(event, view)
@@ -589,13 +812,206 @@ class ImageEditor(QMainWindow):
         if not file_paths:
             return
 
-        # Añadir nuevas imágenes a la lista
-        self.loaded_images.extend(file_paths)
+        if self.import_state is not None or self.probe_state is not None:
+            self.statusBar.showMessage(self.translator.get_text('import_busy'))
+            return
 
-        # Actualizar la galería
-        self.update_gallery()
+        self.filter_duplicates(file_paths)
 
-        self.statusBar.showMessage(f"{self.translator.get_text('images_loaded')} {len(file_paths)}")
+    def filter_duplicates(self, file_paths):
+        """Descarta (o señala) las imágenes repetidas de una importación.
+
+        Las rutas ya cargadas se descartan en el momento. Para el resto se
+        calcula un dHash sobre una copia reducida en trabajos de segundo
+        plano; on_hashed busca cada uno en el índice, a una distancia de
+        Hamming dentro del umbral. Al terminar se leen las cabeceras de las
+        aceptadas (probe_metadata) y finish_import las añade a la galería.
+        """
+        # Rutas nuevas, sin repetir las ya cargadas ni las de la propia selección
+        known = set(self.imported_images)
+        new_paths = []
+        for path in file_paths:
+            if path not in known:
+                known.add(path)
+                new_paths.append(path)
+
+        # Las imágenes de una sesión restaurada se indexan antes que las nuevas
+        pending = [path for path in self.imported_images if path not in self.duplicate_index]
+        order = [(path, False) for path in pending] + [(path, True) for path in new_paths]
+
+        self.import_state = {
+            'order': order,        # (ruta, comprobar si es duplicado) en orden de importación
+            'hashes': {},          # ruta -> dHash ya calculado
+            'next': 0,             # Siguiente posición de order que se indexa
+            'reported': 0,         # Posición mostrada en la barra de estado
+            'accepted': [],
+            'skipped': len(file_paths) - len(new_paths),
+            'flagged': 0,
+            'flag': self.settings.get('import/duplicate_action') == 'flag',
+        }
+        if not order:
+            self.probe_metadata([], self.finish_import)
+            return
+
+        for path, _ in order:
+            self.render_service.submit(dhash, path, key=('dhash', path), priority=PRIORITY_PREFETCH,
+                                       callback=self._hashed_callback)
+        self.statusBar.showMessage(f"{self.translator.get_text('checking_duplicates')} 0/{len(order)}")
+
+    def on_hashed(self, job):
+        """Indexa los hashes que ya se pueden procesar en orden (hilo de la interfaz).
+
+        Los trabajos terminan en cualquier orden, pero el índice se alimenta
+        en el de importación para que, entre dos duplicados, se quede siempre
+        el primero.
+        """
+        state = self.import_state
+        if state is None:
+            return
+        try:
+            value = job.result()
+        except Exception:
+            value = None  # dhash ya registra sus errores de lectura
+        state['hashes'][job.key[1]] = value
+
+        order = state['order']
+        while state['next'] < len(order) and order[state['next']][0] in state['hashes']:
+            path, check = order[state['next']]
+            value = state['hashes'].pop(path)
+            state['next'] += 1
+            original = self.duplicate_index.find(value) if check else None
+            if original is not None:
+                if not state['flag']:
+                    state['skipped'] += 1
+                    continue
+                state['flagged'] += 1
+                self.duplicates[path] = original
+            self.duplicate_index.add(path, value)
+            if check:
+                state['accepted'].append(path)
+
+        if state['next'] == len(order):
+            self.probe_metadata(state['accepted'], self.finish_import)
+        elif state['next'] - state['reported'] >= 100:
+            state['reported'] = state['next']
+            self.statusBar.showMessage(
+                f"{self.translator.get_text('checking_duplicates')} {state['next']}/{len(order)}")
+
+    def probe_metadata(self, paths, on_done):
+        """Lee en segundo plano las cabeceras de las rutas que faltan en el índice de metadatos.
+
+        Cada cabecera es un trabajo del servicio de render; on_probed recoge
+        las filas y, cuando están todas, las indexa de una vez y llama a on_done.
+        """
+        paths = self.metadata.missing(paths)
+        self.probe_state = {'paths': paths, 'rows': {}, 'on_done': on_done, 'reported': 0}
+        if not paths:
+            self.finish_probe()
+            return
+
+        for path in paths:
+            self.render_service.submit(probe, path, key=('probe', path), priority=PRIORITY_PREFETCH,
+                                       callback=self._probed_callback)
+        self.statusBar.showMessage(f"{self.translator.get_text('reading_metadata')} 0/{len(paths)}")
+
+    def on_probed(self, job):
+        """Recoge la fila de una cabecera leída (hilo de la interfaz)."""
+        state = self.probe_state
+        if state is None:
+            return
+        try:
+            state['rows'][job.key[1]] = job.result()
+        except JobCancelled:
+            return
+        except Exception as e:
+            logger.error("Error al leer la cabecera de %s: %s", job.key[1], e)
+            state['rows'][job.key[1]] = (0, 0, 0.0, 0.0, 0, 0.0)
+
+        done = len(state['rows'])
+        if done == len(state['paths']):
+            self.finish_probe()
+        elif done - state['reported'] >= 100:
+            state['reported'] = done
+            self.statusBar.showMessage(f"{self.translator.get_text('reading_metadata')} {done}/{len(state['paths'])}")
+
+    def finish_probe(self):
+        """Indexa las cabeceras leídas y continúa con lo que esperaba por ellas."""
+        state, self.probe_state = self.probe_state, None
+        self.metadata.add_rows(state['paths'], [state['rows'][path] for path in state['paths']])
+        state['on_done']()
+
+    def finish_import(self):
+        """Añade a la galería las imágenes aceptadas de la importación en curso."""
+        state, self.import_state = self.import_state, None
+        file_paths = state['accepted']
+        if file_paths:
+            self.imported_images.extend(file_paths)
+            self.journal.append({'op': 'load', 'paths': file_paths})
+            self.refresh_gallery_order()
+
+        # Las rutas repetidas y los duplicados descartados se cuentan aparte de los señalados
+        message = f"{self.translator.get_text('images_loaded')} {len(file_paths)}"
+        if state['skipped']:
+            message += f" · {self.translator.get_text('duplicates_skipped')} {state['skipped']}"
+        if state['flagged']:
+            message += f" · {self.translator.get_text('duplicates_flagged')} {state['flagged']}"
+        self.statusBar.showMessage(message)
+
+    def restore_session(self):
+        """Reproduce el diario de ediciones para recuperar la sesión anterior.
+
+        Solo se restauran la lista de imágenes y sus recetas; las imágenes se
+        decodifican y se renderizan cuando se muestra su página. Si otra
+        instancia está usando el diario no se recupera nada y esta instancia
+        trabaja sin diario, para no mezclar las dos sesiones.
+        """
+        if not self.journal.lock():
+            logger.warning("Otra instancia está usando el diario %s; esta sesión no se registrará", self.journal.path)
+            self.statusBar.showMessage(self.translator.get_text('journal_locked'))
+            return
+
+        try:
+            paths, recipes = replay(self.journal.read())
+            paths = [path for path in paths if os.path.exists(path)]
+            existing = set(paths)
+            self.recipes = {path: recipe for path, recipe in recipes.items() if path in existing}
+
+            # Compactar el diario antes de seguir añadiendo registros
+            if paths:
+                self.journal.rewrite(compact(paths, self.recipes))
+            else:
+                self.journal.rewrite([])
+            self.journal.start()
+
+            if paths:
+                # La galería se muestra cuando el índice de metadatos tiene todas las cabeceras
+                self.probe_metadata(paths, lambda: self.finish_restore(paths))
+        except Exception as e:
+            logger.error("Error al recuperar la sesión: %s", e)
+            if self.journal.locked:
+                self.journal.start()
+
+    def finish_restore(self, paths):
+        """Muestra la sesión recuperada cuando sus cabeceras ya están indexadas."""
+        self.imported_images = paths
+        self.refresh_gallery_order()
+        self.statusBar.showMessage(f"Sesión recuperada: {len(paths)} imágenes, {len(self.recipes)} editadas")
+
+    def closeEvent(self, event):
+        """Cierra el diario; en un cierre limpio no hay nada que recuperar."""
+        # Terminar la exportación en curso antes de detener el servicio de render
+        if self.export_state is not None:
+            for job in self.export_state['jobs']:
+                try:
+                    job.result()
+                except Exception:
+                    pass
+        self.render_service.close()
+        if self.shared_buffers is not None:
+            self.shared_buffers.close()
+        self.journal.close(remove=True)
+        self.snapshot_store.close()
+        super().closeEvent(event)
 
     def update_gallery(self):
         """Actualiza la galería con las imágenes cargadas."""
@@ -606,98 +1022,418 @@ class ImageEditor(QMainWindow):
         while self.tab_widget.count() < total_pages:
             self.create_gallery_page()
 
-        # Actualizar cada página
-        for page_idx in range(total_pages):
+        # Quitar las que sobran tras filtrar (siempre queda al menos una)
+        while self.tab_widget.count() > max(1, total_pages):
+            page_idx = self.tab_widget.count() - 1
             page = self.tab_widget.widget(page_idx)
-            layout = page.layout()
+            for view in page.findChildren(ImageView):
+                self.pending_views.pop(view, None)
+                if getattr(self, 'last_selected_view', None) is view:
+                    self.last_selected_view = None
+                if getattr(self, 'highlighted_view', None) is view:
+                    self.highlighted_view = None
+            self.tab_widget.removeTab(page_idx)
+            page.deleteLater()
+        self.current_page = min(self.current_page, max(0, total_pages - 1))
+
+        # Las páginas se cargan al mostrarse; solo se carga ya la actual
+        self.populated_pages.clear()
+
+        # Las imágenes precargadas y las decodificaciones pendientes ya no
+        # corresponden a las mismas páginas
+        self.decoded_cache.clear()
+        self.pending_views.clear()
+        self.render_service.cancel_where(lambda job: job.priority == PRIORITY_PREFETCH and is_decode_job(job))
 
-            # Índices de imágenes para esta página
-            start_idx = page_idx * self.images_per_page
-            end_idx = min(start_idx + self.images_per_page, len(self.loaded_images))
+        # Mostrar la página actual
+        self.tab_widget.setCurrentIndex(self.current_page)
+        self.on_page_changed(self.current_page)
 
-            # Actualizar cada vista de imagen en la página
-            for i in range(self.images_per_page):
-                idx = start_idx + i
-                row = i // self.grid_size[0]
-                col = i % self.grid_size[0]
+    def on_page_changed(self, page_idx):
+        """Carga la página que se muestra y precarga sus vecinas."""
+        self.populate_page(page_idx)
+        self.prefetch_neighbours(page_idx)
 
-                # Obtener el widget ImageView
-                item = layout.itemAtPosition(row, col)
-                if item:
-                    image_view = item.widget()
+    def page_paths(self, page_idx):
+        """Rutas de las imágenes que corresponden a una página."""
+        start_idx = page_idx * self.images_per_page
+        return self.loaded_images[start_idx:start_idx + self.images_per_page]
 
-                    # Establecer imagen si está disponible
-                    if idx < end_idx:
-                        image_view.set_image(self.loaded_images[idx])
-                        image_view.set_target_size(self.target_width, self.target_height)
+    def request_decode(self, path, priority):
+        """Pide al servicio de render la decodificación de una imagen."""
+        return self.render_service.submit(ImageView.decode, path, self._load_image, key=('decode', path),
+                                          priority=priority, callback=self._decoded_callback)
 
-        # Mostrar la página actual
-        if self.loaded_images and self.current_page < total_pages:
-            self.tab_widget.setCurrentIndex(self.current_page)
+    def populate_page(self, page_idx, wait=False):
+        """Carga en las vistas de una página sus imágenes y recetas pendientes.
+
+        Las imágenes que no están precargadas se decodifican con prioridad de
+        visibles en el servicio de render y se muestran al llegar (on_decoded).
+
+        Args:
+            wait: bool - Esperar a que todas las vistas tengan su imagen (exportación)
+        """
+        if page_idx < 0 or (page_idx in self.populated_pages and not (wait and self.pending_views)):
+            return
+
+        page = self.tab_widget.widget(page_idx)
+        if page is None:
+            return
+        layout = page.layout()
+
+        # Índices de imágenes para esta página
+        start_idx = page_idx * self.images_per_page
+        end_idx = min(start_idx + self.images_per_page, len(self.loaded_images))
+
+        # Actualizar cada vista de imagen en la página
+        for i in range(self.images_per_page):
+            idx = start_idx + i
+            row = i // self.grid_size[0]
+            col = i % self.grid_size[0]
+
+            # Obtener el widget ImageView
+            item = layout.itemAtPosition(row, col)
+            if not item:
+                continue
+            image_view = item.widget()
+
+            # Las vistas sin imagen asignada (tras filtrar) se vacían
+            if idx >= end_idx:
+                self.pending_views.pop(image_view, None)
+                if image_view.image_path is not None:
+                    image_view.clear_image()
+                    image_view.setToolTip("")
+                continue
+            path = self.loaded_images[idx]
+
+            # La vista ya muestra esta imagen
+            if image_view.image_path == path and image_view not in self.pending_views:
+                continue
+
+            decoded = self.decoded_cache.pop(path, None)
+            if decoded is None:
+                job = self.request_decode(path, PRIORITY_VISIBLE)
+                if not wait:
+                    self.pending_views[image_view] = path
+                    continue
+                try:
+                    decoded = job.result()
+                except Exception:
+                    decoded = None  # set_image vuelve a intentarlo y registra el error
+
+            self.pending_views.pop(image_view, None)
+            self.show_image(image_view, path, decoded)
+
+        self.populated_pages.add(page_idx)
+        self.check_memory_budget()
+
+    def show_image(self, view, path, decoded=None):
+        """Muestra en una vista una imagen (ya decodificada si se tiene) con su receta.
+
+        Si la imagen ya se mostró antes recupera su historial y su estado.
+        """
+        history = self.histories.setdefault(path, UndoStack())
+        view.set_target_size(self.target_width, self.target_height)
+        view.set_image(path, decoded, history)
+
+        # Señalar los posibles duplicados cargados
+        original = self.duplicates.get(path)
+        view.setToolTip(
+            f"{self.translator.get_text('duplicate_of')} {os.path.basename(original)}" if original else "")
+
+        # La receta puede haber cambiado sin vista (por ejemplo con un lote);
+        # aplicarla es entonces una edición más de su historial
+        recipe = self.recipes.get(path)
+        if recipe and view.get_recipe() != recipe:
+            view.apply_recipe(recipe)
+
+    def on_decoded(self, job):
+        """Recibe una imagen decodificada (hilo de la interfaz).
+
+        Se muestra en las vistas que la esperan; si ninguna la espera (precarga)
+        se guarda en la caché hasta que su página se muestre.
+        """
+        path = job.key[1]
+        try:
+            decoded = job.result()
+        except JobCancelled:
+            return
+        except Exception:
+            decoded = None
+
+        views = [view for view, pending_path in self.pending_views.items() if pending_path == path]
+        if not views:
+            shown = {view.image_path for view in self.all_image_views()}
+            if decoded is not None and path not in shown and path in self.loaded_images:
+                self.decoded_cache[path] = decoded
+                self.decoded_cache.move_to_end(path)
+                limit = self.images_per_page * 2 * self.settings.get('render/prefetch_pages')
+                while len(self.decoded_cache) > limit:
+                    self.decoded_cache.popitem(last=False)
+            return
+
+        for view in views:
+            del self.pending_views[view]
+            self.show_image(view, path, decoded)
+        self.check_memory_budget()
+
+    def prefetch_neighbours(self, page_idx):
+        """Decodifica en segundo plano las imágenes de las páginas vecinas.
+
+        La precarga de páginas que ya no son vecinas se cancela; los trabajos
+        de precarga solo se atienden cuando no hay nada visible pendiente.
+        """
+        radius = self.settings.get('render/prefetch_pages')
+        wanted = []
+        for offset in range(1, radius + 1):
+            for neighbour in (page_idx + offset, page_idx - offset):
+                if 0 <= neighbour < self.tab_widget.count() and neighbour not in self.populated_pages:
+                    wanted.extend(self.page_paths(neighbour))
+
+        wanted_set = set(wanted)
+        self.render_service.cancel_where(
+            lambda job: job.priority == PRIORITY_PREFETCH and is_decode_job(job) and job.key[1] not in wanted_set)
+        for path in wanted:
+            if path not in self.decoded_cache:
+                self.request_decode(path, PRIORITY_PREFETCH)
+
+    def edited_paths(self):
+        """Rutas de las imágenes cuya última receta modifica la imagen."""
+        return {path for path, recipe in self.recipes.items()
+                if not ImageView.recipe_is_identity(recipe)}
+
+    def refresh_gallery_order(self):
+        """Ordena y filtra la galería según los controles, usando solo el índice de metadatos.
+
+        Las ediciones y el historial de deshacer se conservan porque se
+        guardan por ruta: cada vista retoma el historial de la imagen que le
+        toca mostrar.
+        """
+        if self.batch is not None:
+            self.statusBar.showMessage(self.translator.get_text('batch_busy'))
+            return
+
+        order = self.metadata.query(
+            self.imported_images,
+            sort_key=self.sort_combo.currentData(),
+            descending=self.sort_descending_btn.isChecked(),
+            filter_key=self.filter_combo.currentData(),
+            edited=self.edited_paths())
+        if order == self.loaded_images:
+            return
+
+        # Las vistas pasan a mostrar otras imágenes: las marcas ya no valen
+        self.clear_marked_views()
+        self.loaded_images = order
+        self.update_gallery()
+        self.statusBar.showMessage(
+            f"{self.translator.get_text('gallery_showing')} {len(order)}/{len(self.imported_images)}")
 
     def save_images(self):
-        """Guarda las imágenes editadas."""
+        """Guarda las imágenes editadas.
+
+        Se guardan todas las importadas, también las que el filtro de la
+        galería oculta. Los recortes se renderizan en el hilo de la interfaz
+        (usan la escena de cada vista); la codificación y la escritura se
+        encolan en el servicio de render con prioridad de exportación, por
+        detrás de lo visible.
+        """
         try:
-            if not self.loaded_images:
+            if not self.imported_images:
                 QMessageBox.warning(self, self.translator.get_text('warning'), self.translator.get_text('no_images_to_save'))
                 return
 
+            if self.export_state is not None:
+                self.statusBar.showMessage(self.translator.get_text('export_busy'))
+                return
+
             # Seleccionar directorio de destino
             save_dir = QFileDialog.getExistingDirectory(self, self.translator.get_text('save_directory_title'))
 
             if not save_dir:
                 return
 
-            # Guardar cada imagen
-            saved_count = 0
+            # Opciones de la máscara de outpainting
+            export_mask = self.mask_checkbox.isChecked()
+            mask_dilation = self.settings.get('export/mask_dilation')
+            mask_feather = self.settings.get('export/mask_feather')
+
+            # Recortes ya encolados que aún no se han escrito; por encima del
+            # límite se espera al más antiguo para acotar la memoria
+            in_flight_limit = 2 * self.render_service.workers
+            state = self.export_state = {'dir': save_dir, 'jobs': [], 'finished': 0, 'saved': 0, 'submitting': True}
+            # Nombres de salida ya asignados (sin distinguir mayúsculas, como
+            # en los sistemas de archivos de Windows y macOS)
+            used_names = set()
+
+            # Imágenes de la galería con la vista y la página que les tocan
+            targets = []
             for page_idx in range(self.tab_widget.count()):
-                page = self.tab_widget.widget(page_idx)
-                layout = page.layout()
-
-                # Índices de imágenes para esta página
+                layout = self.tab_widget.widget(page_idx).layout()
                 start_idx = page_idx * self.images_per_page
                 end_idx = min(start_idx + self.images_per_page, len(self.loaded_images))
-
-                # Procesar cada vista de imagen en la página
-                for i in range(self.images_per_page):
-                    idx = start_idx + i
-                    if idx >= end_idx:
-                        break
-
-                    row = i // self.grid_size[0]
-                    col = i % self.grid_size[0]
-
-                    # Obtener el widget ImageView
-                    item = layout.itemAtPosition(row, col)
+                for idx in range(start_idx, end_idx):
+                    i = idx - start_idx
+                    item = layout.itemAtPosition(i // self.grid_size[0], i % self.grid_size[0])
                     if item:
-                        image_view = item.widget()
+                        targets.append((self.loaded_images[idx], page_idx, item.widget()))
+
+            # Las ocultas por el filtro también se exportan, aunque no tengan vista
+            shown = set(self.loaded_images)
+            targets.extend((path, None, None) for path in self.imported_images if path not in shown)
+
+            for path, page_idx, image_view in targets:
+                try:
+                    # Generar nombre de archivo
+                    base_name = os.path.basename(path)
+                    name, ext = os.path.splitext(base_name)
+                    # Dos imágenes con el mismo nombre en carpetas distintas se numeran
+                    name = self.unique_export_name(name, used_names)
+                    # Asegurarse de que la extensión sea .png para mantener transparencia
+                    save_path = os.path.join(save_dir, f"{name}_edited.png")
+                    mask_path = os.path.join(save_dir, f"{name}_mask.png") if export_mask else None
+
+                    loaded = (image_view is not None and image_view.image_path == path
+                              and image_view not in self.pending_views)
+                    if self.is_passthrough(path, image_view):
+                        # Sin edición y al tamaño de salida: no hace falta renderizar
+                        job_args = (export_unedited, path)
+                    elif not loaded and self.use_region_decode(path, any_size=image_view is None):
+                        # Imagen sin cargar: solo se decodifica la zona del recorte
+                        job_args = (export_region, path, self.recipes.get(path), self.metadata.size(path),
+                                    (self.target_width, self.target_height))
+                    else:
+                        if image_view is None:
+                            # Oculta por el filtro y deformada: se renderiza en una vista temporal
+                            cropped_image = self.render_hidden(path)
+                        else:
+                            # Las páginas que no se han visto aún se cargan ahora
+                            if not loaded:
+                                self.populate_page(page_idx, wait=True)
 
-                        try:
                             # Obtener imagen recortada
-                            cropped_image = image_view.get_crop_image()
-                            if cropped_image:
-                                # Generar nombre de archivo
-                                base_name = os.path.basename(self.loaded_images[idx])
-                                name, ext = os.path.splitext(base_name)
-                                # Asegurarse de que la extensión sea .png para mantener transparencia
-                                save_path = os.path.join(save_dir, f"{name}_edited.png")
-
-                                # Guardar imagen
-                                cropped_image.save(save_path, format="PNG")
-                                saved_count += 1
-                                print(f"Guardada imagen en: {save_path}")
-                        except Exception as e:
-                            print(f"Error al guardar imagen {idx}: {e}")
-
-            if saved_count > 0:
-                QMessageBox.information(self, "Guardado completado", f"Guardadas {saved_count} imágenes en {save_dir}")
-            else:
-                QMessageBox.warning(self, "Advertencia", "No se pudo guardar ninguna imagen.")
-
-            self.statusBar.showMessage(f"Guardadas {saved_count} imágenes en {save_dir}")
+                            with metrics.span('render'):
+                                cropped_image = image_view.get_crop_image()
+                        if not cropped_image:
+                            continue
+                        job_args = (self._export_image, cropped_image)
+
+                    pending = [job for job in state['jobs'] if not job.done()]
+                    if len(pending) >= in_flight_limit:
+                        try:
+                            pending[0].result()
+                        except Exception:
+                            pass
+
+                    # Codificar y escribir en segundo plano
+                    job = self.render_service.submit(
+                        *job_args, save_path, mask_path, mask_dilation, mask_feather,
+                        key=('export', path, save_path), priority=PRIORITY_EXPORT,
+                        callback=self._exported_callback)
+                    state['jobs'].append(job)
+                except Exception as e:
+                    metrics.count('errors')
+                    logger.error("Error al guardar imagen %s: %s", path, e)
+
+            state['submitting'] = False
+            self.statusBar.showMessage(f"{self.translator.get_text('exporting')} {len(state['jobs'])}")
+            self.check_export_finished()
         except Exception as e:
+            self.export_state = None
             QMessageBox.critical(self, "Error", f"Error al guardar imágenes: {e}")
-            print(f"Error en save_images: {e}")
+            logger.error("Error en save_images: %s", e)
+
+    @staticmethod
+    def unique_export_name(name, used_names):
+        """Devuelve name, o name_2, name_3... si ya se ha usado en esta exportación, y lo marca como usado."""
+        candidate = name
+        number = 1
+        while candidate.lower() in used_names:
+            number += 1
+            candidate = f"{name}_{number}"
+        used_names.add(candidate.lower())
+        return candidate
+
+    def is_passthrough(self, path, view=None):
+        """Indica, sin decodificar, si exportar una imagen daría la imagen original.
+
+        Es así cuando su receta es la identidad (sin mover, rotar, escalar,
+        deformar ni elegir marco) y su tamaño es exactamente el de salida: el
+        marco por defecto es entonces el encuadre completo y no se redimensiona.
+
+        Args:
+            view: ImageView - Vista que la muestra, si ya está cargada (su receta manda)
+        """
+        if view is not None and view.image_path == path and view not in self.pending_views:
+            recipe = view.get_recipe()
+        else:
+            recipe = self.recipes.get(path)
+        if recipe is not None and not ImageView.recipe_is_identity(recipe):
+            return False
+        return self.metadata.size(path) == (self.target_width, self.target_height)
+
+    def use_region_decode(self, path, any_size=False):
+        """Indica si una imagen no cargada se exporta decodificando solo la región del recorte.
+
+        Solo compensa en imágenes grandes y solo es posible si la receta no
+        tiene deformación, porque la región se calcula con una matriz afín.
+
+        Args:
+            any_size: bool - Usarla con cualquier tamaño (las imágenes sin
+                      vista no tienen otra forma barata de renderizarse)
+        """
+        size = self.metadata.size(path)
+        if not size:
+            return False
+        if not any_size and size[0] * size[1] < self.settings.get('export/roi_min_megapixels') * 1e6:
+            return False
+        return crop_geometry(self.recipes.get(path), size, (self.target_width, self.target_height)) is not None
+
+    def render_hidden(self, path):
+        """Renderiza con su receta el recorte de una imagen sin vista en una vista temporal."""
+        view = ImageView()
+        try:
+            view.set_target_size(self.target_width, self.target_height)
+            try:
+                decoded = self.request_decode(path, PRIORITY_VISIBLE).result()
+            except Exception:
+                decoded = None  # set_image vuelve a intentarlo y registra el error
+            view.set_image(path, decoded)
+            view.apply_recipe(self.recipes.get(path))
+            with metrics.span('render'):
+                return view.get_crop_image()
+        finally:
+            view.deleteLater()
+
+    def on_export_finished(self, job):
+        """Cuenta una imagen exportada (hilo de la interfaz)."""
+        state = self.export_state
+        # Solo hay una exportación a la vez, así que el trabajo es de la actual
+        if state is None:
+            return
+        state['finished'] += 1
+        try:
+            logger.debug("Guardada imagen en: %s", job.result())
+            state['saved'] += 1
+            metrics.count('images_saved')
+        except Exception:
+            pass  # El servicio de render ya registra el error
+        self.check_export_finished()
+
+    def check_export_finished(self):
+        """Informa del resultado cuando se han escrito todas las imágenes de la exportación."""
+        state = self.export_state
+        if state is None or state['submitting'] or state['finished'] < len(state['jobs']):
+            return
+        self.export_state = None
+
+        saved_count, save_dir = state['saved'], state['dir']
+        if saved_count > 0:
+            QMessageBox.information(self, "Guardado completado", f"Guardadas {saved_count} imágenes en {save_dir}")
+        else:
+            QMessageBox.warning(self, "Advertencia", "No se pudo guardar ninguna imagen.")
+
+        self.statusBar.showMessage(f"Guardadas {saved_count} imágenes en {save_dir}")
 
     def update_target_size(self):
         """Actualiza el tamaño objetivo para el recorte."""
@@ -716,67 +1452,6 @@ class ImageEditor(QMainWindow):
                         image_view = item.widget()
                         image_view.set_target_size(self.target_width, self.target_height)
 
-    def start_marquee_animation(self):
-        """Inicia la animación de desplazamiento para los textos de la barra de herramientas."""
-        # Crear un temporizador para actualizar la animación
-        self.marquee_timer = QTimer(self)
-        self.marquee_timer.timeout.connect(self.update_marquee_text)
-        self.marquee_timer.start(100)  # Actualizar cada 100ms para una animación más lenta
-
-        # Inicializar variables para la animación
-        self.marquee_offset = 0
-        self.marquee_speed = 0.5  # Velocidad de desplazamiento reducida
-
-    def update_marquee_text(self):
-        """Actualiza la posición del texto en la animación de desplazamiento."""
-        # Incrementar el offset para todas las etiquetas
-        self.marquee_offset += self.marquee_speed
-
-        # Buscar todas las etiquetas de texto en los botones de herramientas
-        for button in self.tool_buttons.values():
-            # Buscar la etiqueta de texto en el botón
-            for child in button.findChildren(QLabel):
-                if child.objectName() == "marquee_text":
-                    # Obtener el texto actual
-                    text = child.text()
-
-                    # Guardar el texto original si no lo hemos guardado antes
-                    if not hasattr(child, 'original_text'):
-                        child.original_text = text
-                    else:
-                        # Usar el texto original guardado
-                        text = child.original_text
-
-                    # Calcular el ancho del texto y del contenedor
-                    metrics = child.fontMetrics()
-                    text_width = metrics.width(text)
-                    label_width = child.width()
-
-                    # Crear un texto más largo para la animación con espacios adicionales
-                    # Añadir exactamente 4 espacios entre repeticiones como solicitó el usuario
-                    padding = "    "  # 4 espacios
-                    long_text = text + padding + text + padding
-
-                    # Calcular la posición actual para un desplazamiento más lento
-                    # El texto se desplaza de derecha a izquierda
-                    total_width = len(long_text)
-                    current_offset = int(self.marquee_offset) % total_width
-
-                    # Crear el texto visible con un tamaño fijo para evitar saltos
-                    # Mostrar una ventana de caracteres que se desplaza por el texto largo
-                    window_size = min(20, len(long_text))  # Mostrar hasta 20 caracteres a la vez
-                    start_pos = current_offset
-                    end_pos = start_pos + window_size
-
-                    # Asegurarse de que no nos pasamos del final del texto
-                    if end_pos > len(long_text):
-                        visible_text = long_text[start_pos:] + long_text[:end_pos - len(long_text)]
-                    else:
-                        visible_text = long_text[start_pos:end_pos]
-
-                    # Actualizar el texto de la etiqueta
-                    child.setText(visible_text)
-
     def toggle_theme(self):
         """Cambia entre los temas oscuro y claro."""
         # Cambiar al siguiente tema
@@ -787,74 +1462,133 @@ class ImageEditor(QMainWindow):
         theme_name = "Claro" if next_theme == 1 else "Oscuro"
         self.statusBar.showMessage(f"Tema cambiado a: {theme_name}")
 
+    def set_metrics_readout(self, visible):
+        """Muestra u oculta la lectura de métricas; oculta no consume nada."""
+        self.settings.set('metrics/show_readout', visible)
+        self.metrics_label.setVisible(visible)
+        if visible:
+            self.update_metrics_readout()
+            self.metrics_timer.start(self.settings.get('metrics/readout_interval_ms'))
+        else:
+            self.metrics_timer.stop()
+
+    def update_metrics_readout(self):
+        """Actualiza la lectura de métricas (media/p95 de cada tramo)."""
+        self.metrics_label.setText(metrics.summary_text(READOUT_SPANS))
+
+    def dump_metrics(self):
+        """Guarda las métricas de la sesión en un archivo JSON elegido por el usuario."""
+        path, _ = QFileDialog.getSaveFileName(self, self.translator.get_text('dump_metrics_title'),
+                                              "metrics.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            metrics.dump(path, extra={'memory': self.memory_report()})
+            self.statusBar.showMessage(f"{self.translator.get_text('metrics_saved')} {path}")
+        except OSError as e:
+            logger.error("Error al guardar las métricas: %s", e)
+            QMessageBox.critical(self, "Error", str(e))
+
+    def create_diagnostics_dock(self):
+        """Crea el panel de diagnóstico (oculto); solo se actualiza mientras está visible."""
+        self.diagnostics_dock = self.translator.bind(QDockWidget(self), 'diagnostics', 'setWindowTitle')
+        self.diagnostics_dock.setAllowedAreas(Qt.RightDockWidgetArea | Qt.BottomDockWidgetArea)
+
+        panel = QWidget()
+        layout = QVBoxLayout(panel)
+        self.memory_summary_label = QLabel()
+        self.memory_summary_label.setWordWrap(True)
+        layout.addWidget(self.memory_summary_label)
+
+        self.memory_table = QTableWidget(0, len(VIEW_CATEGORIES) + 2)
+        self.memory_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.memory_table.verticalHeader().setVisible(False)
+        self.memory_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.memory_table.setSortingEnabled(True)
+        layout.addWidget(self.memory_table)
+
+        self.diagnostics_dock.setWidget(panel)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.diagnostics_dock)
+        self.diagnostics_dock.hide()
+
+        self.diagnostics_timer = QTimer(self)
+        self.diagnostics_timer.timeout.connect(self.update_diagnostics)
+        self.diagnostics_dock.visibilityChanged.connect(self.on_diagnostics_visibility)
+
+    def on_diagnostics_visibility(self, visible):
+        if visible:
+            self.update_diagnostics()
+            self.diagnostics_timer.start(self.settings.get('memory/refresh_interval_ms'))
+        else:
+            self.diagnostics_timer.stop()
+
+    def memory_report(self):
+        """Informe de memoria de todas las vistas y del almacén de instantáneas."""
+        return memory_report(self.all_image_views(), self.snapshot_store)
+
+    def check_memory_budget(self, report=None):
+        """Avisa (una vez por cada vez que se supera) si la memoria excede el presupuesto.
+
+        Returns:
+            dict - El informe de memoria utilizado
+        """
+        report = report or self.memory_report()
+        budget = self.settings.get('memory/budget_mb') * 1024 * 1024
+        over_budget = report['total'] > budget
+        if over_budget and not getattr(self, 'memory_over_budget', False):
+            message = (f"{self.translator.get_text('memory_over_budget')} "
+                       f"{report['total'] / 2**20:.0f}/{budget / 2**20:.0f} MB")
+            logger.warning(message)
+            self.statusBar.showMessage(message)
+        self.memory_over_budget = over_budget
+        return report
+
+    def update_diagnostics(self):
+        """Rellena el panel de diagnóstico con el informe de memoria actual."""
+        report = self.check_memory_budget()
+
+        def mb(value):
+            return f"{value / 2**20:.1f}"
+
+        snapshots = report['snapshots']
+        summary = [f"{self.translator.get_text('memory_total')} {mb(report['total'])} MB "
+                   f"({self.translator.get_text('memory_budget')} {self.settings.get('memory/budget_mb')} MB)"]
+        summary += [f"{category}: {mb(value)} MB" for category, value in report['totals'].items()]
+        if snapshots:
+            summary.append(f"snapshots: {snapshots['snapshots']} · {mb(snapshots['memory_bytes'])} MB RAM · "
+                           f"{mb(snapshots['disk_bytes'])} MB {self.translator.get_text('memory_disk')}")
+        depth = self.render_service.queue_depth()
+        summary.append(f"{self.translator.get_text('render_queue')} "
+                       + " · ".join(f"{name} {count}" for name, count in depth.items()))
+        if self.shared_buffers is not None:
+            pool = self.shared_buffers.usage()
+            summary.append(f"{self.translator.get_text('shared_buffers')} {pool['segments']} · "
+                           f"{mb(pool['in_use_bytes'])} MB / {mb(pool['free_bytes'])} MB · "
+                           f"{pool['allocations']}/{pool['reuses']}")
+        self.memory_summary_label.setText("\n".join(summary))
+        self.memory_summary_label.setStyleSheet("color: red;" if self.memory_over_budget else "")
+
+        table = self.memory_table
+        table.setSortingEnabled(False)
+        table.setHorizontalHeaderLabels([self.translator.get_text('memory_image'), *VIEW_CATEGORIES, 'total'])
+        table.setRowCount(len(report['views']))
+        for row, (path, usage) in enumerate(report['views'].items()):
+            table.setItem(row, 0, QTableWidgetItem(os.path.basename(path)))
+            for column, category in enumerate((*VIEW_CATEGORIES, 'total'), start=1):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, round(usage[category] / 2**20, 1))
+                table.setItem(row, column, item)
+        table.setSortingEnabled(True)
+
     def change_language(self, language):
         """Cambia el idioma de la interfaz."""
         if self.translator.set_language(language):
-            # Actualizar el título de la ventana
-            self.setWindowTitle(self.translator.get_text('window_title'))
-
-            # Actualizar los textos de los botones de carga y guardado
-            for widget in self.findChildren(QPushButton):
-                # Obtener el texto actual del botón
-                current_text = widget.text()
-
-                # Comprobar si el texto coincide con alguna de las traducciones
-                if current_text.find("Cargar") >= 0 or current_text.find("Load") >= 0:
-                    widget.setText(self.translator.get_text('load_images'))
-                elif current_text.find("Guardar") >= 0 or current_text.find("Save") >= 0:
-                    widget.setText(self.translator.get_text('save_images'))
-                elif current_text.find("Anterior") >= 0 or current_text.find("Previous") >= 0:
-                    widget.setText(self.translator.get_text('prev_page'))
-                elif current_text.find("Siguiente") >= 0 or current_text.find("Next") >= 0:
-                    widget.setText(self.translator.get_text('next_page'))
-                elif current_text.find("Español") >= 0 or current_text.find("Spanish") >= 0:
-                    widget.setText(self.translator.get_text('spanish'))
-                elif current_text.find("Inglés") >= 0 or current_text.find("English") >= 0:
-                    widget.setText(self.translator.get_text('english'))
-
-            # Actualizar los textos de las etiquetas
-            for widget in self.findChildren(QLabel):
-                current_text = widget.text()
-                if current_text.find("Resolución") >= 0 or current_text.find("Resolution") >= 0:
-                    widget.setText(self.translator.get_text('output_resolution'))
-
-            # Actualizar los textos de los botones de herramientas
-            for button in self.tool_buttons.values():
-                for child in button.findChildren(QLabel):
-                    if child.objectName() == "marquee_text":
-                        current_text = child.text()
-
-                        # Actualizar el texto según el tipo de botón
-                        if current_text.find("Mover") >= 0 or current_text.find("Move") >= 0:
-                            child.setText(self.translator.get_text('move'))
-                            child.original_text = self.translator.get_text('move')
-                        elif current_text.find("Redimensionar") >= 0 or current_text.find("Resize") >= 0:
-                            child.setText(self.translator.get_text('resize'))
-                            child.original_text = self.translator.get_text('resize')
-                        elif current_text.find("Rotar") >= 0 or current_text.find("Rotate") >= 0:
-                            child.setText(self.translator.get_text('rotate'))
-                            child.original_text = self.translator.get_text('rotate')
-                        elif current_text.find("Deformar") >= 0 or current_text.find("Deform") >= 0:
-                            child.setText(self.translator.get_text('deform'))
-                            child.original_text = self.translator.get_text('deform')
-                        elif current_text.find("Deshacer") >= 0 or current_text.find("Undo") >= 0:
-                            child.setText(self.translator.get_text('undo'))
-                            child.original_text = self.translator.get_text('undo')
-                        elif current_text.find("Rehacer") >= 0 or current_text.find("Redo") >= 0:
-                            child.setText(self.translator.get_text('redo'))
-                            child.original_text = self.translator.get_text('redo')
-                        elif current_text.find("Restablecer") >= 0 or current_text.find("Reset") >= 0:
-                            child.setText(self.translator.get_text('reset'))
-                            child.original_text = self.translator.get_text('reset')
-                        elif current_text.find("Tema") >= 0 or current_text.find("Theme") >= 0:
-                            child.setText(self.translator.get_text('theme'))
-                            child.original_text = self.translator.get_text('theme')
-
-            # Actualizar el título del dock
-            for dock in self.findChildren(QDockWidget):
-                current_title = dock.windowTitle()
-                if current_title.find("Herramientas") >= 0 or current_title.find("Tools") >= 0:
-                    dock.setWindowTitle(self.translator.get_text('tools'))
+            # Solo se actualizan los widgets registrados como traducibles
+            self.translator.retranslate()
+            for index, key in enumerate(SORT_KEYS):
+                self.sort_combo.setItemText(index, self.translator.get_text(f'sort_{key}'))
+            for index, key in enumerate(FILTERS):
+                self.filter_combo.setItemText(index, self.translator.get_text(f'filter_{key}'))
 
             # Actualizar el mensaje de atajos
             self.shortcuts_message = self.translator.get_text('shortcuts')
@@ -923,6 +1657,11 @@ class ImageEditor(QMainWindow):
 
     def on_image_view_clicked(self, event, view):
         """Maneja el evento de clic en una vista de imagen."""
+        # Ctrl+clic marca o desmarca la vista para la selección múltiple
+        if event.modifiers() & Qt.ControlModifier and event.button() == Qt.LeftButton:
+            self.toggle_view_mark(view)
+            return
+
         # Guardar la vista seleccionada
         self.last_selected_view = view
         # Dar foco a la vista
@@ -934,24 +1673,245 @@ class ImageEditor(QMainWindow):
 
     def highlight_selected_view(self, selected_view):
         """Resalta visualmente la vista seleccionada."""
-        # Obtener la página actual
-        current_page = self.tab_widget.currentWidget()
-        if not current_page:
+        # Solo se vuelven a pulir la vista anterior y la nueva; el estilo del
+        # borde lo define la hoja de estilos del tema mediante la propiedad
+        previous = getattr(self, 'highlighted_view', None)
+        if previous is selected_view:
             return
+        for view, selected in ((previous, False), (selected_view, True)):
+            if view is not None:
+                view.setProperty('selected', selected)
+                view.style().unpolish(view)
+                view.style().polish(view)
+        self.highlighted_view = selected_view
+
+    def set_view_marked(self, view, marked):
+        """Marca o desmarca una vista y actualiza solo su estilo."""
+        view.setProperty('marked', marked)
+        view.style().unpolish(view)
+        view.style().polish(view)
+
+    def toggle_view_mark(self, view):
+        """Añade o quita una vista de la selección múltiple."""
+        if view in self.marked_views:
+            self.marked_views.remove(view)
+            self.set_view_marked(view, False)
+        else:
+            self.marked_views.append(view)
+            self.set_view_marked(view, True)
+        self.statusBar.showMessage(f"{self.translator.get_text('marked_images')} {len(self.marked_views)}")
+
+    def clear_marked_views(self):
+        """Quita todas las marcas de selección múltiple."""
+        for view in self.marked_views:
+            self.set_view_marked(view, False)
+        self.marked_views = []
+
+    def all_image_views(self):
+        """Devuelve todas las vistas de imagen de todas las páginas."""
+        views = []
+        for page_idx in range(self.tab_widget.count()):
+            layout = self.tab_widget.widget(page_idx).layout()
+            for row in range(self.grid_size[1]):
+                for col in range(self.grid_size[0]):
+                    item = layout.itemAtPosition(row, col)
+                    if item and isinstance(item.widget(), ImageView):
+                        views.append(item.widget())
+        return views
 
-        # Recorrer todas las vistas de imagen en la página
-        layout = current_page.layout()
-        for row in range(self.grid_size[1]):
-            for col in range(self.grid_size[0]):
-                item = layout.itemAtPosition(row, col)
-                if item:
-                    view = item.widget()
-                    if isinstance(view, ImageView):
-                        # Aplicar estilo según si es la vista seleccionada o no
-                        if view == selected_view:
-                            view.setStyleSheet("border: 3px solid #3498db;")
-                        else:
-                            view.setStyleSheet("")
+    def batch_targets(self):
+        """Vistas con imagen sobre las que actúa una operación en lote.
+
+        Son las vistas marcadas o, si no hay ninguna, todas las que tienen imagen.
+        """
+        views = self.marked_views or self.all_image_views()
+        return [view for view in views if view.pixmap_item is not None]
+
+    def batch_unloaded_paths(self):
+        """Imágenes mostradas en la galería cuya vista aún no está cargada.
+
+        Una operación en lote sin vistas marcadas actúa también sobre ellas,
+        a través de su receta. Las recetas con deformación se excluyen porque
+        el marco se calcula sobre la imagen sin deformar.
+        """
+        if self.marked_views:
+            return []
+        shown = {view.image_path for view in self.all_image_views()
+                 if view.pixmap_item is not None and view not in self.pending_views}
+        return [path for path in dict.fromkeys(self.loaded_images)
+                if path not in shown and not (self.recipes.get(path) or {}).get('deform_points')]
+
+    def set_recipe_frame(self, path, frame):
+        """Pone un marco de recorte en la receta de una imagen sin vista cargada."""
+        recipe = ImageView.recipe_with_frame(self.recipes.get(path) or ImageView.identity_recipe(),
+                                             frame, self.target_width / self.target_height)
+        self.recipes[path] = recipe
+        self.journal.append({'op': 'edit', 'path': path, 'recipe': recipe})
+
+    def start_batch(self, targets, job, apply, message_key, apply_path=None):
+        """Ejecuta una operación en lote sobre varias vistas.
+
+        Args:
+            targets: list - Vistas afectadas y, si se da apply_path, rutas de
+                     imágenes sin vista cargada
+            job: callable - job(objetivo) se ejecuta en paralelo en hilos de trabajo;
+                 None si no hay nada que calcular en segundo plano
+            apply: callable - apply(view, resultado) se ejecuta en el hilo de la
+                   interfaz cuando han terminado todas, como una transacción
+            message_key: str - Clave del mensaje de estado al terminar
+            apply_path: callable - apply_path(ruta, resultado) para las rutas cuyo
+                        resultado no es None y que siguen sin vista cargada
+        """
+        if self.batch is not None:
+            self.statusBar.showMessage(self.translator.get_text('batch_busy'))
+            return
+
+        self.batch = {'targets': targets, 'results': {}, 'apply': apply, 'apply_path': apply_path,
+                      'message_key': message_key}
+
+        if job is None:
+            self.finish_batch()
+            return
+
+        for target in targets:
+            # Las imágenes sin vista van por detrás de lo que se está viendo
+            priority = PRIORITY_PREFETCH if isinstance(target, str) else PRIORITY_VISIBLE
+            self.render_service.submit(job, target, priority=priority,
+                                       callback=lambda j, t=target: self.batch_signals.finished.emit(t, j))
+
+    def apply_edit_to_selected(self):
+        """Copia la edición de la vista activa a todas las vistas marcadas.
+
+        La receta se copia en coordenadas normalizadas. Las deformaciones se
+        calculan en paralelo en segundo plano y el resultado se aplica de una
+        vez como una única transacción deshacible.
+        """
+        source = self.get_current_image_view()
+        targets = [view for view in self.marked_views
+                   if view is not source and view.pixmap_item is not None]
+        recipe = source.get_normalized_recipe() if source else None
+        if recipe is None or not targets:
+            self.statusBar.showMessage(self.translator.get_text('batch_no_targets'))
+            return
+
+        job = None
+        if recipe['deform_points'] is not None:
+            def job(view):
+                points = view.denormalize_points(recipe['deform_points'])
+                return render_batch_deform(view.deformer, points, self.shared_buffers,
+                                           self.render_service.run_in_process)
+
+        self.start_batch(targets, job,
+                         lambda view, rendered: view.apply_normalized_recipe(recipe, rendered),
+                         'batch_applied')
+
+    def auto_frame_images(self):
+        """Ajusta el marco de recorte al contenido de cada imagen del lote.
+
+        El contenido se detecta sobre copias reducidas en paralelo.
+        """
+        targets = self.batch_targets()
+        if not targets:
+            return
+
+        paths = self.batch_unloaded_paths()
+        if not targets and not paths:
+            return
+
+        aspect = self.target_width / self.target_height
+        mode = self.settings.get('framing/mode')
+        proxy_size = self.settings.get('framing/proxy_size')
+        tolerance = self.settings.get('framing/tolerance')
+        # Las imágenes se toman aquí y no en los hilos de trabajo, que podrían
+        # ver otra si se deshace una edición mientras tanto
+        images = {view: view.current_image for view in targets}
+
+        def compute(image):
+            return auto_frame(image, aspect, mode, proxy_size, tolerance)
+
+        def job(target):
+            if target in images:
+                return compute(images[target])
+            return frame_unloaded(target, compute, proxy_size)
+
+        def apply(view, frame):
+            if frame is not None:
+                view.set_selection_frame(*frame)
+
+        self.start_batch(targets + paths, job, apply, 'auto_frame_applied', self.set_recipe_frame)
+
+    def smart_crop_images(self):
+        """Coloca el marco de recorte de cada imagen del lote sobre la zona con más detalle.
+
+        La energía de cada imagen se calcula sobre copias reducidas en paralelo.
+        """
+        targets = self.batch_targets()
+        paths = self.batch_unloaded_paths()
+        if not targets and not paths:
+            return
+
+        aspect = self.target_width / self.target_height
+        scale = self.settings.get('framing/smart_scale')
+        proxy_size = self.settings.get('framing/proxy_size')
+        images = {view: view.current_image for view in targets}
+
+        def compute(image):
+            return smart_crop(image, aspect, scale, proxy_size)
+
+        def job(target):
+            if target in images:
+                return compute(images[target])
+            return frame_unloaded(target, compute, proxy_size)
+
+        self.start_batch(targets + paths, job,
+                         lambda view, frame: view.set_selection_frame(*frame) if frame else None,
+                         'smart_crop_applied', self.set_recipe_frame)
+
+    def on_batch_item_finished(self, target, job):
+        """Recoge el resultado de una vista o ruta del lote (hilo de la interfaz)."""
+        if self.batch is None:
+            return
+        try:
+            self.batch['results'][target] = job.result()
+        except Exception as e:
+            metrics.count('errors')
+            logger.error("Error en la operación en lote: %s", e)
+            self.batch['results'][target] = None
+
+        if len(self.batch['results']) == len(self.batch['targets']):
+            self.finish_batch()
+
+    def finish_batch(self):
+        """Aplica el lote a todas las vistas y lo registra como una transacción.
+
+        Las rutas del lote cuya imagen se ha cargado mientras tanto se
+        aplican a su vista; las que siguen sin vista, a su receta (no entran
+        en la transacción).
+        """
+        batch, self.batch = self.batch, None
+        shown = self._shown_views() if batch['apply_path'] is not None else {}
+        recipes_applied = 0
+        self.transaction_views = []
+        try:
+            for target in batch['targets']:
+                result = batch['results'].get(target)
+                if isinstance(target, str):
+                    if target in shown:
+                        target = shown[target]
+                    else:
+                        if result is not None:
+                            batch['apply_path'](target, result)
+                            recipes_applied += 1
+                        continue
+                batch['apply'](target, result)
+        finally:
+            views, self.transaction_views = self.transaction_views, None
+        if views:
+            # Cada vista con el estado que le deja el lote, para que deshacer
+            # la transacción no retroceda las que ya se deshicieron por separado
+            self.timeline.record(views)
+        self.statusBar.showMessage(
+            f"{self.translator.get_text(batch['message_key'])} {len(views) + recipes_applied}")
 
     def on_image_modified(self):
         """Maneja el evento de modificación de imagen."""
@@ -962,45 +1922,122 @@ class ImageEditor(QMainWindow):
             # Obtener el estado actual de la imagen
             current_state = sender.get_state()
             if current_state:
-                # Truncar la historia si estamos en medio de ella
-                self.history = self.history[:self.history_index + 1]
-                # Añadir el nuevo estado a la historia
-                self.history.append({'view': sender, 'state': current_state})
-                self.history_index = len(self.history) - 1
-                print(f"Estado guardado: {self.history_index}")
+                # El estado inicial de una imagen no es una edición deshacible
+                is_initial = len(sender.history) == 0
+                sender.history.push(current_state)
+                if not is_initial:
+                    # Dentro de una transacción se registra todo el lote al final
+                    entry = (sender.image_path, sender.history.current_id)
+                    if self.transaction_views is not None:
+                        self.transaction_views.append(entry)
+                    else:
+                        self.timeline.record((entry,))
+                    self.journal_edit(sender)
+                metrics.count('history_pushes')
+
+    def journal_edit(self, view):
+        """Registra en el diario la receta actual de una vista si ha cambiado."""
+        recipe = view.get_recipe()
+        if view.image_path is None or recipe is None:
+            return
+        if self.recipes.get(view.image_path) == recipe:
+            return
+        self.recipes[view.image_path] = recipe
+        self.journal.append({'op': 'edit', 'path': view.image_path, 'recipe': recipe})
+
+    def _timeline_applies(self, entry, view):
+        """Indica si una entrada del historial global es la que toca deshacer o rehacer."""
+        return entry and (self.global_undo or len(entry) > 1
+                          or (view is not None and entry[0][0] == view.image_path))
+
+    def _history_id(self, path, attr):
+        """Identificador actual o de rehacer del historial de una imagen (None si no tiene)."""
+        history = self.histories.get(path)
+        return getattr(history, attr) if history is not None else None
+
+    def _shown_views(self):
+        """Vistas que muestran ya su imagen, por ruta."""
+        return {view.image_path: view for view in self.all_image_views()
+                if view.image_path is not None and view not in self.pending_views}
+
+    def _images_to_undo(self):
+        """Determina qué imágenes afecta el próximo deshacer.
+
+        Las entradas del historial global en las que todas las imágenes ya
+        se han deshecho por separado se saltan.
+
+        Returns:
+            tuple - Pares (ruta, identificador del estado que se deshace)
+        """
+        view = self.get_current_image_view()
+        while self._timeline_applies(self.timeline.peek_undo(), view):
+            entry = self.timeline.pop_undo()
+            if any(self._history_id(path, 'current_id') == state_id for path, state_id in entry):
+                return entry
+        if view is None or view.image_path is None:
+            return ()
+        return ((view.image_path, view.history.current_id),)
+
+    def _images_to_redo(self):
+        """Determina qué imágenes afecta el próximo rehacer.
+
+        Returns:
+            tuple - Pares (ruta, identificador del estado al que se rehace)
+        """
+        view = self.get_current_image_view()
+        while self._timeline_applies(self.timeline.peek_redo(), view):
+            entry = self.timeline.pop_redo()
+            if any(self._history_id(path, 'redo_id') == state_id for path, state_id in entry):
+                return entry
+        if view is None or view.image_path is None:
+            return ()
+        return ((view.image_path, view.history.redo_id),)
 
     def undo(self):
         """Deshace la última acción."""
         try:
-            if self.history_index > 0:
-                self.history_index -= 1
-                history_item = self.history[self.history_index]
-                view = history_item['view']
-                state = history_item['state']
-                view.set_state(state)
-                self.statusBar.showMessage(f"Deshacer (estado {self.history_index})")
-                print(f"Deshacer: restaurado estado {self.history_index}")
+            restored = 0
+            shown = self._shown_views()
+            # En orden inverso, por si el lote editó una imagen más de una vez
+            for path, state_id in reversed(self._images_to_undo()):
+                # Solo si la imagen se muestra (su estado se restaura en su
+                # vista) y sigue en el estado que dejó la edición
+                view = shown.get(path)
+                if view is None or view.history.current_id != state_id:
+                    continue
+                state = view.history.undo()
+                if state:
+                    view.set_state(state)
+                    self.journal_edit(view)
+                    restored += 1
+            if restored:
+                self.statusBar.showMessage(f"Deshacer ({restored} imagen(es))")
             else:
                 self.statusBar.showMessage("No hay más acciones para deshacer")
         except Exception as e:
-            print(f"Error en undo: {e}")
+            logger.error("Error en undo: %s", e)
             self.statusBar.showMessage(f"Error al deshacer: {e}")
 
     def redo(self):
         """Rehace la última acción deshecha."""
         try:
-            if self.history_index < len(self.history) - 1:
-                self.history_index += 1
-                history_item = self.history[self.history_index]
-                view = history_item['view']
-                state = history_item['state']
-                view.set_state(state)
-                self.statusBar.showMessage(f"Rehacer (estado {self.history_index})")
-                print(f"Rehacer: restaurado estado {self.history_index}")
+            restored = 0
+            shown = self._shown_views()
+            for path, state_id in self._images_to_redo():
+                view = shown.get(path)
+                if view is None or view.history.redo_id != state_id:
+                    continue
+                state = view.history.redo()
+                if state:
+                    view.set_state(state)
+                    self.journal_edit(view)
+                    restored += 1
+            if restored:
+                self.statusBar.showMessage(f"Rehacer ({restored} imagen(es))")
             else:
                 self.statusBar.showMessage("No hay más acciones para rehacer")
         except Exception as e:
-            print(f"Error en redo: {e}")
+            logger.error("Error en redo: %s", e)
             self.statusBar.showMessage(f"Error al rehacer: {e}")
 
     def reset_current_image(self):
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+from PyQt5.QtWidgets import QGraphicsItem, QGraphicsPixmapItem, QStyleOptionGraphicsItem
+from PyQt5.QtCore import Qt, QRect, QRectF, QSizeF
+from PyQt5.QtGui import QPainter
+
+
+def pixmap_bytes(pixmap):
+    """Bytes que ocupan los píxeles de un QPixmap."""
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+class LodPixmapItem(QGraphicsPixmapItem):
+    """QGraphicsPixmapItem que pinta con una pirámide de niveles de detalle.
+
+    El nivel 0 es el pixmap completo y cada nivel siguiente mide la mitad.
+    Los niveles se generan bajo demanda la primera vez que el zoom los
+    necesita, de modo que al alejar la vista se filtra un pixmap pequeño y
+    el coste de repintado es proporcional a los píxeles en pantalla. La
+    geometría del item (boundingRect, mapToScene...) no cambia con el nivel.
+    """
+
+    MIN_LEVEL_SIZE = 64  # Lado mínimo del nivel más pequeño de la pirámide
+
+    def __init__(self, pixmap=None, parent=None):
+        if pixmap is None:
+            super().__init__(parent)
+        else:
+            super().__init__(pixmap, parent)
+        self._levels = {}  # nivel -> QPixmap reducido
+
+    def setPixmap(self, pixmap):
+        """Cambia el pixmap e invalida la pirámide."""
+        self._levels = {}
+        super().setPixmap(pixmap)
+
+    def max_level(self):
+        """Último nivel cuyo lado menor sigue siendo mayor que MIN_LEVEL_SIZE."""
+        pixmap = self.pixmap()
+        smallest_side = min(pixmap.width(), pixmap.height())
+        if smallest_side <= self.MIN_LEVEL_SIZE:
+            return 0
+        return int(math.log2(smallest_side / self.MIN_LEVEL_SIZE))
+
+    def level_for_scale(self, scale):
+        """Nivel más reducido que todavía no necesita ampliarse a esa escala."""
+        if scale <= 0 or scale >= 1.0:
+            return 0
+        return min(int(math.floor(math.log2(1.0 / scale))), self.max_level())
+
+    def level_pixmap(self, level):
+        """Obtiene (generándolo si hace falta) el pixmap de un nivel."""
+        if level <= 0:
+            return self.pixmap()
+        pixmap = self._levels.get(level)
+        if pixmap is None:
+            previous = self.level_pixmap(level - 1)
+            pixmap = previous.scaled(max(1, previous.width() // 2), max(1, previous.height() // 2),
+                                     Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self._levels[level] = pixmap
+        return pixmap
+
+    def cache_bytes(self):
+        """Bytes ocupados por los niveles reducidos generados."""
+        return sum(pixmap_bytes(pixmap) for pixmap in self._levels.values())
+
+    def paint(self, painter, option, widget=None):
+        """Pinta el nivel de la pirámide más cercano al zoom actual."""
+        pixmap = self.pixmap()
+        if pixmap.isNull():
+            return
+
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = self.level_for_scale(scale)
+        if level == 0:
+            super().paint(painter, option, widget)
+            return
+
+        level_pixmap = self.level_pixmap(level)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform,
+                              self.transformationMode() == Qt.SmoothTransformation)
+        target = QRectF(self.offset(), QSizeF(pixmap.size()))
+        painter.drawPixmap(target, level_pixmap, QRectF(level_pixmap.rect()))
+
+
+class TiledPixmapItem(LodPixmapItem):
+    """Item para imágenes enormes que solo pinta la zona expuesta.
+
+    A escala completa se pinta directamente del pixmap el rectángulo de los
+    mosaicos que intersectan la zona expuesta, sin copiarlos, así que el
+    coste de repintado depende de lo visible y no de la imagen y no se
+    guarda nada aparte del propio pixmap. Al alejar la vista se usa la
+    pirámide de niveles de LodPixmapItem.
+    """
+
+    TILE_SIZE = 512
+    MIN_PIXELS = 4096 * 4096  # A partir de este tamaño conviene pintar solo lo expuesto
+
+    def __init__(self, pixmap=None, parent=None):
+        super().__init__(pixmap, parent)
+        # Necesario para que option.exposedRect contenga la zona a repintar
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    @classmethod
+    def wants(cls, pixmap):
+        """Indica si un pixmap es lo bastante grande para pintarse por mosaicos."""
+        return pixmap.width() * pixmap.height() > cls.MIN_PIXELS
+
+    def exposed_source(self, exposed):
+        """Rectángulo del pixmap formado por los mosaicos que cortan la zona expuesta.
+
+        Se alinea a la rejilla de mosaicos para que los repintados parciales
+        de un desplazamiento muestreen siempre las mismas zonas.
+        """
+        pixmap = self.pixmap()
+        left = int(exposed.left()) // self.TILE_SIZE * self.TILE_SIZE
+        top = int(exposed.top()) // self.TILE_SIZE * self.TILE_SIZE
+        right = min(pixmap.width(), -(-int(math.ceil(exposed.right())) // self.TILE_SIZE) * self.TILE_SIZE)
+        bottom = min(pixmap.height(), -(-int(math.ceil(exposed.bottom())) // self.TILE_SIZE) * self.TILE_SIZE)
+        return QRect(left, top, right - left, bottom - top)
+
+    def paint(self, painter, option, widget=None):
+        """Pinta los mosaicos visibles o, si la vista está alejada, un nivel reducido."""
+        pixmap = self.pixmap()
+        if pixmap.isNull():
+            return
+
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if self.level_for_scale(scale) > 0:
+            super().paint(painter, option, widget)
+            return
+
+        # Zona expuesta en coordenadas del pixmap
+        offset = self.offset()
+        exposed = option.exposedRect.translated(-offset).intersected(QRectF(pixmap.rect()))
+        if exposed.isEmpty():
+            return
+
+        source = QRectF(self.exposed_source(exposed))
+        painter.setRenderHint(QPainter.SmoothPixmapTransform,
+                              self.transformationMode() == Qt.SmoothTransformation)
+        painter.drawPixmap(source.translated(offset), pixmap, source)
@@ -1,25 +1,81 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from PIL import Image
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtCore import QPointF, QRectF
-import numpy as np
 import io
-import cv2  # Necesitamos OpenCV para la deformación
+import logging
+from lazy_import import lazy_module
+
+# Las bibliotecas pesadas se importan al usarlas por primera vez
+Image = lazy_module('PIL.Image')
+np = lazy_module('numpy')
+cv2 = lazy_module('cv2')  # Necesitamos OpenCV para la deformación
+
+logger = logging.getLogger(__name__)
+
+# Modos que se conservan tal cual y su formato de QImage equivalente. Las
+# imágenes solo pasan a RGBA cuando necesitan transparencia (al deformarlas)
+QIMAGE_FORMATS = {
+    'L': QImage.Format_Grayscale8,
+    'RGB': QImage.Format_RGB888,
+    'RGBA': QImage.Format_RGBA8888,
+}
+
+# Modos sin canal alfa que se convierten a uno de QIMAGE_FORMATS
+OPAQUE_MODES = {'1': 'L', 'I': 'L', 'I;16': 'L', 'I;16B': 'L', 'I;16L': 'L', 'F': 'L',
+                'CMYK': 'RGB', 'YCbCr': 'RGB', 'LAB': 'RGB', 'HSV': 'RGB'}
 
 class ImageProcessor:
+    @staticmethod
+    def native_mode(mode, info=None):
+        """Modo de QIMAGE_FORMATS en el que se conserva una imagen de ese modo.
+
+        Las imágenes opacas se quedan en L o RGB; solo las que tienen (o pueden
+        tener) transparencia pasan a RGBA.
+
+        Args:
+            info: dict - Info de la imagen PIL, para saber si una paleta tiene transparencia
+        """
+        if mode in QIMAGE_FORMATS:
+            return mode
+        if mode == 'P':
+            return 'RGBA' if info and 'transparency' in info else 'RGB'
+        return OPAQUE_MODES.get(mode, 'RGBA')
+
+    @staticmethod
+    def to_native_mode(pil_image):
+        """Convierte una imagen a su modo nativo (sin copiarla si ya lo está)."""
+        mode = ImageProcessor.native_mode(pil_image.mode, pil_image.info)
+        return pil_image if pil_image.mode == mode else pil_image.convert(mode)
+
     @staticmethod
     def pil_to_pixmap(pil_image):
-        """Convierte una imagen PIL a QPixmap."""
-        # Asegurarse de que la imagen esté en modo RGBA
-        if pil_image.mode != "RGBA":
-            pil_image = pil_image.convert("RGBA")
+        """Convierte una imagen PIL a QPixmap con el formato equivalente a su modo."""
+        pil_image = ImageProcessor.to_native_mode(pil_image)
+        data = pil_image.tobytes("raw", pil_image.mode)
+        return QPixmap.fromImage(ImageProcessor._wrap_qimage(pil_image, data))
+
+    @staticmethod
+    def pil_to_qimage(pil_image):
+        """Convierte una imagen PIL a un QImage que es dueño de sus datos.
+
+        A diferencia de QPixmap, un QImage puede crearse en un hilo de trabajo.
+        """
+        pil_image = ImageProcessor.to_native_mode(pil_image)
+        data = pil_image.tobytes("raw", pil_image.mode)
+        # Copiar para no depender del buffer de Python
+        return ImageProcessor._wrap_qimage(pil_image, data).copy()
 
-        # Convertir PIL Image a QPixmap usando buffer
-        data = pil_image.tobytes("raw", "RGBA")
-        qim = QImage(data, pil_image.size[0], pil_image.size[1], QImage.Format_RGBA8888)
-        return QPixmap.fromImage(qim)
+    @staticmethod
+    def _wrap_qimage(pil_image, data):
+        """QImage sobre los bytes de una imagen en un modo de QIMAGE_FORMATS, sin copiarlos.
+
+        Las filas de L y RGB no van alineadas a 4 bytes, así que se indica su
+        longitud. data debe seguir vivo mientras se use el QImage.
+        """
+        width, height = pil_image.size
+        return QImage(data, width, height, width * len(pil_image.getbands()), QIMAGE_FORMATS[pil_image.mode])
 
     @staticmethod
     def pixmap_to_pil(pixmap):
@@ -95,14 +151,17 @@ class ImageProcessor:
         try:
             # Asegurarse de que tenemos 4 puntos
             if len(source_points) != 4 or len(target_points) != 4:
-                print("Se requieren exactamente 4 puntos para la deformación")
+                logger.warning("Se requieren exactamente 4 puntos para la deformación")
                 return image
 
-            # Convertir la imagen PIL a formato OpenCV (numpy array)
-            img_cv = np.array(image)
+            # Convertir la imagen PIL a formato OpenCV (numpy array); en modo
+            # nativo es L (un array 2-D, sin canales), RGB o RGBA
+            img_cv = np.array(ImageProcessor.to_native_mode(image))
 
-            # Convertir a BGR si es RGB (OpenCV usa BGR)
-            if img_cv.shape[2] == 3:  # Si tiene 3 canales (RGB)
+            # Convertir a BGR si es RGB (OpenCV usa BGR); L se deforma tal cual
+            if img_cv.ndim == 2:
+                pass
+            elif img_cv.shape[2] == 3:  # Si tiene 3 canales (RGB)
                 img_cv = cv2.cvtColor(img_cv, cv2.COLOR_RGB2BGR)
             elif img_cv.shape[2] == 4:  # Si tiene 4 canales (RGBA)
                 img_cv = cv2.cvtColor(img_cv, cv2.COLOR_RGBA2BGRA)
@@ -119,7 +178,9 @@ class ImageProcessor:
             warped = cv2.warpPerspective(img_cv, matrix, (width, height))
 
             # Convertir de nuevo a formato RGB/RGBA para PIL
-            if warped.shape[2] == 3:  # Si tiene 3 canales (BGR)
+            if warped.ndim == 2:
+                pass
+            elif warped.shape[2] == 3:  # Si tiene 3 canales (BGR)
                 warped = cv2.cvtColor(warped, cv2.COLOR_BGR2RGB)
             elif warped.shape[2] == 4:  # Si tiene 4 canales (BGRA)
                 warped = cv2.cvtColor(warped, cv2.COLOR_BGRA2RGBA)
@@ -127,5 +188,37 @@ class ImageProcessor:
             # Convertir de nuevo a imagen PIL
             return Image.fromarray(warped)
         except Exception as e:
-            print(f"Error en deform_image: {e}")
+            logger.error("Error en deform_image: %s", e)
             return image
+
+    @staticmethod
+    def outpaint_mask(image, dilation=0, feather=0):
+        """
+        Genera la máscara de outpainting a partir del canal alfa de un recorte.
+
+        La zona a rellenar (la que quedó transparente al mover, rotar o
+        deformar) es blanca y la imagen negra.
+
+        Args:
+            image: PIL.Image - Recorte renderizado (sin alfa, la máscara queda vacía)
+            dilation: int - Píxeles que la zona a rellenar invade la imagen
+            feather: int - Radio del difuminado del borde (0 mantiene la máscara binaria)
+
+        Returns:
+            PIL.Image - Máscara en modo L
+        """
+        if 'A' not in image.getbands():
+            # Un recorte opaco no tiene nada que rellenar
+            return Image.new('L', image.size, 0)
+
+        alpha = np.asarray(image.getchannel('A'))
+        mask = np.where(alpha < 255, 255, 0).astype(np.uint8)
+
+        if dilation > 0:
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * dilation + 1, 2 * dilation + 1))
+            mask = cv2.dilate(mask, kernel)
+
+        if feather > 0:
+            mask = cv2.GaussianBlur(mask, (2 * feather + 1, 2 * feather + 1), 0)
+
+        return Image.fromarray(mask, 'L')
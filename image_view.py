@@ -2,13 +2,22 @@
 # -*- coding: utf-8 -*-
 
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsRectItem
-from PyQt5.QtCore import Qt, QPointF, QRectF, pyqtSignal
+from PyQt5.QtCore import Qt, QPointF, QRectF, QSizeF, QTimer, pyqtSignal
 from PyQt5.QtGui import QPen, QColor, QPixmap, QTransform, QCursor, QPainter, QImage, QBrush
-from PIL import Image
 from image_processor import ImageProcessor
 from image_deformer import ImageDeformer
+from history import UndoStack
+from image_items import LodPixmapItem, TiledPixmapItem
+from framing import fit_aspect
+from metrics import metrics
+import logging
 import math
-import numpy as np
+from lazy_import import lazy_module
+
+Image = lazy_module('PIL.Image')
+np = lazy_module('numpy')
+
+logger = logging.getLogger(__name__)
 
 class ImageView(QGraphicsView):
     """Widget personalizado para visualizar y editar imágenes."""
@@ -23,6 +32,24 @@ class ImageView(QGraphicsView):
     MODE_ROTATE = 3
     MODE_DEFORM = 4
 
+    # Límites del zoom con la rueda: relativo al ajuste inicial por abajo y
+    # en píxeles de pantalla por píxel de imagen por arriba
+    MIN_ZOOM_FIT_RATIO = 0.5
+    MAX_ZOOM = 32.0
+
+    # Política de calidad de render compartida por todas las vistas: durante
+    # un arrastre se pinta rápido y sin suavizado, y al soltar o tras un
+    # tiempo sin movimiento se hace un único repintado de calidad final
+    adaptive_quality = True
+    quality_idle_ms = 150
+
+    # Puntos de control para deformación, en el orden que espera el deformador
+    CONTROL_POINT_NAMES = ["topleft", "topright", "bottomright", "bottomleft"]
+    CONTROL_POINT_SIZE = 25  # Tamaño del punto de control (aumentado)
+
+    # Muestra sobre la vista el número de items de la escena (depuración)
+    show_debug_overlay = False
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -37,6 +64,15 @@ class ImageView(QGraphicsView):
         self.setViewportMargins(0, 0, 0, 0)  # Eliminar márgenes para maximizar el área visible
         self.setBackgroundBrush(QColor(30, 30, 30))
 
+        # Escala de la vista al ajustar la escena completa (base de los límites de zoom)
+        self.fit_zoom = 1.0
+
+        # Calidad de render interactiva durante los arrastres
+        self.interactive_quality = False
+        self.quality_timer = QTimer(self)
+        self.quality_timer.setSingleShot(True)
+        self.quality_timer.timeout.connect(self.set_final_quality)
+
         # Variables para el desplazamiento con el botón central del ratón
         self.middle_button_pressed = False
         self.last_pan_point = QPointF()
@@ -51,6 +87,7 @@ class ImageView(QGraphicsView):
 
         # Estado
         self.mode = self.MODE_VIEW
+        self.image_path = None
         self.original_image = None
         self.current_image = None
         self.last_mouse_pos = QPointF()
@@ -59,6 +96,8 @@ class ImageView(QGraphicsView):
         self.scale_factor_x = 1.0
         self.scale_factor_y = 1.0
         self.significant_change = False  # Indica si ha habido un cambio significativo que requiere guardar estado
+        self.deformed = False  # Indica si la imagen tiene una deformación aplicada
+        self.custom_selection = None  # Marco de recorte elegido (QRectF en la escena) o None si es el centrado
 
         # Inicializar el deformador de imágenes
         self.deformer = ImageDeformer()
@@ -72,33 +111,117 @@ class ImageView(QGraphicsView):
         # Tamaño objetivo para recorte
         self.target_size = (1024, 1024)
 
-    def set_image(self, image_path):
-        """Establece una nueva imagen para editar."""
-        try:
-            # Cargar imagen con PIL
-            pil_image = Image.open(image_path)
+        # Historial de deshacer/rehacer de la imagen que muestra la vista
+        self.history = UndoStack(on_discard=self.discard_state)
+
+        # Pixmap sin deformar de la imagen; los estados sin deformación lo
+        # reutilizan en lugar de guardar una copia de los píxeles
+        self.base_pixmap = None
+
+        # Almacén compartido de instantáneas de píxeles (lo asigna el editor)
+        self.snapshot_store = None
+        self._last_snapshot = None  # (cacheKey del pixmap, identificador)
+
+    @classmethod
+    def configure_rendering(cls, adaptive_quality, idle_ms):
+        """Configura la política de calidad de render para todas las vistas."""
+        cls.adaptive_quality = adaptive_quality
+        cls.quality_idle_ms = idle_ms
+
+    def set_interactive_quality(self):
+        """Pasa a render rápido mientras dura un arrastre."""
+        if not self.adaptive_quality:
+            return
+
+        if not self.interactive_quality:
+            self.interactive_quality = True
+            self.setRenderHint(QPainter.Antialiasing, False)
+            if self.pixmap_item:
+                self.pixmap_item.setTransformationMode(Qt.FastTransformation)
+
+        # Si el ratón se queda quieto se repinta con calidad final
+        self.quality_timer.start(self.quality_idle_ms)
+
+    def set_final_quality(self):
+        """Vuelve a render de calidad final con un único repintado."""
+        self.quality_timer.stop()
+        if not self.interactive_quality:
+            return
 
-            # Convertir a formato PNG con transparencia
-            if pil_image.mode != 'RGBA':
-                pil_image = pil_image.convert('RGBA')
+        self.interactive_quality = False
+        self.setRenderHint(QPainter.Antialiasing, True)
+        if self.pixmap_item:
+            self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
+        self.viewport().update()
+
+    @staticmethod
+    def decode(image_path, load=None):
+        """Decodifica una imagen y la prepara para mostrarla.
+
+        No crea ningún QPixmap, así que puede ejecutarse en un hilo de trabajo
+        (el servicio de render la usa para decodificar y precargar).
+
+        Args:
+            load: callable - load(ruta) devuelve la imagen PIL decodificada
+                  (por ejemplo en un proceso de trabajo); por defecto se
+                  decodifica en el hilo actual
+
+        Returns:
+            tuple - (PIL.Image en su modo nativo L, RGB o RGBA, QImage con los mismos píxeles)
+        """
+        # Cargar imagen con PIL
+        with metrics.span('decode'):
+            if load is not None:
+                pil_image = load(image_path)
+            else:
+                pil_image = Image.open(image_path)
+                pil_image.load()
+
+        with metrics.span('convert'):
+            # Se conserva el modo nativo: el alfa solo hace falta al deformar
+            pil_image = ImageProcessor.to_native_mode(pil_image)
+            qimage = ImageProcessor.pil_to_qimage(pil_image)
+
+        return pil_image, qimage
 
-            # Guardar copias de la imagen original y actual
-            self.original_image = pil_image.copy()
+    def set_image(self, image_path, decoded=None, history=None):
+        """Establece una nueva imagen para editar.
+
+        Args:
+            decoded: tuple - Resultado de decode() si ya se decodificó en segundo plano
+            history: UndoStack - Historial propio de la imagen (el editor lo
+                     guarda por ruta); si ya tiene estados se restaura el
+                     actual. Por defecto la imagen empieza con uno vacío
+        """
+        try:
+            if decoded is None:
+                decoded = self.decode(image_path)
+            pil_image, qimage = decoded
+
+            # Guardar la imagen original y una copia de trabajo
+            self.image_path = image_path
+            self.original_image = pil_image
             self.current_image = pil_image.copy()
 
-            # Imprimir información sobre la imagen
-            print(f"Imagen cargada: {image_path}")
-            print(f"Dimensiones: {pil_image.width}x{pil_image.height}")
-            print(f"Modo: {pil_image.mode}")
+            # Convertir a QPixmap (solo puede hacerse en el hilo de la interfaz)
+            pixmap = QPixmap.fromImage(qimage)
 
-            # Convertir a QPixmap
-            pixmap = ImageProcessor.pil_to_pixmap(pil_image)
+            metrics.count('images_loaded')
+            logger.debug("Imagen cargada: %s (%dx%d, %s)", image_path,
+                         pil_image.width, pil_image.height, pil_image.mode)
 
-            # Limpiar escena
+            # Limpiar escena (elimina también el marco y los puntos de control)
             self.scene.clear()
+            self.selection_rect = None
+            self.control_points = []
 
             # Crear nuevo item de pixmap
-            self.pixmap_item = QGraphicsPixmapItem(pixmap)
+            self.base_pixmap = pixmap
+            # Las imágenes enormes se pintan por mosaicos
+            if TiledPixmapItem.wants(pixmap):
+                self.pixmap_item = TiledPixmapItem(pixmap)
+            else:
+                self.pixmap_item = LodPixmapItem(pixmap)
             self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
             self.scene.addItem(self.pixmap_item)
             self.pixmap_item.setZValue(1)  # Valor Z intermedio para que esté entre el marco y los puntos de control
@@ -115,11 +238,14 @@ class ImageView(QGraphicsView):
 
             # Ajustar vista
             self.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+            self.fit_zoom = self.current_zoom()
 
             # Reiniciar estado
             self.rotation_angle = 0
             self.scale_factor_x = 1.0
             self.scale_factor_y = 1.0
+            self.deformed = False
+            self.custom_selection = None
 
             # Inicializar el deformador con la imagen actual
             self.deformer.load_pil_image(self.current_image)
@@ -127,17 +253,49 @@ class ImageView(QGraphicsView):
             # Crear puntos de control para deformación
             self.create_control_points()
 
-            # Emitir señal de modificación para guardar el estado inicial
-            self.imageModified.emit()
+            # El historial va con la imagen: la anterior conserva el suyo
+            self.history = history if history is not None else UndoStack()
+            self.history.on_discard = self.discard_state
+            self._last_snapshot = None
+
+            if len(self.history):
+                # La imagen vuelve a mostrarse (por ejemplo tras ordenar o
+                # filtrar): se retoma en el estado en que se dejó
+                self.set_state(self.history.current())
+            else:
+                # Emitir señal de modificación para guardar el estado inicial
+                self.imageModified.emit()
 
         except Exception as e:
-            print(f"Error al cargar la imagen: {e}")
+            metrics.count('errors')
+            logger.error("Error al cargar la imagen %s: %s", image_path, e)
+
+    def clear_image(self):
+        """Vacía la vista para que no muestre ninguna imagen."""
+        self.scene.clear()
+        self.pixmap_item = None
+        self.selection_rect = None
+        self.control_points = []
+        self.image_path = None
+        self.original_image = None
+        self.current_image = None
+        self.base_pixmap = None
+        self.deformed = False
+        self.custom_selection = None
+        # El historial de la imagen no se vacía: puede volver a mostrarse
+        self.history = UndoStack(on_discard=self.discard_state)
+        self._last_snapshot = None
 
     def create_selection_rect(self):
         """Crea el rectángulo de selección basado en el tamaño objetivo."""
         if not self.pixmap_item:
             return
 
+        # Un marco elegido (por ejemplo con el encuadre automático) tiene prioridad
+        if self.custom_selection is not None:
+            self.update_selection_rect(self.custom_selection)
+            return
+
         # Obtener dimensiones de la imagen
         pixmap_width = self.pixmap_item.pixmap().width()
         pixmap_height = self.pixmap_item.pixmap().height()
@@ -158,23 +316,48 @@ class ImageView(QGraphicsView):
         x = (pixmap_width - selection_width) / 2
         y = (pixmap_height - selection_height) / 2
 
+        self.update_selection_rect(QRectF(x, y, selection_width, selection_height))
+
+    def update_selection_rect(self, rect):
+        """Coloca el rectángulo de selección, creándolo la primera vez."""
+        # Reutilizar el rectángulo de selección si ya existe
+        if self.selection_rect is not None:
+            self.selection_rect.setRect(rect)
+            return
+
         # Crear el rectángulo de selección
-        self.selection_rect = QGraphicsRectItem(x, y, selection_width, selection_height)
+        self.selection_rect = QGraphicsRectItem(rect)
         self.selection_rect.setPen(QPen(QColor(255, 255, 0), 3, Qt.SolidLine))  # Línea sólida más gruesa para mejor visibilidad
 
         # Añadir el rectángulo de selección a la escena con un valor Z alto para que esté encima de la imagen
         self.scene.addItem(self.selection_rect)
         self.selection_rect.setZValue(3)  # Valor Z positivo para que esté encima de la imagen y los puntos de control
 
+    def ensure_control_points(self):
+        """Crea una sola vez los items de los puntos de control y los devuelve.
+
+        Los items se centran en su origen local, así que basta con setPos
+        para colocarlos en una posición de la escena.
+        """
+        if self.control_points:
+            return self.control_points
+
+        size = self.CONTROL_POINT_SIZE
+        for name in self.CONTROL_POINT_NAMES:
+            point = QGraphicsRectItem(-size/2, -size/2, size, size)
+            point.setPen(QPen(QColor(0, 255, 255), 4))  # Borde más grueso
+            point.setBrush(QBrush(QColor(0, 255, 255, 100)))  # Color de relleno semitransparente
+            point.setData(0, name)
+            self.scene.addItem(point)
+            point.setZValue(4)  # Valor Z positivo para que esté encima de la imagen y del marco de selección
+            self.control_points.append(point)
+        return self.control_points
+
     def create_control_points(self):
-        """Crea puntos de control para la deformación de la imagen."""
+        """Coloca los puntos de control para la deformación de la imagen."""
         if not self.pixmap_item:
             return
 
-        # Limpiar puntos existentes
-        for point in self.control_points:
-            self.scene.removeItem(point)
-        self.control_points = []
         self.original_control_positions = {}
         self.current_control_positions = {}
 
@@ -186,41 +369,17 @@ class ImageView(QGraphicsView):
 
         # Si no hay puntos en el deformador, usar las esquinas de la imagen
         if deformer_points is None:
-            points = [
-                (rect.topLeft(), "topleft"),
-                (rect.topRight(), "topright"),
-                (rect.bottomRight(), "bottomright"),
-                (rect.bottomLeft(), "bottomleft")
-            ]
+            positions = [rect.topLeft(), rect.topRight(), rect.bottomRight(), rect.bottomLeft()]
         else:
-            # Convertir los puntos del deformador a coordenadas de la imagen
-            img_width = rect.width()
-            img_height = rect.height()
-            points = [
-                (QPointF(deformer_points[0][0] / img_width * rect.width(),
-                        deformer_points[0][1] / img_height * rect.height()), "topleft"),
-                (QPointF(deformer_points[1][0] / img_width * rect.width(),
-                        deformer_points[1][1] / img_height * rect.height()), "topright"),
-                (QPointF(deformer_points[2][0] / img_width * rect.width(),
-                        deformer_points[2][1] / img_height * rect.height()), "bottomright"),
-                (QPointF(deformer_points[3][0] / img_width * rect.width(),
-                        deformer_points[3][1] / img_height * rect.height()), "bottomleft")
-            ]
-
-        for pos, name in points:
-            # Convertir a coordenadas de escena
-            scene_pos = self.pixmap_item.mapToScene(pos)
+            positions = [QPointF(float(x), float(y)) for x, y in deformer_points]
 
-            # Crear punto de control (más grande para facilitar la selección)
-            point_size = 25  # Tamaño del punto de control (aumentado)
-            point = QGraphicsRectItem(scene_pos.x() - point_size/2, scene_pos.y() - point_size/2, point_size, point_size)
-            point.setPen(QPen(QColor(0, 255, 255), 4))  # Borde más grueso
-            point.setBrush(QBrush(QColor(0, 255, 255, 100)))  # Color de relleno semitransparente
-            point.setData(0, name)
+        for point, pos in zip(self.ensure_control_points(), positions):
+            name = point.data(0)
+
+            # Convertir a coordenadas de escena y mover el punto existente
+            scene_pos = self.pixmap_item.mapToScene(pos)
             point.setData(1, pos)  # Guardar la posición relativa en el pixmap
-            self.scene.addItem(point)
-            point.setZValue(4)  # Valor Z positivo para que esté encima de la imagen y del marco de selección
-            self.control_points.append(point)
+            point.setPos(scene_pos)
 
             # Guardar posición original y actual
             self.original_control_positions[name] = (scene_pos.x(), scene_pos.y())
@@ -228,10 +387,28 @@ class ImageView(QGraphicsView):
 
     def set_target_size(self, width, height):
         """Establece el tamaño objetivo para el recorte."""
+        # Un marco elegido deja de ser válido si cambia la relación de aspecto
+        if self.target_size != (width, height):
+            self.custom_selection = None
         self.target_size = (width, height)
         if self.pixmap_item:
             self.create_selection_rect()
 
+    def set_selection_frame(self, x, y, width, height):
+        """Establece un marco de recorte en coordenadas de la imagen.
+
+        El marco se lleva a la escena con la transformación actual de la
+        imagen y se reajusta a la relación de aspecto del tamaño objetivo.
+        """
+        if not self.pixmap_item:
+            return
+
+        rect = self.pixmap_item.mapRectToScene(QRectF(x, y, width, height))
+        aspect = self.target_size[0] / self.target_size[1]
+        self.custom_selection = QRectF(*fit_aspect(rect.x(), rect.y(), rect.width(), rect.height(), aspect))
+        self.create_selection_rect()
+        self.imageModified.emit()
+
     def clear_control_points(self):
         """Limpia todos los puntos de control."""
         # Limpiar puntos de control
@@ -269,7 +446,7 @@ class ImageView(QGraphicsView):
             elif self.mode == self.MODE_DEFORM:
                 # Comprobar si se ha hecho clic en un punto de control
                 for point in self.control_points:
-                    if point.contains(self.last_mouse_pos):
+                    if point.contains(point.mapFromScene(self.last_mouse_pos)):
                         self.active_control_point = point
                         break
         elif event.button() == Qt.MiddleButton:
@@ -291,6 +468,7 @@ class ImageView(QGraphicsView):
             # El modo ScrollHandDrag se encarga del desplazamiento automáticamente
             # Solo actualizamos la posición para cálculos futuros
             self.last_pan_point = event.pos()
+            self.set_interactive_quality()
             return  # No procesar más eventos
 
         if not self.pixmap_item or not self.is_dragging:
@@ -299,6 +477,9 @@ class ImageView(QGraphicsView):
         current_pos = self.mapToScene(event.pos())
         delta = current_pos - self.last_mouse_pos
 
+        if event.buttons() & (Qt.LeftButton | Qt.RightButton):
+            self.set_interactive_quality()
+
         if self.mode == self.MODE_MOVE and event.buttons() & Qt.LeftButton:
             # Mover la imagen
             self.pixmap_item.moveBy(delta.x(), delta.y())
@@ -360,8 +541,7 @@ class ImageView(QGraphicsView):
 
         elif self.mode == self.MODE_DEFORM and self.active_control_point:
             # Mover el punto de control
-            point_size = 25  # Tamaño del punto de control (aumentado)
-            self.active_control_point.setPos(current_pos - QPointF(point_size/2, point_size/2))  # Ajustar por el tamaño del punto
+            self.active_control_point.setPos(current_pos)
 
             # Actualizar la posición actual del punto de control
             name = self.active_control_point.data(0)
@@ -389,15 +569,10 @@ class ImageView(QGraphicsView):
             # Emitir señal de que la imagen ha sido modificada
             self.imageModified.emit()
 
-            # Recrear los puntos de control para seguir deformando la imagen con facilidad
-            # Limpiar los puntos de control existentes
-            self.clear_control_points()
-
-            # Crear nuevos puntos de control
+            # Recolocar los puntos de control para seguir deformando la imagen con facilidad
             self.create_control_points()
 
-            # Mostrar mensaje informativo
-            print("Deformación aplicada. Puedes seguir deformando la imagen arrastrando los puntos.")
+            logger.debug("Deformación aplicada")
 
         self.active_control_point = None
 
@@ -421,6 +596,9 @@ class ImageView(QGraphicsView):
             self.imageModified.emit()
             self.significant_change = False  # Reiniciar el indicador de cambio
 
+        # Terminado el arrastre, repintar con calidad final
+        self.set_final_quality()
+
         super().mouseReleaseEvent(event)
 
     def wheelEvent(self, event):
@@ -430,7 +608,19 @@ class ImageView(QGraphicsView):
         if event.angleDelta().y() < 0:
             factor = 1.0 / factor
 
-        self.scale(factor, factor)
+        # Mantener el zoom dentro de sus límites; el item de imagen elige en
+        # cada repintado el nivel de su pirámide que corresponde a la escala
+        zoom = self.current_zoom()
+        min_zoom = self.fit_zoom * self.MIN_ZOOM_FIT_RATIO
+        new_zoom = min(max(zoom * factor, min_zoom), self.MAX_ZOOM)
+        if zoom > 0 and new_zoom != zoom:
+            factor = new_zoom / zoom
+            self.scale(factor, factor)
+
+    def current_zoom(self):
+        """Escala actual de la vista (píxeles de pantalla por unidad de escena)."""
+        transform = self.transform()
+        return math.hypot(transform.m11(), transform.m12())
 
     def apply_deformation(self):
         """Aplica la deformación a la imagen según las posiciones de los puntos de control."""
@@ -458,27 +648,47 @@ class ImageView(QGraphicsView):
 
             # Verificar que tenemos 4 puntos
             if len(custom_points) != 4:
-                print("Se requieren exactamente 4 puntos para la deformación")
+                logger.warning("Se requieren exactamente 4 puntos para la deformación")
                 return
 
             # Actualizar los puntos en el deformador
             self.deformer.set_points(custom_points)
 
-            # Aplicar la deformación usando el deformador
-            self.deformer.deform_image()
+            with metrics.span('deform'):
+                # Aplicar la deformación usando el deformador
+                self.deformer.deform_image()
 
-            # Obtener la imagen deformada como imagen PIL
-            deformed_image = self.deformer.get_deformed_pil_image()
+                # Obtener la imagen deformada como imagen PIL
+                deformed_image = self.deformer.get_deformed_pil_image()
 
-            # Actualizar el pixmap con la imagen deformada
-            pixmap = ImageProcessor.pil_to_pixmap(deformed_image)
-            self.pixmap_item.setPixmap(pixmap)
+                # Actualizar el pixmap con la imagen deformada
+                pixmap = ImageProcessor.pil_to_pixmap(deformed_image)
+                self.pixmap_item.setPixmap(pixmap)
 
             # Actualizar la imagen actual
             self.current_image = deformed_image
+            self.deformed = True
 
         except Exception as e:
-            print(f"Error al aplicar deformación: {e}")
+            metrics.count('errors')
+            logger.error("Error al aplicar deformación: %s", e)
+
+    def selection_is_covered(self, rect_in_scene):
+        """Indica si una imagen opaca cubre por completo un rectángulo de la escena.
+
+        La imagen transformada es un cuadrilátero convexo, así que basta con
+        que contenga las cuatro esquinas del rectángulo.
+        """
+        if self.deformed or self.current_image is None or 'A' in self.current_image.getbands():
+            return False
+
+        pixmap = self.pixmap_item.pixmap()
+        image_rect = QRectF(self.pixmap_item.offset(), QSizeF(pixmap.size()))
+        # Margen para los errores de redondeo cuando el marco coincide con el borde
+        image_polygon = self.pixmap_item.mapToScene(image_rect.adjusted(-0.01, -0.01, 0.01, 0.01))
+        corners = (rect_in_scene.topLeft(), rect_in_scene.topRight(),
+                   rect_in_scene.bottomLeft(), rect_in_scene.bottomRight())
+        return all(image_polygon.containsPoint(corner, Qt.OddEvenFill) for corner in corners)
 
     def get_crop_image(self):
         """Obtiene la imagen recortada según el rectángulo de selección, sin incluir el marco."""
@@ -501,9 +711,17 @@ class ImageView(QGraphicsView):
         temp_pixmap_item.setPos(self.pixmap_item.pos())
         temp_scene.addItem(temp_pixmap_item)
 
+        # Si la imagen es opaca y cubre toda la selección el recorte no tiene
+        # zonas transparentes y se renderiza sin canal alfa
+        opaque = self.selection_is_covered(rect_in_scene)
+
         # Crear una imagen vacía con el tamaño del rectángulo de selección
-        image = QImage(selection_width, selection_height, QImage.Format_RGBA8888)
-        image.fill(Qt.transparent)  # Fondo transparente
+        if opaque:
+            image = QImage(selection_width, selection_height, QImage.Format_RGB888)
+            image.fill(Qt.black)
+        else:
+            image = QImage(selection_width, selection_height, QImage.Format_RGBA8888)
+            image.fill(Qt.transparent)  # Fondo transparente
 
         # Renderizar solo la imagen (sin el marco de selección ni los puntos de control)
         painter = QPainter(image)
@@ -511,11 +729,15 @@ class ImageView(QGraphicsView):
         temp_scene.render(painter, QRectF(0, 0, selection_width, selection_height), rect_in_scene)
         painter.end()
 
-        # Convertir QImage a PIL Image
+        # Convertir QImage a PIL Image (las filas de RGB888 van alineadas a 4 bytes)
+        channels = 3 if opaque else 4
         ptr = image.constBits()
         ptr.setsize(image.byteCount())
-        arr = np.array(ptr).reshape(selection_height, selection_width, 4)  # 4 para RGBA
-        pil_image = Image.fromarray(arr, 'RGBA')
+        arr = np.array(ptr).reshape(selection_height, image.bytesPerLine())
+        arr = arr[:, :selection_width * channels].reshape(selection_height, selection_width, channels)
+        pil_image = Image.fromarray(arr, 'RGB' if opaque else 'RGBA')
+        if opaque and self.current_image.mode == 'L':
+            pil_image = pil_image.convert('L')
 
         # Redimensionar al tamaño objetivo
         if (selection_width, selection_height) != self.target_size:
@@ -528,24 +750,77 @@ class ImageView(QGraphicsView):
         if not self.pixmap_item:
             return None
 
+        # Solo una imagen deformada necesita guardar sus píxeles
+        pixmap = None
+        snapshot = None
+        if self.deformed:
+            if self.snapshot_store is not None:
+                snapshot = self.take_snapshot()
+            else:
+                pixmap = self.pixmap_item.pixmap()
+
         state = {
-            'pixmap': self.pixmap_item.pixmap(),
+            'pixmap': pixmap,
+            'snapshot': snapshot,
             'transform': self.pixmap_item.transform(),
             'position': self.pixmap_item.pos(),
             'rotation_angle': self.rotation_angle,
             'scale_factor_x': self.scale_factor_x,
             'scale_factor_y': self.scale_factor_y,
             'original_control_positions': self.original_control_positions.copy(),
-            'current_control_positions': self.current_control_positions.copy()
+            'current_control_positions': self.current_control_positions.copy(),
+            'deform_points': self.deformer.get_points(),
+            'deformed': self.deformed,
+            'selection': QRectF(self.custom_selection) if self.custom_selection is not None else None
         }
         return state
 
+    def take_snapshot(self):
+        """Guarda el pixmap actual en el almacén de instantáneas.
+
+        Si el pixmap no ha cambiado desde la última instantánea se comparte
+        la existente en lugar de guardar otra copia.
+        """
+        pixmap = self.pixmap_item.pixmap()
+        key = pixmap.cacheKey()
+        if self._last_snapshot and self._last_snapshot[0] == key:
+            handle = self._last_snapshot[1]
+            self.snapshot_store.retain(handle)
+            return handle
+
+        handle = self.snapshot_store.put(pixmap)
+        self._last_snapshot = (key, handle)
+        return handle
+
+    def discard_state(self, state):
+        """Libera los recursos de un estado que sale del historial."""
+        handle = state.get('snapshot')
+        if handle is not None and self.snapshot_store is not None:
+            self.snapshot_store.release(handle)
+            if self._last_snapshot and self._last_snapshot[1] == handle:
+                self._last_snapshot = None
+
     def set_state(self, state):
         """Establece el estado de la imagen para deshacer/rehacer."""
         if not state or not self.pixmap_item:
             return
 
-        self.pixmap_item.setPixmap(state['pixmap'])
+        if state.get('snapshot') is not None:
+            pixmap = self.snapshot_store.get(state['snapshot'])
+        elif state.get('pixmap') is not None:
+            pixmap = state['pixmap']
+        else:
+            pixmap = self.base_pixmap
+        previous_key = self.pixmap_item.pixmap().cacheKey()
+        self.pixmap_item.setPixmap(pixmap)
+
+        # current_image debe coincidir con el pixmap restaurado: el encuadre
+        # automático y el recorte inteligente lo analizan
+        deformed = state.get('deformed', False)
+        if deformed and (not self.deformed or pixmap.cacheKey() != previous_key):
+            self.current_image = ImageProcessor.pixmap_to_pil(pixmap)
+        elif not deformed and self.deformed:
+            self.current_image = self.original_image.copy()
         self.pixmap_item.setTransform(state['transform'])
         self.pixmap_item.setPos(state['position'])
         self.rotation_angle = state['rotation_angle']
@@ -558,25 +833,221 @@ class ImageView(QGraphicsView):
         if 'current_control_positions' in state:
             self.current_control_positions = state['current_control_positions'].copy()
 
-        # Recrear rectángulo de selección y puntos de control
-        self.create_selection_rect()
+        # Restaurar los puntos del deformador para que la receta sea coherente
+        if state.get('deform_points') is not None:
+            self.deformer.set_points(state['deform_points'])
+        self.deformed = state.get('deformed', False)
+        self.custom_selection = state.get('selection')
 
-        # Limpiar puntos existentes
-        for point in self.control_points:
-            self.scene.removeItem(point)
-        self.control_points = []
+        # Actualizar rectángulo de selección y puntos de control
+        self.create_selection_rect()
 
-        # Recrear puntos de control en sus posiciones actuales
+        # Mover los puntos de control existentes a sus posiciones guardadas
         if self.current_control_positions:
-            for name, pos in self.current_control_positions.items():
-                point_size = 25  # Tamaño del punto de control (aumentado)
-                point = QGraphicsRectItem(pos[0] - point_size/2, pos[1] - point_size/2, point_size, point_size)
-                point.setPen(QPen(QColor(0, 255, 255), 4))  # Borde más grueso
-                point.setBrush(QBrush(QColor(0, 255, 255, 100)))  # Color de relleno semitransparente
-                point.setData(0, name)
-                self.scene.addItem(point)
-                point.setZValue(4)  # Valor Z positivo para que esté encima de la imagen y del marco de selección
-                self.control_points.append(point)
+            for point in self.ensure_control_points():
+                pos = self.current_control_positions.get(point.data(0))
+                if pos is not None:
+                    point.setPos(pos[0], pos[1])
+
+    def scene_item_count(self):
+        """Número de items en la escena (contador de depuración)."""
+        return len(self.scene.items())
+
+    def drawForeground(self, painter, rect):
+        """Dibuja el contador de items de la escena si está activada la depuración."""
+        super().drawForeground(painter, rect)
+        if not self.show_debug_overlay:
+            return
+        painter.save()
+        painter.resetTransform()
+        painter.setPen(QColor(255, 255, 0))
+        painter.drawText(8, 16, f"items: {self.scene_item_count()}")
+        painter.restore()
+
+    def get_recipe(self):
+        """Obtiene la receta de edición actual: solo parámetros, sin píxeles.
+
+        La receta es serializable en JSON y basta para reconstruir la edición
+        a partir de la imagen original con apply_recipe.
+        """
+        if not self.pixmap_item:
+            return None
+
+        transform = self.pixmap_item.transform()
+        position = self.pixmap_item.pos()
+        points = self.deformer.get_points() if self.deformed else None
+        selection = self.custom_selection
+
+        return {
+            'transform': [transform.m11(), transform.m12(), transform.m13(),
+                          transform.m21(), transform.m22(), transform.m23(),
+                          transform.m31(), transform.m32(), transform.m33()],
+            'position': [position.x(), position.y()],
+            'rotation_angle': self.rotation_angle,
+            'scale_factor_x': self.scale_factor_x,
+            'scale_factor_y': self.scale_factor_y,
+            'deform_points': points.tolist() if points is not None else None,
+            'selection': [selection.x(), selection.y(), selection.width(), selection.height()] if selection is not None else None
+        }
+
+    @staticmethod
+    def identity_recipe():
+        """Receta de una imagen tal como se carga, para las que aún no tienen vista."""
+        return {
+            'transform': [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0],
+            'position': [0.0, 0.0],
+            'rotation_angle': 0,
+            'scale_factor_x': 1.0,
+            'scale_factor_y': 1.0,
+            'deform_points': None,
+            'selection': None
+        }
+
+    @staticmethod
+    def recipe_with_frame(recipe, frame, aspect):
+        """Copia de una receta sin deformación con un marco de recorte nuevo.
+
+        Equivale a set_selection_frame sin cargar la imagen: el marco, en
+        coordenadas de la imagen, se lleva a la escena con la transformación
+        y la posición de la receta y se reajusta a la relación de aspecto.
+        """
+        rect = QTransform(*recipe['transform']).mapRect(QRectF(*frame))
+        rect.translate(*recipe['position'])
+        recipe = dict(recipe)
+        recipe['selection'] = list(fit_aspect(rect.x(), rect.y(), rect.width(), rect.height(), aspect))
+        return recipe
+
+    @staticmethod
+    def recipe_is_identity(recipe):
+        """Indica si una receta deja la imagen tal como se cargó."""
+        return (recipe['transform'] == [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0]
+                and recipe['position'] == [0.0, 0.0]
+                and recipe.get('deform_points') is None
+                and recipe.get('selection') is None)
+
+    def apply_recipe(self, recipe):
+        """Aplica una receta de edición obtenida con get_recipe."""
+        if not recipe or not self.pixmap_item:
+            return
+
+        try:
+            # La deformación se recalcula desde la imagen original
+            if recipe.get('deform_points') is not None:
+                self.deformer.set_points(recipe['deform_points'])
+                self.deformer.deform_image()
+                deformed_image = self.deformer.get_deformed_pil_image()
+                self.pixmap_item.setPixmap(ImageProcessor.pil_to_pixmap(deformed_image))
+                self.current_image = deformed_image
+                self.deformed = True
+
+            self.pixmap_item.setTransform(QTransform(*recipe['transform']))
+            self.pixmap_item.setPos(*recipe['position'])
+            self.rotation_angle = recipe['rotation_angle']
+            self.scale_factor_x = recipe['scale_factor_x']
+            self.scale_factor_y = recipe['scale_factor_y']
+
+            if recipe.get('selection') is not None:
+                self.custom_selection = QRectF(*recipe['selection'])
+            self.create_selection_rect()
+
+            # Recolocar los puntos de control según la nueva geometría
+            self.create_control_points()
+
+            self.imageModified.emit()
+        except Exception as e:
+            metrics.count('errors')
+            logger.error("Error al aplicar la receta: %s", e)
+
+    def get_normalized_recipe(self):
+        """Obtiene la receta con coordenadas relativas al tamaño de la imagen.
+
+        Sirve para copiar una edición a otras imágenes de distinto tamaño.
+        """
+        if not self.pixmap_item or not self.original_image:
+            return None
+
+        width, height = self.original_image.size
+        position = self.pixmap_item.pos()
+        points = self.deformer.get_points() if self.deformed else None
+        selection = self.custom_selection
+
+        return {
+            'position': [position.x() / width, position.y() / height],
+            'selection': [selection.x() / width, selection.y() / height,
+                          selection.width() / width, selection.height() / height] if selection is not None else None,
+            'rotation_angle': self.rotation_angle,
+            'scale_factor_x': self.scale_factor_x,
+            'scale_factor_y': self.scale_factor_y,
+            'deform_points': [[x / width, y / height] for x, y in points.tolist()] if points is not None else None
+        }
+
+    def denormalize_points(self, points):
+        """Convierte puntos relativos (0-1) a coordenadas de la imagen original."""
+        width, height = self.original_image.size
+        return [[x * width, y * height] for x, y in points]
+
+    def apply_normalized_recipe(self, recipe, rendered=None):
+        """Aplica una receta obtenida con get_normalized_recipe de otra vista.
+
+        Args:
+            recipe: dict - Receta normalizada
+            rendered: tuple - (array BGRA, PIL.Image, QImage) de la deformación
+                      ya calculada en segundo plano, o None para calcularla aquí
+        """
+        if not recipe or not self.pixmap_item or not self.original_image:
+            return
+
+        try:
+            width, height = self.original_image.size
+
+            if recipe.get('deform_points') is not None:
+                self.deformer.set_points(self.denormalize_points(recipe['deform_points']))
+                if rendered is None:
+                    self.deformer.deform_image()
+                    deformed_image = self.deformer.get_deformed_pil_image()
+                    pixmap = ImageProcessor.pil_to_pixmap(deformed_image)
+                else:
+                    self.deformer.deformed, deformed_image, qimage = rendered
+                    pixmap = QPixmap.fromImage(qimage)
+                self.pixmap_item.setPixmap(pixmap)
+                self.current_image = deformed_image
+                self.deformed = True
+            elif self.deformed:
+                # La receta no deforma: volver a la imagen sin deformar
+                self.deformer.reset_points()
+                self.pixmap_item.setPixmap(self.base_pixmap)
+                self.current_image = self.original_image.copy()
+                self.deformed = False
+
+            self.rotation_angle = recipe['rotation_angle']
+            self.scale_factor_x = recipe['scale_factor_x']
+            self.scale_factor_y = recipe['scale_factor_y']
+
+            # Componer la transformación alrededor del centro de esta imagen
+            center = self.pixmap_item.boundingRect().center()
+            transform = QTransform()
+            transform.translate(center.x(), center.y())
+            transform.rotate(self.rotation_angle)
+            transform.scale(self.scale_factor_x, self.scale_factor_y)
+            transform.translate(-center.x(), -center.y())
+            self.pixmap_item.setTransform(transform)
+            self.pixmap_item.setPos(recipe['position'][0] * width, recipe['position'][1] * height)
+
+            # Copiar también el encuadre, si la vista de origen tenía uno propio
+            selection = recipe.get('selection')
+            if selection is not None:
+                # Reajustar al aspecto objetivo por si la imagen tiene otras proporciones
+                aspect = self.target_size[0] / self.target_size[1]
+                self.custom_selection = QRectF(*fit_aspect(selection[0] * width, selection[1] * height,
+                                                           selection[2] * width, selection[3] * height, aspect))
+            self.create_selection_rect()
+
+            self.create_control_points()
+
+            self.imageModified.emit()
+        except Exception as e:
+            metrics.count('errors')
+            logger.error("Error al aplicar la receta normalizada: %s", e)
 
     def update_control_points_position(self):
         """Actualiza la posición de los puntos de control según la transformación actual de la imagen."""
@@ -602,8 +1073,7 @@ class ImageView(QGraphicsView):
                 scene_pos = self.pixmap_item.mapToScene(corners[name])
 
                 # Actualizar posición del punto de control
-                point_size = 25  # Tamaño del punto de control
-                point.setPos(scene_pos.x() - point_size/2, scene_pos.y() - point_size/2)
+                point.setPos(scene_pos)
 
                 # Actualizar posición actual en el diccionario
                 self.current_control_positions[name] = (scene_pos.x(), scene_pos.y())
@@ -612,8 +1082,7 @@ class ImageView(QGraphicsView):
         """Restablece la imagen a su estado original."""
         if self.original_image:
             self.current_image = self.original_image.copy()
-            pixmap = ImageProcessor.pil_to_pixmap(self.current_image)
-            self.pixmap_item.setPixmap(pixmap)
+            self.pixmap_item.setPixmap(self.base_pixmap)
 
             # Restablecer transformaciones
             self.pixmap_item.setTransform(QTransform())
@@ -621,12 +1090,17 @@ class ImageView(QGraphicsView):
             self.rotation_angle = 0
             self.scale_factor_x = 1.0
             self.scale_factor_y = 1.0
+            self.deformed = False
+            self.custom_selection = None
+
+            # Restablecer los puntos del deformador
+            self.deformer.reset_points()
 
             # Limpiar diccionarios de posiciones de control
             self.original_control_positions = {}
             self.current_control_positions = {}
 
-            # Recrear rectángulo de selección y puntos de control
+            # Recolocar rectángulo de selección y puntos de control
             self.create_selection_rect()
             self.create_control_points()
 
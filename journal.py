@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class EditJournal:
+    """Diario de ediciones en disco, solo de adición, para recuperar la sesión.
+
+    Cada edición confirmada se guarda como una línea JSON compacta. La
+    escritura ocurre en un hilo propio y los `fsync` se agrupan por número de
+    registros o por tiempo, así que `append` nunca bloquea la interfaz.
+
+    Solo una instancia de la aplicación puede usar el diario a la vez: lock()
+    lo reserva con un bloqueo del sistema operativo sobre un archivo .lock,
+    que se libera solo si la instancia termina de forma inesperada.
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".noimgpack2", "journal.jsonl")
+    SYNC_BATCH = 64        # Registros pendientes que fuerzan un fsync
+    SYNC_INTERVAL = 1.0    # Segundos máximos entre un registro y su fsync
+
+    _STOP = object()
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock_file = None
+
+    @property
+    def locked(self):
+        """Indica si esta instancia tiene reservado el diario."""
+        return self._lock_file is not None
+
+    def lock(self):
+        """Reserva el diario para esta instancia.
+
+        Returns:
+            bool - False si otra instancia en marcha ya lo tiene reservado
+        """
+        if self._lock_file is not None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path + ".lock", "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _unlock(self):
+        if self._lock_file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._lock_file.seek(0)
+            msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._lock_file.close()
+        self._lock_file = None
+
+    def start(self):
+        """Arranca el hilo escritor (requiere haber reservado el diario con lock)."""
+        if self._thread is not None:
+            return
+        if not self.locked:
+            raise RuntimeError("El diario no está reservado por esta instancia")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="EditJournal", daemon=True)
+        self._thread.start()
+
+    def append(self, record):
+        """Encola un registro para escribirlo en segundo plano."""
+        if self._thread is not None:
+            self._queue.put(record)
+
+    def close(self, remove=False):
+        """Vacía los registros pendientes y detiene el hilo escritor.
+
+        Con remove=True el diario se borra (cierre limpio de la aplicación),
+        solo si esta instancia lo tenía reservado.
+        """
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+        if remove and self.locked and os.path.exists(self.path):
+            os.remove(self.path)
+        self._unlock()
+
+    def read(self):
+        """Lee todos los registros válidos del diario.
+
+        Una última línea truncada por un cierre inesperado se ignora.
+        """
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        return records
+
+    def rewrite(self, records):
+        """Reemplaza el contenido del diario de forma atómica (compactación)."""
+        if not self.locked:
+            raise RuntimeError("El diario no está reservado por esta instancia")
+        if self._thread is not None:
+            raise RuntimeError("No se puede compactar el diario mientras se escribe")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _sync(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _run(self):
+        """Bucle del hilo escritor."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            pending = 0
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    record = None
+
+                if record is self._STOP:
+                    if pending:
+                        self._sync(f)
+                    break
+
+                if record is not None:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    pending += 1
+                    if deadline is None:
+                        deadline = time.monotonic() + self.SYNC_INTERVAL
+
+                if pending and (pending >= self.SYNC_BATCH or time.monotonic() >= deadline):
+                    self._sync(f)
+                    pending = 0
+                    deadline = None
+
+
+def replay(records):
+    """Reconstruye la sesión a partir de los registros del diario.
+
+    Returns:
+        tuple - (lista de rutas cargadas, dict ruta -> última receta)
+    """
+    paths = []
+    recipes = {}
+    for record in records:
+        op = record.get("op")
+        if op == "load":
+            paths.extend(record.get("paths", []))
+        elif op == "edit" and record.get("path"):
+            recipes[record["path"]] = record.get("recipe")
+    return paths, recipes
+
+
+def compact(paths, recipes):
+    """Genera el conjunto mínimo de registros equivalente a una sesión."""
+    records = [{"op": "load", "paths": list(paths)}]
+    for path, recipe in recipes.items():
+        records.append({"op": "edit", "path": path, "recipe": recipe})
+    return records
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib
+import logging
+import sys
+import threading
+import time
+import types
+
+logger = logging.getLogger(__name__)
+
+# Bibliotecas pesadas que se cargan en segundo plano tras mostrar la ventana,
+# en el orden en que suelen hacer falta (cv2 depende de numpy)
+HEAVY_MODULES = ('numpy', 'PIL.Image', 'cv2')
+
+# Un único proxy por módulo, compartido por todos los que lo piden
+_proxies = {}
+
+
+class LazyModule(types.ModuleType):
+    """Módulo que se importa de verdad la primera vez que se usa un atributo.
+
+    Tras la importación copia el contenido del módulo real, de modo que los
+    accesos siguientes no pasan por __getattr__ y no tienen coste añadido.
+    """
+
+    def _load(self):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_module(name):
+    """Devuelve el módulo si ya está importado o un LazyModule que lo importará al usarlo."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    proxy = _proxies.get(name)
+    if proxy is None:
+        proxy = _proxies[name] = LazyModule(name)
+    return proxy
+
+
+def is_loaded(name):
+    """Indica si un módulo ya se ha importado de verdad."""
+    return name in sys.modules
+
+
+def warm_up(names=HEAVY_MODULES):
+    """Importa las bibliotecas pesadas (pensado para un hilo de fondo)."""
+    for name in names:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.error("No se pudo importar %s: %s", name, e)
+            continue
+        logger.debug("Precargado %s en %.0f ms", name, (time.perf_counter() - start) * 1000)
+
+
+def start_warm_up(names=HEAVY_MODULES):
+    """Lanza la precarga en un hilo de fondo y devuelve el hilo."""
+    thread = threading.Thread(target=warm_up, args=(names,), name="WarmUp", daemon=True)
+    thread.start()
+    return thread
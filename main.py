@@ -1,14 +1,25 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import logging
+import os
 import sys
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication
 from image_editor import ImageEditor
+from lazy_import import start_warm_up
 
 def main():
+    # Nivel de registro configurable (DEBUG muestra cada imagen y tramo medido)
+    logging.basicConfig(level=os.environ.get('NOIMGPACK2_LOG', 'WARNING').upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     app = QApplication(sys.argv)
     editor = ImageEditor()
     editor.show()
+
+    # NumPy, PIL y OpenCV se cargan en segundo plano una vez pintada la ventana
+    QTimer.singleShot(0, start_warm_up)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from PyQt5.QtWidgets import QLabel
+from PyQt5.QtCore import Qt, QBasicTimer, QEvent, QRectF, QSize
+from PyQt5.QtGui import QPainter
+
+
+class MarqueeLabel(QLabel):
+    """Etiqueta que desplaza su texto en bucle solo cuando no cabe.
+
+    El ancho del texto se mide una vez al cambiar el texto o la fuente. El
+    temporizador solo está activo si el texto desborda y la etiqueta es
+    visible en una ventana activa, por lo que en reposo no consume CPU.
+    """
+
+    INTERVAL_MS = 60   # Intervalo entre pasos del desplazamiento
+    STEP_PX = 2        # Píxeles que avanza el texto en cada paso
+    GAP = "    "       # Separación entre repeticiones del texto (4 espacios)
+
+    def __init__(self, text="", parent=None):
+        super().__init__(parent)
+        self._timer = QBasicTimer()
+        self._offset = 0
+        self._text_width = 0
+        self._cycle_width = 0
+        self.setText(text)
+
+    def setText(self, text):
+        """Cambia el texto y recalcula su disposición."""
+        super().setText(text)
+        self._update_layout()
+
+    def minimumSizeHint(self):
+        # El texto puede ser más ancho que la etiqueta: para eso se desplaza
+        return QSize(0, super().minimumSizeHint().height())
+
+    def sizeHint(self):
+        return QSize(0, super().sizeHint().height())
+
+    def overflows(self):
+        """Indica si el texto no cabe en la etiqueta."""
+        return self._text_width > self.contentsRect().width()
+
+    def _update_layout(self):
+        """Mide el texto una sola vez y reinicia el desplazamiento."""
+        metrics = self.fontMetrics()
+        self._text_width = metrics.horizontalAdvance(self.text())
+        self._cycle_width = self._text_width + metrics.horizontalAdvance(self.GAP)
+        self._offset = 0
+        self._update_timer()
+        self.update()
+
+    def _should_scroll(self):
+        window = self.window()
+        return (self.overflows() and self.isVisible()
+                and window.isActiveWindow() and not window.isMinimized())
+
+    def _update_timer(self):
+        """Arranca o detiene el temporizador según el estado de la etiqueta."""
+        if self._should_scroll():
+            if not self._timer.isActive():
+                self._timer.start(self.INTERVAL_MS, self)
+        elif self._timer.isActive():
+            self._timer.stop()
+
+    def timerEvent(self, event):
+        if event.timerId() != self._timer.timerId():
+            super().timerEvent(event)
+            return
+        if not self._should_scroll():
+            self._timer.stop()
+            return
+        self._offset = (self._offset + self.STEP_PX) % max(1, self._cycle_width)
+        self.update()
+
+    def paintEvent(self, event):
+        if not self.overflows():
+            super().paintEvent(event)
+            return
+
+        rect = self.contentsRect()
+        painter = QPainter(self)
+        painter.setClipRect(rect)
+        painter.setFont(self.font())
+        painter.setPen(self.palette().color(self.foregroundRole()))
+
+        # Dibujar el texto y su repetición para que el bucle sea continuo
+        x = rect.left() - self._offset
+        for start in (x, x + self._cycle_width):
+            painter.drawText(QRectF(start, rect.top(), self._text_width, rect.height()),
+                             Qt.AlignLeft | Qt.AlignVCenter, self.text())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_timer()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_timer()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._update_timer()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self._update_layout()
+        elif event.type() in (QEvent.ActivationChange, QEvent.WindowStateChange):
+            self._update_timer()
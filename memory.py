@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from image_items import pixmap_bytes
+
+# Bytes por canal de los modos de PIL que no usan 8 bits
+PIL_BAND_BYTES = {'I': 4, 'F': 4, 'I;16': 2, 'I;16B': 2, 'I;16L': 2, '1': 1}
+
+# Categorías de memoria de una vista, en el orden en que se muestran
+VIEW_CATEGORIES = ('original_image', 'current_image', 'pixmap', 'pixmap_cache',
+                   'deformer', 'history')
+
+
+def pil_bytes(image):
+    """Bytes que ocupan los píxeles de una imagen PIL (0 si no hay imagen)."""
+    if image is None:
+        return 0
+    band_bytes = PIL_BAND_BYTES.get(image.mode, 1)
+    return image.width * image.height * len(image.getbands()) * band_bytes
+
+
+def array_bytes(array):
+    """Bytes de un array de NumPy (0 si no hay array)."""
+    return array.nbytes if array is not None else 0
+
+
+def view_memory(view):
+    """Desglose de la memoria que retiene una ImageView.
+
+    Los pixmaps compartidos (el pixmap sin deformar que reutilizan los
+    estados del historial) se cuentan una sola vez. Las instantáneas del
+    SnapshotStore son compartidas y se contabilizan aparte.
+
+    Returns:
+        dict - Categoría de VIEW_CATEGORIES -> bytes, más 'total'
+    """
+    counted = set()
+
+    def unique_pixmap_bytes(pixmap):
+        if pixmap is None or pixmap.isNull() or pixmap.cacheKey() in counted:
+            return 0
+        counted.add(pixmap.cacheKey())
+        return pixmap_bytes(pixmap)
+
+    item = view.pixmap_item
+    usage = {
+        'original_image': pil_bytes(view.original_image),
+        'current_image': pil_bytes(view.current_image),
+        'pixmap': (unique_pixmap_bytes(item.pixmap()) if item is not None else 0)
+                  + unique_pixmap_bytes(view.base_pixmap),
+        'pixmap_cache': item.cache_bytes() if hasattr(item, 'cache_bytes') else 0,
+        'deformer': array_bytes(view.deformer.loaded_original) + array_bytes(view.deformer.deformed),
+        'history': sum(unique_pixmap_bytes(state.get('pixmap'))
+                       for state in view.history.states() if state),
+    }
+    usage['total'] = sum(usage.values())
+    return usage
+
+
+def memory_report(views, snapshot_store=None):
+    """Informe de memoria de un conjunto de vistas y del almacén de instantáneas.
+
+    Returns:
+        dict - 'views' (ruta -> desglose), 'totals' (categoría -> bytes),
+               'snapshots' (uso del almacén) y 'total' (bytes en RAM)
+    """
+    per_view = {}
+    totals = dict.fromkeys(VIEW_CATEGORIES, 0)
+    for view in views:
+        if view.image_path is None:
+            continue
+        usage = view_memory(view)
+        per_view[view.image_path] = usage
+        for category in VIEW_CATEGORIES:
+            totals[category] += usage[category]
+
+    snapshots = snapshot_store.usage() if snapshot_store is not None else None
+    total = sum(totals.values()) + (snapshots['memory_bytes'] if snapshots else 0)
+    return {'views': per_view, 'totals': totals, 'snapshots': snapshots, 'total': total}
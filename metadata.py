@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+from lazy_import import lazy_module
+
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+
+logger = logging.getLogger(__name__)
+
+# Columnas del índice; las filas se guardan en un array estructurado de NumPy
+METADATA_FIELDS = [
+    ('width', 'i4'),
+    ('height', 'i4'),
+    ('aspect', 'f4'),
+    ('megapixels', 'f4'),
+    ('file_size', 'i8'),
+    ('mtime', 'f8'),
+]
+
+# Claves de ordenación disponibles ('order' es el orden de importación)
+SORT_KEYS = ('order', 'name', 'width', 'height', 'aspect', 'megapixels', 'file_size', 'mtime', 'edited')
+
+# Filtros disponibles
+FILTERS = ('all', 'edited', 'unedited', 'landscape', 'portrait', 'square')
+
+# Margen de la relación de aspecto para considerar una imagen cuadrada
+SQUARE_TOLERANCE = 0.02
+
+
+def probe(path):
+    """Lee las dimensiones de la cabecera y los datos del archivo sin decodificar píxeles.
+
+    Returns:
+        tuple - Fila del índice con el formato de METADATA_FIELDS
+    """
+    try:
+        stat = os.stat(path)
+        file_size, mtime = stat.st_size, stat.st_mtime
+    except OSError:
+        file_size, mtime = 0, 0.0
+
+    try:
+        # Image.open solo lee la cabecera; los píxeles se cargan al usarlos
+        with Image.open(path) as image:
+            width, height = image.size
+    except Exception as e:
+        logger.warning("Error al leer la cabecera de %s: %s", path, e)
+        width, height = 0, 0
+
+    aspect = width / height if height else 0.0
+    return width, height, aspect, width * height / 1e6, file_size, mtime
+
+
+class MetadataIndex:
+    """Índice columnar de metadatos de las imágenes importadas.
+
+    Cada ruta ocupa una fila del array estructurado; ordenar y filtrar son
+    operaciones vectorizadas sobre las columnas y nunca leen la imagen. El
+    array se crea al indexar la primera imagen.
+    """
+
+    def __init__(self):
+        self.paths = []
+        self._rows = {}  # ruta -> fila
+        self.data = None
+
+    def __contains__(self, path):
+        return path in self._rows
+
+    def __len__(self):
+        return len(self.paths)
+
+    def missing(self, paths):
+        """Rutas, sin repetir y en orden, que aún no están en el índice."""
+        return [path for path in dict.fromkeys(paths) if path not in self._rows]
+
+    def add(self, paths, executor=None):
+        """Indexa rutas nuevas leyendo sus cabeceras (en paralelo si hay executor).
+
+        Bloquea hasta leerlas todas; para no bloquear la interfaz, leer las
+        cabeceras con probe en segundo plano e indexarlas con add_rows.
+        """
+        paths = self.missing(paths)
+        if paths:
+            self.add_rows(paths, list(executor.map(probe, paths)) if executor else [probe(path) for path in paths])
+
+    def add_rows(self, paths, rows):
+        """Indexa rutas nuevas con sus filas ya leídas con probe, de una sola vez."""
+        if not paths:
+            return
+        for path in paths:
+            self._rows[path] = len(self.paths)
+            self.paths.append(path)
+        rows = np.array(rows, dtype=METADATA_FIELDS)
+        self.data = rows if self.data is None else np.concatenate([self.data, rows])
+
+    def size(self, path):
+        """Tamaño (ancho, alto) de la cabecera de una imagen indexada, o None."""
+        row = self._rows.get(path)
+        if row is None:
+            return None
+        return int(self.data['width'][row]), int(self.data['height'][row])
+
+    def query(self, paths, sort_key='order', descending=False, filter_key='all', edited=()):
+        """Ordena y filtra una lista de rutas ya indexadas.
+
+        Args:
+            paths: list - Rutas en orden de importación
+            sort_key: str - Una de SORT_KEYS
+            descending: bool - Invertir el orden
+            filter_key: str - Uno de FILTERS
+            edited: set - Rutas con edición
+
+        Returns:
+            list - Rutas resultantes
+        """
+        if not paths:
+            return []
+
+        rows = self.data[np.fromiter((self._rows[path] for path in paths), dtype=np.intp, count=len(paths))]
+        is_edited = np.fromiter((path in edited for path in paths), dtype=bool, count=len(paths))
+
+        # Filtrar
+        if filter_key == 'edited':
+            mask = is_edited
+        elif filter_key == 'unedited':
+            mask = ~is_edited
+        elif filter_key == 'landscape':
+            mask = rows['aspect'] > 1 + SQUARE_TOLERANCE
+        elif filter_key == 'portrait':
+            mask = rows['aspect'] < 1 - SQUARE_TOLERANCE
+        elif filter_key == 'square':
+            mask = np.abs(rows['aspect'] - 1) <= SQUARE_TOLERANCE
+        else:
+            mask = np.ones(len(paths), dtype=bool)
+
+        # Ordenar (estable, para que los empates conserven el orden de importación)
+        if sort_key == 'order':
+            order = np.arange(len(paths))
+        elif sort_key == 'name':
+            names = np.array([os.path.basename(path).lower() for path in paths])
+            order = np.argsort(names, kind='stable')
+        elif sort_key == 'edited':
+            order = np.argsort(~is_edited, kind='stable')
+        else:
+            order = np.argsort(rows[sort_key], kind='stable')
+
+        if descending:
+            order = order[::-1]
+
+        return [paths[i] for i in order[mask[order]]]
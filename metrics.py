@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Distribución de valores con una muestra acotada de los más recientes.
+
+    El recuento, la suma, el mínimo y el máximo son exactos; los percentiles
+    se calculan sobre los últimos SAMPLES valores.
+    """
+
+    SAMPLES = 1024
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = deque(maxlen=self.SAMPLES)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, q):
+        """Percentil q (0-100) de la muestra."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99)
+        }
+
+
+class Metrics:
+    """Contadores, histogramas y tramos de tiempo de la sesión.
+
+    Es seguro usarlo desde varios hilos. Los tramos (span) guardan su
+    duración en milisegundos en el histograma con su nombre.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._started = time.time()
+
+    def count(self, name, value=1):
+        """Incrementa un contador."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """Añade un valor a un histograma."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(value)
+
+    @contextmanager
+    def span(self, name):
+        """Mide la duración del bloque y la añade al histograma `name` (ms)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.observe(name, elapsed_ms)
+            logger.debug("%s: %.2f ms", name, elapsed_ms)
+
+    def snapshot(self):
+        """Copia de todas las métricas como diccionario serializable en JSON."""
+        with self._lock:
+            return {
+                'started': self._started,
+                'uptime_s': time.time() - self._started,
+                'counters': dict(self._counters),
+                'histograms': {name: histogram.summary()
+                               for name, histogram in self._histograms.items()}
+            }
+
+    def summary_text(self, names):
+        """Resumen breve (media y p95 en ms) de algunos histogramas para la interfaz."""
+        with self._lock:
+            parts = []
+            for name in names:
+                histogram = self._histograms.get(name)
+                if histogram is not None and histogram.count:
+                    parts.append(f"{name} {histogram.total / histogram.count:.0f}/"
+                                 f"{histogram.percentile(95):.0f} ms")
+            return " · ".join(parts)
+
+    def dump(self, path, extra=None):
+        """Guarda las métricas de la sesión en un archivo JSON.
+
+        Args:
+            extra: dict - Secciones adicionales que se añaden al volcado
+        """
+        data = self.snapshot()
+        if extra:
+            data.update(extra)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    def reset(self):
+        """Descarta todas las métricas."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._started = time.time()
+
+
+# Métricas compartidas por toda la aplicación
+metrics = Metrics()
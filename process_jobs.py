@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Trabajos de imagen que el servicio de render ejecuta en procesos.
+
+Las funciones *_into y encode_png se ejecutan en el proceso de trabajo y
+reciben ImageHandle en lugar de píxeles, de modo que las imágenes no se
+serializan. Las funciones *_shared se llaman desde un hilo del servicio de
+render: copian la entrada al pool de memoria compartida, ejecutan el
+trabajo con run (RenderService.run_in_process) y devuelven el resultado.
+"""
+
+import io
+import logging
+import shutil
+import time
+from contextlib import contextmanager
+from lazy_import import lazy_module
+from image_deformer import warped_shape, warp_perspective
+from image_processor import ImageProcessor, QIMAGE_FORMATS
+from roi_decode import render_region
+from metrics import metrics
+
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _span(name, timings=None):
+    """Como metrics.span, pero si se pasa timings acumula ahí la duración (ms).
+
+    En un proceso de trabajo las métricas globales no llegan al proceso
+    principal, así que las duraciones se devuelven con el resultado.
+    """
+    if timings is None:
+        with metrics.span(name):
+            yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+
+def write_png(image, path, timings=None):
+    """Codifica una imagen PIL en PNG y la escribe, midiendo cada paso por separado."""
+    with _span('encode', timings):
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+    with _span('write', timings):
+        with open(path, 'wb') as f:
+            f.write(buffer.getbuffer())
+
+
+def export_image(image, path, mask_path=None, mask_dilation=0, mask_feather=0, timings=None):
+    """Escribe un recorte ya renderizado y, si se pide, su máscara de outpainting."""
+    write_png(image, path, timings)
+    if mask_path:
+        # La máscara sale del alfa del mismo recorte
+        mask = ImageProcessor.outpaint_mask(image, mask_dilation, mask_feather)
+        write_png(mask, mask_path, timings)
+    return path
+
+
+def export_unedited(source_path, path, mask_path=None, mask_dilation=0, mask_feather=0):
+    """Exporta una imagen sin editar cuyo recorte es el encuadre completo al tamaño de salida.
+
+    El resultado sería la imagen original, así que no se renderiza ni se
+    redimensiona: un PNG en un modo nativo se copia tal cual y cualquier
+    otro formato se decodifica y se escribe en PNG directamente.
+    """
+    with Image.open(source_path) as image:
+        if image.format == 'PNG' and image.mode in QIMAGE_FORMATS:
+            with metrics.span('write'):
+                shutil.copyfile(source_path, path)
+        else:
+            image = ImageProcessor.to_native_mode(image)
+            write_png(image, path)
+
+        if mask_path:
+            # Una imagen opaca da una máscara vacía sin leer sus píxeles
+            mask = ImageProcessor.outpaint_mask(ImageProcessor.to_native_mode(image), mask_dilation, mask_feather)
+            write_png(mask, mask_path)
+    metrics.count('images_passthrough')
+    return path
+
+
+def export_region(source_path, recipe, image_size, target_size, path,
+                  mask_path=None, mask_dilation=0, mask_feather=0):
+    """Exporta el recorte de una imagen no cargada decodificando solo la región que usa."""
+    image = render_region(source_path, recipe, image_size, target_size)
+    if image is None:
+        raise ValueError(f"La receta de {source_path} no permite decodificar solo una región")
+    return export_image(image, path, mask_path, mask_dilation, mask_feather)
+
+
+# --- En el proceso de trabajo -------------------------------------------------
+
+def decode_into(path, handle):
+    """Decodifica una imagen directamente en un segmento del tamaño y modo del handle."""
+    with Image.open(path) as image:
+        image.load()
+        if image.mode != handle.mode:
+            image = image.convert(handle.mode)
+        handle.write(image)
+
+
+def warp_into(source, target, points):
+    """Deforma el array BGRA de source y escribe el resultado en target."""
+    target.array()[...] = warp_perspective(source.array(), points)
+
+
+def encode_png(handle, path, mask_path=None, mask_dilation=0, mask_feather=0):
+    """Exporta la imagen de un handle (sin copiarla) y su máscara opcional.
+
+    Returns:
+        dict - Duraciones en ms de cada paso ('encode', 'write'), para
+               añadirlas a las métricas del proceso principal
+    """
+    timings = {}
+    export_image(handle.image(), path, mask_path, mask_dilation, mask_feather, timings)
+    return timings
+
+
+# --- En un hilo del servicio de render ----------------------------------------
+
+def decode_shared(path, pool, run):
+    """Decodifica una imagen en un proceso de trabajo, en su modo nativo (L, RGB o RGBA).
+
+    El tamaño y el modo se leen de la cabecera para reservar el segmento
+    antes de decodificar; el resultado se copia una sola vez, del segmento
+    a la imagen PIL que se devuelve.
+    """
+    with Image.open(path) as image:
+        size = image.size
+        mode = ImageProcessor.native_mode(image.mode, image.info)
+    with pool.lease(size, mode) as handle:
+        run(decode_into, path, handle)
+        return handle.image().copy()
+
+
+def warp_shared(original, points, pool, run):
+    """Deforma un array BGRA en un proceso de trabajo y devuelve el array deformado."""
+    with pool.lease_array(original) as source, \
+            pool.lease_empty((*warped_shape(*original.shape[:2]), 4), original.dtype) as target:
+        run(warp_into, source, target, points)
+        return target.array().copy()
+
+
+def export_shared(image, path, mask_path, mask_dilation, mask_feather, pool, run):
+    """Codifica y escribe un recorte en un proceso de trabajo.
+
+    Los pasos se miden en el proceso de trabajo y se añaden aquí a las
+    métricas, igual que si se hubieran exportado en este proceso.
+    """
+    with pool.lease_image(image) as handle:
+        timings = run(encode_png, handle, path, mask_path, mask_dilation, mask_feather)
+    for name, durations in timings.items():
+        for elapsed_ms in durations:
+            metrics.observe(name, elapsed_ms)
+    return path
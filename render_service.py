@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Prioridades: un número menor se atiende antes
+PRIORITY_VISIBLE = 0   # Vistas en pantalla y acciones del usuario
+PRIORITY_PREFETCH = 1  # Precarga de las páginas vecinas
+PRIORITY_EXPORT = 2    # Exportación en segundo plano
+
+PRIORITY_NAMES = {PRIORITY_VISIBLE: 'visible', PRIORITY_PREFETCH: 'prefetch', PRIORITY_EXPORT: 'export'}
+
+
+class JobCancelled(Exception):
+    """El trabajo se canceló antes de ejecutarse."""
+
+
+class RenderJob:
+    """Trabajo del servicio de render; se espera con result() como un Future."""
+
+    def __init__(self, key, priority, fn, args, process):
+        self.key = key
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.process = process
+        self.callbacks = []
+        self.cancelled = False
+        self.started = False
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Espera al trabajo y devuelve su resultado (o lanza su error)."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"El trabajo {self.key} no ha terminado")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class RenderService:
+    """Servicio central que ejecuta decodificación, deformación y exportación.
+
+    Los trabajos esperan en una cola de prioridad (visible > precarga >
+    exportación) y los atienden hilos propios del servicio; los que se marcan
+    como process=True se ejecutan además en un pool de procesos, por lo que
+    su función y argumentos deben poder serializarse (las imágenes grandes se
+    pasan como ImageHandle de shared_buffers). Un trabajo en curso no
+    se interrumpe, pero cualquier trabajo visible nuevo pasa por delante de
+    todos los pendientes de menor prioridad.
+
+    Los trabajos con la misma clave (por ejemplo imagen y receta) se
+    deduplican: pedir de nuevo uno pendiente devuelve el mismo trabajo,
+    subiendo su prioridad si hace falta. Los callbacks se llaman en el hilo
+    de trabajo al terminar o al cancelarse.
+    """
+
+    def __init__(self, workers=None, processes=None):
+        """Arranca los hilos de trabajo; el pool de procesos se crea al primer uso.
+
+        Args:
+            workers: int - Hilos de trabajo (por defecto, uno por núcleo)
+            processes: int - Procesos del pool (por defecto, uno por núcleo);
+                       0 ejecuta los trabajos de proceso en los propios hilos
+        """
+        self.workers = workers or os.cpu_count() or 4
+        self.processes = (os.cpu_count() or 2) if processes is None else processes
+        self._lock = threading.Condition()
+        self._heap = []                  # (prioridad, secuencia, trabajo)
+        self._sequence = itertools.count()
+        self._jobs = {}                  # clave -> trabajo pendiente o en curso
+        self._pending = dict.fromkeys(PRIORITY_NAMES, 0)  # prioridad -> trabajos pendientes
+        self._running = 0
+        self._closed = False
+        self._process_pool = None
+        self._threads = [threading.Thread(target=self._run, name=f"Render-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, *args, key=None, priority=PRIORITY_VISIBLE, callback=None, process=False):
+        """Encola un trabajo y lo devuelve.
+
+        Args:
+            key: hashable - Clave de deduplicación (None para no deduplicar)
+            priority: int - PRIORITY_VISIBLE, PRIORITY_PREFETCH o PRIORITY_EXPORT
+            callback: callable - callback(trabajo) al terminar o cancelarse
+            process: bool - Ejecutar en el pool de procesos
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El servicio de render está cerrado")
+
+            job = self._jobs.get(key) if key is not None else None
+            if job is not None and not job.cancelled:
+                metrics.count('render_jobs_deduplicated')
+                if callback is not None and callback not in job.callbacks:
+                    job.callbacks.append(callback)
+                if priority < job.priority and not job.done():
+                    # Volver a encolarlo con la prioridad nueva; la entrada
+                    # antigua se ignora al sacarla porque ya no coincide
+                    self._pending[job.priority] -= 1
+                    self._pending[priority] += 1
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._sequence), job))
+                    self._lock.notify()
+                return job
+
+            job = RenderJob(key, priority, fn, args, process)
+            if callback is not None:
+                job.callbacks.append(callback)
+            if key is not None:
+                self._jobs[key] = job
+            heapq.heappush(self._heap, (priority, next(self._sequence), job))
+            self._pending[priority] += 1
+            metrics.count('render_jobs_submitted')
+            self._observe_depth()
+            self._lock.notify()
+            return job
+
+    def map(self, fn, items, priority=PRIORITY_VISIBLE):
+        """Ejecuta fn sobre cada elemento en paralelo y devuelve los resultados en orden.
+
+        Permite usar el servicio donde se esperaba un Executor.
+        """
+        jobs = [self.submit(fn, item, priority=priority) for item in items]
+        return [job.result() for job in jobs]
+
+    def cancel(self, job):
+        """Cancela un trabajo pendiente. Devuelve False si ya había empezado."""
+        with self._lock:
+            if job.cancelled or job.done() or job.started:
+                return False
+            job.cancelled = True
+            self._pending[job.priority] -= 1
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+        metrics.count('render_jobs_cancelled')
+        self._finish(job, error=JobCancelled(str(job.key)))
+        return True
+
+    def cancel_where(self, predicate):
+        """Cancela los trabajos pendientes que cumplen una condición.
+
+        Returns:
+            int - Número de trabajos cancelados
+        """
+        with self._lock:
+            pending = [job for _, _, job in self._heap
+                       if not job.cancelled and not job.started]
+        return sum(self.cancel(job) for job in set(pending) if predicate(job))
+
+    def queue_depth(self):
+        """Trabajos pendientes por prioridad y trabajos en curso."""
+        with self._lock:
+            return self._depth()
+
+    def close(self):
+        """Cancela lo pendiente y detiene los hilos y el pool de procesos."""
+        with self._lock:
+            self._closed = True
+            pending = [job for _, _, job in self._heap]
+            self._lock.notify_all()
+        for job in pending:
+            self.cancel(job)
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def _depth(self):
+        depth = {PRIORITY_NAMES[priority]: count for priority, count in self._pending.items()}
+        depth['running'] = self._running
+        return depth
+
+    def _observe_depth(self):
+        metrics.observe('render_queue_depth', sum(self._pending.values()))
+
+    def _next_job(self):
+        """Saca el siguiente trabajo vigente de la cola (con el lock tomado)."""
+        while self._heap:
+            priority, _, job = heapq.heappop(self._heap)
+            # Entradas de trabajos cancelados o reencolados con otra prioridad
+            if job.cancelled or priority != job.priority or job.started:
+                continue
+            self._pending[priority] -= 1
+            return job
+        return None
+
+    def _run(self):
+        """Bucle de los hilos de trabajo."""
+        while True:
+            with self._lock:
+                job = self._next_job()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._lock.wait()
+                    job = self._next_job()
+                job.started = True
+                self._running += 1
+                self._observe_depth()
+
+            result, error = None, None
+            try:
+                with metrics.span(f"render_job_{PRIORITY_NAMES[job.priority]}"):
+                    if job.process:
+                        result = self.run_in_process(job.fn, *job.args)
+                    else:
+                        result = job.fn(*job.args)
+            except Exception as e:
+                logger.error("Error en el trabajo de render %s: %s", job.key, e)
+                metrics.count('errors')
+                error = e
+
+            with self._lock:
+                self._running -= 1
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+            metrics.count('render_jobs_completed')
+            self._finish(job, result, error)
+
+    def run_in_process(self, fn, *args):
+        """Ejecuta fn en el pool de procesos y espera su resultado.
+
+        Pensado para llamarse desde un trabajo del servicio: el hilo prepara
+        los datos (por ejemplo en memoria compartida) y delega el cálculo.
+        Sin procesos (processes=0) fn se ejecuta en el hilo actual.
+        """
+        if not self.processes:
+            return fn(*args)
+        metrics.count('render_process_calls')
+        return self._get_process_pool().submit(fn, *args).result()
+
+    def _get_process_pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                # spawn: no se hereda el estado de los hilos ni de Qt del proceso principal
+                self._process_pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+            return self._process_pool
+
+    def _finish(self, job, result=None, error=None):
+        job._result = result
+        job._error = error
+        job._done.set()
+        for callback in job.callbacks:
+            try:
+                callback(job)
+            except Exception as e:
+                logger.error("Error en el callback del trabajo %s: %s", job.key, e)
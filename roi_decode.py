@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+from lazy_import import lazy_module
+from framing import fit_aspect
+from image_processor import ImageProcessor
+from metrics import metrics
+
+Image = lazy_module('PIL.Image')
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_TRANSFORM = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0]
+
+# Píxeles de margen alrededor de la región para la interpolación
+ROI_MARGIN = 2
+
+# Margen para los errores de redondeo al comprobar si el recorte cae dentro de la imagen
+EDGE_TOLERANCE = 0.01
+
+
+def crop_geometry(recipe, image_size, target_size):
+    """Geometría del recorte de una receta en coordenadas de la imagen fuente.
+
+    Reproduce lo que hace la vista: el item de la imagen con la transformación
+    y la posición de la receta, y el marco elegido o, si no hay, el mayor
+    marco centrado con el aspecto de salida.
+
+    Returns:
+        dict - 'matrix' (a, b, c, d, e, f) que lleva cada píxel de salida (u, v)
+               a (a*u + b*v + c, d*u + e*v + f) en la fuente, 'box' (x0, y0, x1, y1)
+               de la fuente que hace falta decodificar (None si el recorte no toca
+               la imagen), 'covered' si el recorte cae entero dentro de la imagen
+               y 'scale' (píxeles de la fuente por píxel de salida); o None si la
+               receta tiene deformación o una transformación no afín
+    """
+    recipe = recipe or {}
+    if recipe.get('deform_points') is not None:
+        return None
+    m11, m12, m13, m21, m22, m23, m31, m32, m33 = recipe.get('transform', IDENTITY_TRANSFORM)
+    if m13 or m23 or m33 != 1:
+        return None
+    det = m11 * m22 - m21 * m12
+    if not det:
+        return None
+
+    width, height = image_size
+    target_width, target_height = target_size
+    selection = recipe.get('selection')
+    if selection is None:
+        selection = fit_aspect(0, 0, width, height, target_width / target_height, 'fill')
+    sx, sy, sw, sh = selection
+
+    # Escena = T(fuente) + posición, con T afín; se invierte y se compone
+    # con el paso de píxel de salida a escena
+    tx = m31 + recipe.get('position', [0.0, 0.0])[0] - sx
+    ty = m32 + recipe.get('position', [0.0, 0.0])[1] - sy
+    kx = sw / target_width
+    ky = sh / target_height
+    a, b, c = m22 * kx / det, -m21 * ky / det, (-m22 * tx + m21 * ty) / det
+    d, e, f = -m12 * kx / det, m11 * ky / det, (m12 * tx - m11 * ty) / det
+
+    corners = [(a * u + b * v + c, d * u + e * v + f)
+               for u in (0, target_width) for v in (0, target_height)]
+    xs = [x for x, _ in corners]
+    ys = [y for _, y in corners]
+    covered = (min(xs) >= -EDGE_TOLERANCE and min(ys) >= -EDGE_TOLERANCE
+               and max(xs) <= width + EDGE_TOLERANCE and max(ys) <= height + EDGE_TOLERANCE)
+
+    x0 = max(0, math.floor(min(xs)) - ROI_MARGIN)
+    y0 = max(0, math.floor(min(ys)) - ROI_MARGIN)
+    x1 = min(width, math.ceil(max(xs)) + ROI_MARGIN)
+    y1 = min(height, math.ceil(max(ys)) + ROI_MARGIN)
+    box = (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+    return {'matrix': (a, b, c, d, e, f), 'box': box, 'covered': covered,
+            'scale': math.sqrt(abs(a * e - b * d))}
+
+
+def _restrict_tiles(image, box):
+    """Deja en image.tile solo los mosaicos o tiras de un TIFF que cortan la caja.
+
+    La imagen pasa a medir lo que ocupan esos mosaicos, así que no se reserva
+    ni se decodifica el resto. Solo es posible si los mosaicos se decodifican
+    por separado (no con libtiff, que decodifica la imagen de una vez).
+
+    Returns:
+        tuple - (caja en las coordenadas nuevas, origen (x, y) de la imagen recortada)
+    """
+    tiles = image.tile
+    if len(tiles) < 2 or any(tile[0] == 'libtiff' for tile in tiles):
+        return box, (0, 0)
+
+    x0, y0, x1, y1 = box
+    keep = [tile for tile in tiles
+            if tile[1][0] < x1 and tile[1][2] > x0 and tile[1][1] < y1 and tile[1][3] > y0]
+    ox = min(tile[1][0] for tile in keep)
+    oy = min(tile[1][1] for tile in keep)
+    ex = max(tile[1][2] for tile in keep)
+    ey = max(tile[1][3] for tile in keep)
+
+    image.tile = [(tile[0], (tile[1][0] - ox, tile[1][1] - oy, tile[1][2] - ox, tile[1][3] - oy), *tile[2:])
+                  for tile in keep]
+    image._size = (ex - ox, ey - oy)
+    return (x0 - ox, y0 - oy, x1 - ox, y1 - oy), (ox, oy)
+
+
+def _truncate_rows(image, box):
+    """Decodifica un PNG no entrelazado solo hasta la última fila de la caja.
+
+    Las filas se decodifican en orden, así que basta con acortar la imagen.
+    """
+    if image.info.get('interlace') or len(image.tile) != 1:
+        return
+    tile = image.tile[0]
+    rows = box[3]
+    image.tile = [(tile[0], (0, 0, image.width, rows), *tile[2:])]
+    image._size = (image.width, rows)
+
+
+def decode_region(path, box, scale=1.0):
+    """Decodifica solo la región de una imagen que necesita un recorte.
+
+    - JPEG: si sobra resolución, draft decodifica ya reducida a 1/2, 1/4 u 1/8.
+    - TIFF sin comprimir (mosaicos o tiras): solo se leen los que cortan la región.
+    - PNG no entrelazado: se deja de decodificar tras la última fila de la región.
+    - Otros formatos, o si lo anterior falla: decodificación completa.
+    Si aún sobra resolución, la región se reduce por un factor entero.
+
+    Args:
+        box: tuple - (x0, y0, x1, y1) en píxeles de la fuente
+        scale: float - Píxeles de la fuente por píxel de salida
+
+    Returns:
+        tuple - (imagen de la región, origen (x, y) en la fuente, píxeles de la fuente por píxel de la región)
+    """
+    source_box = box
+    try:
+        with Image.open(path) as image:
+            origin, factor = (0, 0), 1
+            if image.format == 'JPEG' and scale >= 2:
+                full_width = image.width
+                image.draft(image.mode, (math.ceil(image.width / scale), math.ceil(image.height / scale)))
+                factor = full_width / image.width
+                box = (math.floor(box[0] / factor), math.floor(box[1] / factor),
+                       min(image.width, math.ceil(box[2] / factor)), min(image.height, math.ceil(box[3] / factor)))
+            elif image.format == 'TIFF':
+                box, origin = _restrict_tiles(image, box)
+            elif image.format == 'PNG':
+                _truncate_rows(image, box)
+
+            region = image.crop(box)
+            region.load()
+        origin = ((origin[0] + box[0]) * factor, (origin[1] + box[1]) * factor)
+    except Exception as e:
+        logger.warning("No se pudo decodificar solo la región de %s, se decodifica entera: %s", path, e)
+        with Image.open(path) as image:
+            region = image.crop(source_box)
+            region.load()
+        origin, factor = source_box[:2], 1
+
+    reduction = int(scale / factor)
+    if reduction >= 2:
+        region = region.reduce(reduction)
+        factor *= reduction
+    return region, origin, factor
+
+
+def render_region(path, recipe, image_size, target_size):
+    """Renderiza el recorte de una receta decodificando solo la región necesaria.
+
+    Equivale a get_crop_image de la vista para recetas sin deformación, pero
+    sin cargar la imagen entera ni pasar por la escena. El recorte es opaco
+    si la imagen no tiene alfa y lo cubre entero; si no, es RGBA con
+    transparencia fuera de la imagen.
+
+    Returns:
+        PIL.Image - Recorte al tamaño de salida, o None si la receta no es afín
+    """
+    geometry = crop_geometry(recipe, image_size, target_size)
+    if geometry is None:
+        return None
+
+    if geometry['box'] is None:
+        return Image.new('RGBA', target_size, (0, 0, 0, 0))
+
+    with metrics.span('decode'):
+        region, (ox, oy), factor = decode_region(path, geometry['box'], geometry['scale'])
+    metrics.count('images_roi_decoded')
+
+    with metrics.span('render'):
+        region = ImageProcessor.to_native_mode(region)
+        if not geometry['covered'] and region.mode != 'RGBA':
+            region = region.convert('RGBA')
+        fill = (0, 0, 0, 0) if region.mode == 'RGBA' else 0
+
+        # Pasar la matriz a coordenadas de la región
+        a, b, c, d, e, f = geometry['matrix']
+        matrix = (a / factor, b / factor, (c - ox) / factor, d / factor, e / factor, (f - oy) / factor)
+        return region.transform(target_size, Image.AFFINE, matrix, resample=Image.BICUBIC, fillcolor=fill)
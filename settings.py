@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from PyQt5.QtCore import QSettings
+
+# Valores por defecto de las preferencias (clave -> valor)
+DEFAULTS = {
+    # Calidad de render: rápida durante los arrastres y suave al terminar
+    'render/adaptive_quality': True,
+    'render/idle_timeout_ms': 150,
+    # Páginas a cada lado de la actual que se decodifican en segundo plano
+    'render/prefetch_pages': 1,
+    # Decodificar, deformar y codificar en procesos, pasando las imágenes por
+    # un pool de memoria compartida que conserva hasta shared_pool_mb libres
+    'render/use_processes': True,
+    'render/shared_pool_mb': 512,
+
+    # Encuadre automático: 'fit' rodea todo el contenido, 'fill' no deja bordes
+    'framing/mode': 'fit',
+    'framing/proxy_size': 512,
+    'framing/tolerance': 8,
+    # Recorte inteligente: tamaño del marco respecto al mayor posible
+    'framing/smart_scale': 0.8,
+
+    # Máscara de outpainting al exportar (zona transparente en blanco)
+    'export/outpaint_mask': False,
+    'export/mask_dilation': 0,
+    'export/mask_feather': 0,
+    # Imágenes sin cargar a partir de las que se decodifica solo la región del recorte
+    'export/roi_min_megapixels': 16,
+
+    # Duplicados al importar: distancia de Hamming máxima del dHash (64 bits)
+    # y qué hacer con ellos ('skip' los descarta, 'flag' los carga señalados)
+    'import/duplicate_distance': 4,
+    'import/duplicate_action': 'skip',
+
+    # Métricas: lectura en la barra de estado y su frecuencia de refresco
+    'metrics/show_readout': False,
+    'metrics/readout_interval_ms': 1000,
+
+    # Memoria: presupuesto para los avisos y refresco del panel de diagnóstico
+    'memory/budget_mb': 4096,
+    'memory/refresh_interval_ms': 2000,
+}
+
+
+class Settings:
+    """Preferencias persistentes de la aplicación, guardadas con QSettings."""
+
+    def __init__(self, organization='NOIMGPACK2', application='ImageEditor'):
+        self._settings = QSettings(organization, application)
+
+    def get(self, key):
+        """Obtiene una preferencia con el tipo de su valor por defecto."""
+        default = DEFAULTS[key]
+        value = self._settings.value(key, default)
+
+        # QSettings puede devolver cadenas según la plataforma
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                return value.lower() in ('true', '1', 'yes')
+            return bool(value)
+        if isinstance(default, int):
+            return int(value)
+        if isinstance(default, float):
+            return float(value)
+        return value
+
+    def set(self, key, value):
+        """Guarda una preferencia."""
+        if key not in DEFAULTS:
+            raise KeyError(f"Preferencia desconocida: {key}")
+        self._settings.setValue(key, value)
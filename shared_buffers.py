@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from lazy_import import lazy_module
+
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+
+logger = logging.getLogger(__name__)
+
+# Canales por modo de PIL de las imágenes que viajan en memoria compartida
+MODE_CHANNELS = {'L': 1, 'RGB': 3, 'RGBA': 4}
+
+# Segmentos abiertos por un proceso de trabajo que se mantienen mapeados
+ATTACH_CACHE_SIZE = 16
+
+# Un segmento libre se reutiliza si no es más del doble de lo que se pide
+MAX_WASTE = 2
+
+# Segmentos creados por los pools de este proceso (nombre -> SharedMemory)
+_owned = {}
+# Segmentos de otro proceso abiertos en este, los más recientes al final
+_attached = OrderedDict()
+_attach_lock = threading.Lock()
+
+
+def attach(name):
+    """Devuelve el segmento de memoria compartida con ese nombre, abriéndolo si hace falta.
+
+    En los procesos de trabajo los segmentos se mantienen abiertos (hasta
+    ATTACH_CACHE_SIZE) porque el pool los recicla y vuelven a llegar.
+    """
+    segment = _owned.get(name)
+    if segment is not None:
+        return segment
+
+    with _attach_lock:
+        segment = _attached.get(name)
+        if segment is not None:
+            _attached.move_to_end(name)
+            return segment
+        segment = _attached[name] = shared_memory.SharedMemory(name=name)
+        while len(_attached) > ATTACH_CACHE_SIZE:
+            _, old = _attached.popitem(last=False)
+            _close(old)
+        return segment
+
+
+def _close(segment):
+    try:
+        segment.close()
+    except BufferError:
+        # Aún hay vistas vivas; el mapeo se libera cuando desaparezcan
+        pass
+
+
+class ImageHandle:
+    """Referencia serializable a una imagen en memoria compartida.
+
+    Es lo que viaja entre procesos en lugar de los píxeles: el nombre del
+    segmento, la forma del array y el modo de PIL (None si es un array que
+    no corresponde a un modo, como los BGRA de OpenCV).
+    """
+
+    def __init__(self, name, shape, mode=None, dtype='uint8'):
+        self.name = name
+        self.shape = tuple(shape)
+        self.mode = mode
+        self.dtype = dtype
+
+    def __repr__(self):
+        return f"ImageHandle({self.name!r}, {self.shape}, {self.mode!r})"
+
+    @property
+    def nbytes(self):
+        size = np.dtype(self.dtype).itemsize
+        for dimension in self.shape:
+            size *= dimension
+        return size
+
+    @property
+    def size(self):
+        """Tamaño (ancho, alto) de la imagen."""
+        return self.shape[1], self.shape[0]
+
+    def array(self):
+        """Vista de NumPy sobre los píxeles, sin copiarlos (en cualquier proceso)."""
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=attach(self.name).buf)
+
+    def image(self):
+        """Imagen PIL que comparte los píxeles del segmento; copiarla para conservarla."""
+        buffer = attach(self.name).buf[:self.nbytes]
+        return Image.frombuffer(self.mode, self.size, buffer, 'raw', self.mode, 0, 1)
+
+    def write(self, image):
+        """Copia una imagen PIL (del mismo tamaño y modo) al segmento."""
+        if image.size != self.size or image.mode != self.mode:
+            raise ValueError(f"La imagen {image.size} {image.mode} no cabe en {self!r}")
+        self.array()[...] = np.asarray(image).reshape(self.shape)
+
+
+class SharedBufferPool:
+    """Pool de segmentos de memoria compartida para pasar imágenes a procesos.
+
+    Cada segmento en uso tiene un contador de referencias; al liberarse la
+    última vuelve a la lista de libres y se reutiliza para la siguiente
+    imagen de tamaño parecido, en vez de crear y destruir un segmento por
+    imagen. Los libres que exceden max_free_bytes se destruyen.
+
+    Solo el proceso que crea el pool reserva y libera; los procesos de
+    trabajo solo abren los segmentos a partir de los ImageHandle.
+    """
+
+    def __init__(self, max_free_bytes=512 * 1024 * 1024):
+        self.max_free_bytes = max_free_bytes
+        self._lock = threading.Lock()
+        self._refs = {}       # nombre -> referencias de los segmentos en uso
+        self._free = []       # (tamaño, nombre) ordenados por tamaño
+        self._free_bytes = 0
+        self._segments = {}   # nombre -> SharedMemory de todos los segmentos
+        self.allocations = 0  # Segmentos creados (para ver cuánto se recicla)
+        self.reuses = 0
+
+    def allocate(self, size, mode):
+        """Reserva un segmento para una imagen de un tamaño (ancho, alto) y modo.
+
+        Returns:
+            ImageHandle - Con una referencia; liberarla con release()
+        """
+        width, height = size
+        channels = MODE_CHANNELS[mode]
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        return self._allocate(shape, mode, 'uint8')
+
+    def allocate_array(self, shape, dtype='uint8'):
+        """Reserva un segmento para un array de NumPy de cualquier forma."""
+        return self._allocate(shape, None, np.dtype(dtype).name)
+
+    def _allocate(self, shape, mode, dtype):
+        handle = ImageHandle(None, shape, mode, dtype)
+        nbytes = handle.nbytes
+
+        with self._lock:
+            index = bisect.bisect_left(self._free, (nbytes, ''))
+            if index < len(self._free) and self._free[index][0] <= max(nbytes, 1) * MAX_WASTE:
+                segment_size, name = self._free.pop(index)
+                self._free_bytes -= segment_size
+                self.reuses += 1
+            else:
+                segment = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+                name = segment.name
+                self._segments[name] = _owned[name] = segment
+                self.allocations += 1
+            self._refs[name] = 1
+        handle.name = name
+        return handle
+
+    def put(self, image):
+        """Copia una imagen PIL a un segmento del pool y devuelve su handle."""
+        handle = self.allocate(image.size, image.mode)
+        try:
+            handle.write(image)
+        except Exception:
+            self.release(handle)
+            raise
+        return handle
+
+    def put_array(self, array):
+        """Copia un array de NumPy a un segmento del pool y devuelve su handle."""
+        handle = self.allocate_array(array.shape, array.dtype)
+        handle.array()[...] = array
+        return handle
+
+    def acquire(self, handle):
+        """Añade una referencia a un handle (por ejemplo, para otro trabajo)."""
+        with self._lock:
+            self._refs[handle.name] += 1
+        return handle
+
+    def release(self, handle):
+        """Quita una referencia; sin referencias el segmento vuelve a la lista de libres."""
+        with self._lock:
+            refs = self._refs[handle.name] - 1
+            if refs > 0:
+                self._refs[handle.name] = refs
+                return
+            del self._refs[handle.name]
+            segment = self._segments[handle.name]
+            bisect.insort(self._free, (segment.size, handle.name))
+            self._free_bytes += segment.size
+            self._trim()
+
+    def lease(self, size, mode):
+        """Reserva un segmento como gestor de contexto; se libera al salir."""
+        return _Lease(self, self.allocate(size, mode))
+
+    def lease_image(self, image):
+        """Copia una imagen a un segmento como gestor de contexto; se libera al salir."""
+        return _Lease(self, self.put(image))
+
+    def lease_array(self, array):
+        """Copia un array a un segmento como gestor de contexto; se libera al salir."""
+        return _Lease(self, self.put_array(array))
+
+    def lease_empty(self, shape, dtype='uint8'):
+        """Reserva un segmento para un array como gestor de contexto; se libera al salir."""
+        return _Lease(self, self.allocate_array(shape, dtype))
+
+    def usage(self):
+        """Segmentos del pool y bytes en uso y libres."""
+        with self._lock:
+            in_use = sum(self._segments[name].size for name in self._refs)
+            return {'segments': len(self._segments), 'in_use_bytes': in_use,
+                    'free_bytes': self._free_bytes, 'allocations': self.allocations,
+                    'reuses': self.reuses}
+
+    def close(self):
+        """Destruye todos los segmentos del pool (en uso o no)."""
+        with self._lock:
+            for name in list(self._segments):
+                self._destroy(name)
+            self._refs.clear()
+            self._free = []
+            self._free_bytes = 0
+
+    def _trim(self):
+        """Destruye los segmentos libres más grandes hasta volver al límite (con el lock tomado)."""
+        while self._free_bytes > self.max_free_bytes and self._free:
+            segment_size, name = self._free.pop()
+            self._free_bytes -= segment_size
+            self._destroy(name)
+
+    def _destroy(self, name):
+        segment = self._segments.pop(name)
+        _owned.pop(name, None)
+        _close(segment)
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _Lease:
+    """Gestor de contexto que libera un handle del pool al salir."""
+
+    def __init__(self, pool, handle):
+        self.pool = pool
+        self.handle = handle
+
+    def __enter__(self):
+        return self.handle
+
+    def __exit__(self, *exc):
+        self.pool.release(self.handle)
+        return False
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from PyQt5.QtGui import QImage, QPixmap
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot:
+    """Entrada interna del almacén."""
+
+    __slots__ = ('width', 'height', 'bytes_per_line', 'format', 'nbytes',
+                 'image', 'path', 'disk_bytes', 'spilling', 'refs')
+
+    def __init__(self, image):
+        self.width = image.width()
+        self.height = image.height()
+        self.bytes_per_line = image.bytesPerLine()
+        self.format = image.format()
+        self.nbytes = image.byteCount()
+        self.image = image        # QImage en RAM (None si solo está en disco)
+        self.path = None          # Archivo comprimido en disco
+        self.disk_bytes = 0
+        self.spilling = False     # Hay una compresión en curso
+        self.refs = 1
+
+
+class SnapshotStore:
+    """Almacén de instantáneas de píxeles con presupuesto de RAM.
+
+    Las instantáneas más recientes se mantienen sin comprimir. Cuando se
+    supera el presupuesto, las más antiguas se comprimen con zlib en un hilo
+    de fondo y se vuelcan a un directorio temporal; al pedirlas de nuevo
+    (por ejemplo al deshacer) se descomprimen bajo demanda.
+    """
+
+    DEFAULT_BUDGET = 256 * 1024 * 1024  # 256 MB
+    COMPRESS_LEVEL = 1  # Compresión rápida: prima la latencia sobre el tamaño
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # handle -> _Snapshot, de menos a más reciente
+        self._next_handle = 0
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._directory = None
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def put(self, pixmap):
+        """Guarda una instantánea de un QPixmap y devuelve su identificador."""
+        # QPixmap solo puede usarse en el hilo de la interfaz; QImage no
+        image = pixmap.toImage()
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            entry = _Snapshot(image)
+            self._entries[handle] = entry
+            self._memory_bytes += entry.nbytes
+        self._enforce_budget()
+        return handle
+
+    def retain(self, handle):
+        """Añade una referencia a una instantánea compartida por varios estados."""
+        with self._lock:
+            self._entries[handle].refs += 1
+
+    def release(self, handle):
+        """Libera una referencia; la instantánea se elimina al llegar a cero."""
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            del self._entries[handle]
+            if entry.image is not None:
+                self._memory_bytes -= entry.nbytes
+                entry.image = None
+            path = entry.path
+            if path:
+                self._disk_bytes -= entry.disk_bytes
+                entry.path = None
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def get(self, handle):
+        """Obtiene la instantánea como QPixmap, descomprimiéndola si hace falta."""
+        with self._lock:
+            entry = self._entries[handle]
+            self._entries.move_to_end(handle)
+            # Cancelar un volcado pendiente: la instantánea vuelve a estar en uso
+            entry.spilling = False
+            image = entry.image
+            path = entry.path
+
+        if image is None:
+            with open(path, 'rb') as f:
+                data = zlib.decompress(f.read())
+            image = QImage(data, entry.width, entry.height, entry.bytes_per_line,
+                           entry.format).copy()
+            with self._lock:
+                if entry.image is None and handle in self._entries:
+                    entry.image = image
+                    self._memory_bytes += entry.nbytes
+            self._enforce_budget()
+
+        return QPixmap.fromImage(image)
+
+    def usage(self):
+        """Informa del uso de memoria y disco del almacén."""
+        with self._lock:
+            on_disk = sum(1 for entry in self._entries.values() if entry.path)
+            in_memory = sum(1 for entry in self._entries.values() if entry.image is not None)
+            return {
+                'snapshots': len(self._entries),
+                'in_memory': in_memory,
+                'on_disk': on_disk,
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'budget_bytes': self.budget_bytes
+            }
+
+    def close(self):
+        """Detiene el hilo de compresión y borra el directorio temporal."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            self._disk_bytes = 0
+        if self._directory:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def _enforce_budget(self):
+        """Vuelca a disco las instantáneas más antiguas que excedan el presupuesto."""
+        to_spill = []
+        with self._lock:
+            excess = self._memory_bytes - sum(
+                entry.nbytes for entry in self._entries.values() if entry.spilling)
+            excess -= self.budget_bytes
+            for handle, entry in self._entries.items():
+                if excess <= 0:
+                    break
+                if entry.image is None or entry.spilling:
+                    continue
+                if entry.path:
+                    # Ya existe una copia en disco: basta con soltar la de RAM
+                    entry.image = None
+                    self._memory_bytes -= entry.nbytes
+                else:
+                    entry.spilling = True
+                    to_spill.append(handle)
+                excess -= entry.nbytes
+
+        if to_spill:
+            self._start_worker()
+            for handle in to_spill:
+                self._queue.put(handle)
+
+    def _start_worker(self):
+        if self._thread is not None:
+            return
+        self._directory = tempfile.mkdtemp(prefix='noimgpack2_snapshots_')
+        self._thread = threading.Thread(target=self._run, name="SnapshotStore", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Bucle del hilo de compresión."""
+        while True:
+            handle = self._queue.get()
+            if handle is None:
+                break
+
+            with self._lock:
+                entry = self._entries.get(handle)
+                if entry is None or not entry.spilling or entry.image is None:
+                    continue
+                image = entry.image
+
+            try:
+                ptr = image.constBits()
+                ptr.setsize(image.byteCount())
+                data = zlib.compress(bytes(ptr), self.COMPRESS_LEVEL)
+                path = os.path.join(self._directory, f"{handle}.zlib")
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except Exception as e:
+                logger.warning("Error al volcar la instantánea %s: %s", handle, e)
+                with self._lock:
+                    entry.spilling = False
+                continue
+
+            with self._lock:
+                if handle not in self._entries:
+                    # Se liberó mientras se comprimía
+                    os.remove(path)
+                    continue
+                entry.path = path
+                entry.disk_bytes = len(data)
+                self._disk_bytes += entry.disk_bytes
+                # Si se volvió a usar durante la compresión se conserva en RAM
+                if entry.spilling:
+                    entry.spilling = False
+                    entry.image = None
+                    self._memory_bytes -= entry.nbytes
@@ -29,11 +29,61 @@ translations = {
         'redo': 'Redo (Ctrl+Y)',
         'reset': 'Reset (T)',
         'theme': 'Theme',
+        'apply_to_selected': 'Apply to selected (Ctrl+Shift+V)',
+        'auto_frame': 'Auto frame (F)',
+        'smart_crop': 'Smart crop (Shift+F)',
+        'export_mask': 'Export outpainting mask',
+
+        # Edición en lote
+        'marked_images': 'Marked images:',
+        'batch_no_targets': 'Select an image and Ctrl+click the images to apply its edit to.',
+        'batch_busy': 'A batch edit is already in progress.',
+        'export_busy': 'An export is already in progress.',
+        'journal_locked': 'Another instance is running: this session will not be recoverable after a crash.',
+        'exporting': 'Exporting images in the background:',
+        'render_queue': 'Render queue:',
+        'shared_buffers': 'Shared memory (segments · in use / free · created/reused):',
+        'batch_applied': 'Edit applied to images:',
+        'auto_frame_applied': 'Frame fitted to content in images:',
+        'smart_crop_applied': 'Frame placed on detail in images:',
 
         # Mensajes de estado y atajos
         'shortcuts': 'Shortcuts: Move (Q), Resize (W), Rotate (R), Deform (D), Undo (Ctrl+Z), Redo (Ctrl+Y), Reset (T)',
         'deformation_applied': 'Deformation applied. You can continue deforming the image by dragging the points.',
         'images_loaded': 'Loaded',
+        'duplicates_skipped': 'duplicates skipped:',
+        'checking_duplicates': 'Checking for duplicates:',
+        'import_busy': 'An import is already in progress.',
+        'reading_metadata': 'Reading image headers:',
+        'duplicates_flagged': 'possible duplicates:',
+        'duplicate_of': 'Possible duplicate of',
+        'sort_by': 'Sort:',
+        'sort_order': 'Import order',
+        'sort_name': 'Name',
+        'sort_width': 'Width',
+        'sort_height': 'Height',
+        'sort_aspect': 'Aspect ratio',
+        'sort_megapixels': 'Megapixels',
+        'sort_file_size': 'File size',
+        'sort_mtime': 'Modified',
+        'sort_edited': 'Edited first',
+        'descending': 'Descending',
+        'filter': 'Show:',
+        'filter_all': 'All',
+        'filter_edited': 'Edited',
+        'filter_unedited': 'Unedited',
+        'filter_landscape': 'Landscape',
+        'filter_portrait': 'Portrait',
+        'filter_square': 'Square',
+        'gallery_showing': 'Showing images:',
+        'dump_metrics_title': 'Save session metrics',
+        'metrics_saved': 'Metrics saved to',
+        'diagnostics': 'Diagnostics',
+        'memory_total': 'Memory in use:',
+        'memory_budget': 'budget',
+        'memory_disk': 'on disk',
+        'memory_image': 'Image',
+        'memory_over_budget': 'Warning: memory budget exceeded',
 
         # Diálogos
         'load_dialog_title': 'Select Images',
@@ -78,11 +128,61 @@ translations = {
         'redo': 'Rehacer (Ctrl+Y)',
         'reset': 'Restablecer (T)',
         'theme': 'Tema',
+        'apply_to_selected': 'Aplicar a seleccionadas (Ctrl+Shift+V)',
+        'auto_frame': 'Encuadre automático (F)',
+        'smart_crop': 'Recorte inteligente (Shift+F)',
+        'export_mask': 'Exportar máscara de outpainting',
+
+        # Edición en lote
+        'marked_images': 'Imágenes marcadas:',
+        'batch_no_targets': 'Selecciona una imagen y marca con Ctrl+clic las imágenes a las que aplicar su edición.',
+        'batch_busy': 'Ya hay una edición en lote en curso.',
+        'export_busy': 'Ya hay una exportación en curso.',
+        'journal_locked': 'Hay otra instancia abierta: esta sesión no se podrá recuperar tras un cierre inesperado.',
+        'exporting': 'Exportando imágenes en segundo plano:',
+        'render_queue': 'Cola de render:',
+        'shared_buffers': 'Memoria compartida (segmentos · en uso / libre · creados/reutilizados):',
+        'batch_applied': 'Edición aplicada a imágenes:',
+        'auto_frame_applied': 'Marco ajustado al contenido en imágenes:',
+        'smart_crop_applied': 'Marco colocado sobre el detalle en imágenes:',
 
         # Mensajes de estado y atajos
         'shortcuts': 'Atajos: Mover (Q), Redimensionar (W), Rotar (R), Deformar (D), Deshacer (Ctrl+Z), Rehacer (Ctrl+Y), Restablecer (T)',
         'deformation_applied': 'Deformación aplicada. Puedes seguir deformando la imagen arrastrando los puntos.',
         'images_loaded': 'Cargadas',
+        'duplicates_skipped': 'duplicados descartados:',
+        'checking_duplicates': 'Buscando duplicados:',
+        'import_busy': 'Ya hay una importación en curso.',
+        'reading_metadata': 'Leyendo cabeceras:',
+        'duplicates_flagged': 'posibles duplicados:',
+        'duplicate_of': 'Posible duplicado de',
+        'sort_by': 'Ordenar:',
+        'sort_order': 'Orden de carga',
+        'sort_name': 'Nombre',
+        'sort_width': 'Ancho',
+        'sort_height': 'Alto',
+        'sort_aspect': 'Relación de aspecto',
+        'sort_megapixels': 'Megapíxeles',
+        'sort_file_size': 'Tamaño de archivo',
+        'sort_mtime': 'Modificación',
+        'sort_edited': 'Editadas primero',
+        'descending': 'Descendente',
+        'filter': 'Mostrar:',
+        'filter_all': 'Todas',
+        'filter_edited': 'Editadas',
+        'filter_unedited': 'Sin editar',
+        'filter_landscape': 'Horizontales',
+        'filter_portrait': 'Verticales',
+        'filter_square': 'Cuadradas',
+        'gallery_showing': 'Mostrando imágenes:',
+        'dump_metrics_title': 'Guardar métricas de la sesión',
+        'metrics_saved': 'Métricas guardadas en',
+        'diagnostics': 'Diagnóstico',
+        'memory_total': 'Memoria en uso:',
+        'memory_budget': 'presupuesto',
+        'memory_disk': 'en disco',
+        'memory_image': 'Imagen',
+        'memory_over_budget': 'Aviso: se ha superado el presupuesto de memoria',
 
         # Diálogos
         'load_dialog_title': 'Seleccionar Imágenes',
@@ -106,6 +206,8 @@ translations = {
 class Translator:
     def __init__(self, language='es'):
         self.language = language
+        # Tabla de objetos cuyo texto depende del idioma: (objeto, clave, método)
+        self.bindings = []
 
     def set_language(self, language):
         """Cambia el idioma actual."""
@@ -122,3 +224,17 @@ class Translator:
         if self.language != 'en' and key in translations['en']:
             return translations['en'][key]
         return key
+
+    def bind(self, target, key, setter='setText'):
+        """Registra un objeto traducible y le asigna ya su texto.
+
+        Al cambiar de idioma solo se actualizan los objetos registrados.
+        """
+        self.bindings.append((target, key, setter))
+        getattr(target, setter)(self.get_text(key))
+        return target
+
+    def retranslate(self):
+        """Vuelve a aplicar los textos de todos los objetos registrados."""
+        for target, key, setter in self.bindings:
+            getattr(target, setter)(self.get_text(key))